@@ -0,0 +1,300 @@
+import argparse
+import json
+import logging
+import os
+import re
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from referentiel import ACTIFS_COTES, PANELS, SCORES_ESG
+
+# Alertes sur les séries du panel, définies par des règles « mesure actif opérateur seuil » :
+#   drawdown Acer > 15%            baisse depuis le plus haut suivi
+#   inactivite 0P0000KU3M.F > 3    jours ouvrés sans nouveau cours
+#   score_esg Acer < 60            score ESG
+#   cours SW.PA < 80               dernier cours
+# Les règles sont lues dans financial_data/alertes.csv (id,portefeuille,mesure,actif,operateur,seuil).
+#
+# Le moteur garde un état par série (dernier cours, plus haut, date du dernier cours, score ESG) et ne
+# relit jamais l'historique : une mise à jour du panel n'apporte que les nouvelles lignes, et seules les
+# règles des séries touchées sont réévaluées (les règles d'inactivité, qui dépendent de la date du jour,
+# sont réévaluées ensemble quand la date avance). Une alerte est notifiée quand sa condition devient
+# vraie (« déclenchée ») puis quand elle redevient fausse (« levée »), vers un ou plusieurs canaux
+# (fichier JSON lines, journal, webhook).
+#
+#   python alertes.py                       # nouvelles lignes des panels depuis le dernier passage
+#   python alertes.py --webhook http://127.0.0.1:8766/alertes --regle "drawdown Acer > 15%"
+
+REGLES = "financial_data/alertes.csv"
+ETAT = "financial_data/etat_alertes.npz"
+JOURNAL = "financial_data/alertes.jsonl"
+COLONNES_REGLES = ["id", "portefeuille", "mesure", "actif", "operateur", "seuil"]
+MESURES = ["cours", "drawdown", "inactivite", "score_esg"]
+# Mesures exprimées en fraction : « 15% » ou « 15 » valent 0,15
+MESURES_EN_POURCENTAGE = {"drawdown"}
+
+
+def tickers_par_nom(actifs_cotes=ACTIFS_COTES):
+    # « Acer » -> « 2353.TW », noms comparés sans tenir compte de la casse
+    return {nom.upper(): ticker for actifs_poche in actifs_cotes.values() for nom, ticker in actifs_poche.items()}
+
+
+def regle_depuis_texte(texte, portefeuille=None, identifiant=None):
+    # « drawdown of Acer > 15% » -> {"mesure": "drawdown", "actif": "Acer", "operateur": ">", "seuil": 0.15, ...}
+    motif = re.fullmatch(r"\s*(\w+)\s+(?:(?:of|de|du|d')\s*)?(.+?)\s*([<>])\s*([-\d.,]+)\s*(%?)\s*", texte)
+    if not motif:
+        raise ValueError(f"Règle illisible : {texte!r} (attendu « mesure actif > seuil »)")
+    mesure, actif, operateur, seuil, pourcent = motif.groups()
+    mesure = mesure.lower().replace("é", "e")
+    seuil = float(seuil.replace(",", "."))
+    if pourcent or mesure in MESURES_EN_POURCENTAGE and abs(seuil) > 1:
+        seuil /= 100
+    return {"id": identifiant or texte.strip(), "portefeuille": portefeuille, "mesure": mesure, "actif": actif,
+            "operateur": operateur, "seuil": seuil}
+
+
+def lire_regles(chemin=REGLES):
+    if not os.path.exists(chemin):
+        return pd.DataFrame(columns=COLONNES_REGLES)
+    regles = pd.read_csv(chemin, dtype={"id": str, "portefeuille": str, "actif": str})
+    manquantes = set(COLONNES_REGLES) - set(regles.columns)
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes dans {chemin} : {', '.join(sorted(manquantes))}")
+    return regles[COLONNES_REGLES]
+
+
+class CanalFichier:
+    # Une ligne JSON par événement, ajoutée au fichier
+    def __init__(self, chemin=JOURNAL):
+        self.chemin = chemin
+
+    def envoyer(self, evenements):
+        os.makedirs(os.path.dirname(self.chemin) or ".", exist_ok=True)
+        with open(self.chemin, "a", encoding="utf-8") as f:
+            for evenement in evenements:
+                f.write(json.dumps(evenement, ensure_ascii=False) + "\n")
+
+
+class CanalJournal:
+    # Un message par événement dans le journal Python (logger « alertes »)
+    def __init__(self, niveau=logging.WARNING):
+        self.logger = logging.getLogger("alertes")
+        self.niveau = niveau
+
+    def envoyer(self, evenements):
+        for e in evenements:
+            self.logger.log(self.niveau, "%s %s [%s] %s %s %s %s : %s", e["date"], e["etat"], e["portefeuille"],
+                            e["mesure"], e["actif"], e["operateur"], e["seuil"], e["valeur"])
+
+
+class CanalWebhook:
+    # Un POST JSON par lot d'événements (generateur.RecepteurWebhook en local)
+    def __init__(self, url, timeout=10):
+        self.url, self.timeout = url, timeout
+
+    def envoyer(self, evenements):
+        corps = json.dumps({"alertes": list(evenements)}, ensure_ascii=False).encode("utf-8")
+        requete = urllib.request.Request(self.url, data=corps, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(requete, timeout=self.timeout):
+            pass
+
+
+class MoteurAlertes:
+    def __init__(self, regles, canaux=(), actifs_cotes=ACTIFS_COTES):
+        self.canaux = list(canaux)
+        self._noms = tickers_par_nom(actifs_cotes)
+        self.series = pd.Index([], dtype=object)
+        self.dernier = np.empty(0)
+        self.maximum = np.empty(0)
+        self.date = np.empty(0, dtype="datetime64[D]")
+        self.score = np.empty(0)
+        self.date_reference = np.datetime64("NaT", "D")
+        self.evaluations = 0
+        self.definir_regles(regles)
+
+    def _ticker(self, actif):
+        actif = str(actif).strip()
+        return self._noms.get(actif.upper(), actif)
+
+    def _positions(self, tickers):
+        # Position de chaque ticker dans l'état, en ajoutant les séries inconnues
+        tickers = pd.Index(tickers)
+        nouveaux = tickers.difference(self.series)
+        if len(nouveaux):
+            self.series = self.series.append(nouveaux)
+            n = len(nouveaux)
+            self.dernier = np.concatenate([self.dernier, np.full(n, np.nan)])
+            self.maximum = np.concatenate([self.maximum, np.full(n, np.nan)])
+            self.date = np.concatenate([self.date, np.full(n, np.datetime64("NaT"), dtype="datetime64[D]")])
+            self.score = np.concatenate([self.score, np.full(n, np.nan)])
+        return self.series.get_indexer(tickers)
+
+    def definir_regles(self, regles):
+        # regles : DataFrame au format de lire_regles, ou liste de dictionnaires / textes
+        if not isinstance(regles, pd.DataFrame):
+            regles = pd.DataFrame([regle_depuis_texte(r) if isinstance(r, str) else r for r in regles],
+                                  columns=COLONNES_REGLES)
+        regles = regles.reset_index(drop=True)
+        inconnues = set(regles["mesure"]) - set(MESURES)
+        if inconnues:
+            raise ValueError(f"Mesure inconnue : {', '.join(sorted(inconnues))} (attendu : {', '.join(MESURES)})")
+        if not regles["operateur"].isin([">", "<"]).all():
+            raise ValueError("Opérateur attendu : > ou <")
+        self.regles = regles
+        self._serie = self._positions([self._ticker(a) for a in regles["actif"]])
+        self._mesure = pd.Categorical(regles["mesure"], categories=MESURES).codes
+        self._signe = np.where(regles["operateur"] == ">", 1.0, -1.0)
+        self._seuil = regles["seuil"].to_numpy(dtype=float)
+        self.actives = np.zeros(len(regles), dtype=bool)
+        # Règles regroupées par série, pour ne réévaluer que celles des séries touchées
+        self._ordre = np.argsort(self._serie, kind="stable")
+        self._series_triees = self._serie[self._ordre]
+        self._inactivite = np.flatnonzero(self._mesure == MESURES.index("inactivite"))
+        return self
+
+    def _regles_des_series(self, positions, mesures):
+        debuts = np.searchsorted(self._series_triees, positions, side="left")
+        longueurs = np.searchsorted(self._series_triees, positions, side="right") - debuts
+        decalages = np.repeat(np.cumsum(longueurs) - longueurs, longueurs)
+        regles = self._ordre[np.repeat(debuts, longueurs) + np.arange(longueurs.sum()) - decalages]
+        return regles[np.isin(self._mesure[regles], [MESURES.index(m) for m in mesures])]
+
+    def _valeurs(self, regles):
+        series, mesures = self._serie[regles], self._mesure[regles]
+        valeurs = np.full(len(regles), np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            choix = {
+                "cours": self.dernier[series],
+                "drawdown": 1 - self.dernier[series] / self.maximum[series],
+                "score_esg": self.score[series],
+            }
+            for mesure, valeur in choix.items():
+                dans = mesures == MESURES.index(mesure)
+                valeurs[dans] = valeur[dans]
+        inactivite = mesures == MESURES.index("inactivite")
+        if inactivite.any() and not np.isnat(self.date_reference):
+            dates = self.date[series[inactivite]]
+            connues = ~np.isnat(dates)
+            jours = np.full(len(dates), np.nan)
+            jours[connues] = np.busday_count(dates[connues], self.date_reference)
+            valeurs[inactivite] = jours
+        return valeurs
+
+    def _evaluer(self, regles, date):
+        # Réévalue les règles données ; notifie les changements d'état et les renvoie
+        regles = np.unique(regles)
+        self.evaluations += len(regles)
+        if not len(regles):
+            return []
+        valeurs = self._valeurs(regles)
+        vraies = np.nan_to_num(self._signe[regles] * (valeurs - self._seuil[regles]), nan=-1.0) > 0
+        changees = vraies != self.actives[regles]
+        self.actives[regles] = vraies
+        if not changees.any():
+            return []
+        # Événements construits en bloc (seules les règles qui changent d'état)
+        lignes = self.regles.iloc[regles[changees]]
+        evenements = pd.DataFrame({
+            "date": str(date), "id": lignes["id"].astype(str).to_numpy(),
+            "etat": np.where(vraies[changees], "déclenchée", "levée"),
+            "portefeuille": lignes["portefeuille"].astype(object).to_numpy(), "mesure": lignes["mesure"].to_numpy(),
+            "actif": lignes["actif"].astype(str).to_numpy(), "operateur": lignes["operateur"].to_numpy(),
+            "seuil": lignes["seuil"].to_numpy(dtype=float), "valeur": valeurs[changees],
+        }).astype(object)
+        evenements = evenements.where(evenements.notna(), None).to_dict("records")
+        for canal in self.canaux:
+            canal.envoyer(evenements)
+        return evenements
+
+    def mettre_a_jour(self, lignes):
+        # lignes : nouvelles dates du panel (dates x tickers). Chaque série ne garde que ses lignes
+        # postérieures à son propre dernier cours : on peut passer le panel entier, et une série publiée
+        # en retard (VL d'un fonds à J+1) reçoit ses lignes même quand le reste du panel a avancé.
+        lignes = lignes.sort_index()
+        vues = pd.Series(self.date, index=self.series).reindex(lignes.columns).to_numpy().astype("datetime64[D]")
+        if len(vues) and not np.isnat(vues).any():
+            lignes = lignes[lignes.index.values.astype("datetime64[D]") > vues.min()]
+        if not len(lignes):
+            return []
+        dates = lignes.index.values.astype("datetime64[D]")
+        valeurs = lignes.to_numpy(dtype=float)
+        valides = ~np.isnan(valeurs) & ~(dates[:, None] <= vues[None, :])
+        valeurs = np.where(valides, valeurs, np.nan)
+        touchees = np.flatnonzero(valides.any(axis=0))
+        positions = self._positions(lignes.columns[touchees])
+        valeurs, valides = valeurs[:, touchees], valides[:, touchees]
+        derniere_ligne = len(valeurs) - 1 - np.argmax(valides[::-1], axis=0)
+        self.dernier[positions] = valeurs[derniere_ligne, np.arange(len(touchees))]
+        self.maximum[positions] = np.fmax(self.maximum[positions], np.nanmax(valeurs, axis=0))
+        self.date[positions] = dates[derniere_ligne]
+        avance = np.isnat(self.date_reference) or dates[-1] > self.date_reference
+        self.date_reference = dates[-1] if avance else self.date_reference
+        regles = self._regles_des_series(positions, ["cours", "drawdown", "inactivite"])
+        if avance:
+            regles = np.concatenate([regles, self._inactivite])
+        return self._evaluer(regles, self.date_reference)
+
+    def mettre_a_jour_scores(self, scores):
+        # scores : {nom ou ticker: score} ; seules les règles des scores modifiés sont réévaluées
+        tickers = [self._ticker(nom) for nom in scores]
+        positions = self._positions(tickers)
+        nouveaux = np.array(list(scores.values()), dtype=float)
+        modifies = ~((nouveaux == self.score[positions]) | (np.isnan(nouveaux) & np.isnan(self.score[positions])))
+        self.score[positions] = nouveaux
+        regles = self._regles_des_series(positions[modifies], ["score_esg"])
+        return self._evaluer(regles, self.date_reference if not np.isnat(self.date_reference) else np.datetime64("today"))
+
+    def evaluer_tout(self):
+        # Réévaluation complète (contrôle) : doit donner les mêmes alertes actives que le suivi incrémental
+        return self._evaluer(np.arange(len(self.regles)), self.date_reference)
+
+    def alertes_actives(self):
+        actives = self.regles[self.actives].copy()
+        actives["valeur"] = self._valeurs(np.flatnonzero(self.actives))
+        return actives
+
+    def sauvegarder(self, chemin=ETAT):
+        # État des séries et des règles actives, pour reprendre au prochain passage sans relire l'historique
+        os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+        np.savez(chemin, series=np.array(self.series, dtype=str), dernier=self.dernier, maximum=self.maximum,
+                 date=self.date, score=self.score, date_reference=np.array([self.date_reference]),
+                 actives=np.array(self.regles["id"][self.actives].astype(str), dtype=str))
+
+    def charger(self, chemin=ETAT):
+        if not os.path.exists(chemin):
+            return self
+        with np.load(chemin, allow_pickle=False) as f:
+            positions = self._positions(f["series"].tolist())
+            self.dernier[positions], self.maximum[positions] = f["dernier"], f["maximum"]
+            self.date[positions], self.score[positions] = f["date"], f["score"]
+            self.date_reference = f["date_reference"][0]
+            self.actives = self.regles["id"].astype(str).isin(f["actives"].tolist()).to_numpy()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Évalue les alertes sur les nouvelles lignes des panels")
+    parser.add_argument("--panels", default=",".join(PANELS))
+    parser.add_argument("--regles", default=REGLES)
+    parser.add_argument("--regle", action="append", default=[], help="règle en texte, ex. « drawdown Acer > 15% »")
+    parser.add_argument("--etat", default=ETAT)
+    parser.add_argument("--journal", default=JOURNAL, help="fichier JSON lines des événements")
+    parser.add_argument("--webhook", help="URL recevant les événements en POST")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(levelname)s %(message)s")
+    regles = pd.concat([lire_regles(args.regles), pd.DataFrame([regle_depuis_texte(r) for r in args.regle],
+                                                                columns=COLONNES_REGLES)], ignore_index=True)
+    canaux = [CanalFichier(args.journal), CanalJournal()] + ([CanalWebhook(args.webhook)] if args.webhook else [])
+    # Scores ESG après l'état sauvegardé : seuls les scores modifiés depuis le dernier passage sont notifiés
+    moteur = MoteurAlertes(regles, canaux).charger(args.etat)
+    evenements = moteur.mettre_a_jour_scores(SCORES_ESG)
+    from ingestion import charger_panel
+
+    panels = [charger_panel(p) for p in args.panels.split(",") if os.path.exists(p)]
+    if panels:
+        evenements += moteur.mettre_a_jour(pd.concat(panels, axis=1).sort_index())
+    moteur.sauvegarder(args.etat)
+    print(f"{len(evenements)} événements, {int(moteur.actives.sum())} alertes actives sur {len(moteur.regles)} règles")
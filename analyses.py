@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+JOURS_PAR_AN = 252
+
+
+def calculer_rendements(df):
+    # Rendements journaliers, colonne par colonne, sans propager les trous
+    return df.pct_change(fill_method=None)
+
+
+def calculer_drawdowns(df):
+    # Écart au plus haut historique de chaque série
+    return df / df.cummax() - 1
+
+
+def calculer_performances(df):
+    # Indicateurs de performance pour toutes les séries du panel en une passe
+    premiers = df.bfill().iloc[0]
+    derniers = df.ffill().iloc[-1]
+    nb_obs = df.notna().sum()
+    rendements = calculer_rendements(df)
+
+    rendement_total = derniers / premiers - 1
+    annees = (nb_obs / JOURS_PAR_AN).replace(0, np.nan)
+    rendement_annualise = (1 + rendement_total) ** (1 / annees) - 1
+    volatilite = rendements.std() * np.sqrt(JOURS_PAR_AN)
+
+    return pd.DataFrame({
+        "Rendement total": rendement_total,
+        "Rendement annualisé": rendement_annualise,
+        "Volatilité": volatilite,
+        "Sharpe": rendement_annualise / volatilite,
+        "Max drawdown": calculer_drawdowns(df).min(),
+    })
+
+
+def calculer_vl(df, poids=None, base=100):
+    # Valeur liquidative buy-and-hold, base 100 à la première date où toutes les séries cotent.
+    # Les cours manquants (fériés d'une place, trous) sont prolongés par la dernière valeur connue.
+    df = df.ffill().dropna()
+    if df.empty:
+        return pd.Series(dtype=float, name="VL")
+    if poids is None:
+        poids = pd.Series(1.0, index=df.columns)
+    poids = pd.Series(poids, dtype=float).reindex(df.columns).fillna(0)
+    poids = poids / poids.sum()
+    return (df / df.iloc[0] * poids).sum(axis=1).mul(base).rename("VL")
@@ -0,0 +1,292 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pandas as pd
+
+from analyses import calculer_performances, calculer_vl
+from base_sql import BASE, charger_base
+from calendrier import aligner_en_cache
+from ingestion import lire_ohlcv_en_cache
+from liquidite import PARTICIPATION, tableau_liquidite
+from operations import OPERATIONS, ajuster_panel, charger_panels_ajustes, lire_operations
+from panel_compact import charger_panel_compact
+from panel_partage import charger_panel_partage
+from referentiel import ACTIFS_COTES, COMPOSITION_SPE, OHLCV, PANELS, SCORES_ESG, actifs
+from stress import stresser
+from transparence import charger_transparence, poids_portefeuille, version_inventaires
+from versions import lire_panel
+
+# API HTTP locale en lecture seule sur les mêmes données que le dashboard, pour le CRM et le reporting.
+#
+#   python api.py --port 8502
+#
+#   GET /actifs                          liste des actifs cotés (poche, ticker, score ESG)
+#   GET /esg                             scores ESG
+#   GET /prix/<ticker>?debut=&fin=       cours
+#   GET /performances?tickers=a,b        indicateurs de performance (&rendement=total : dividendes réinvestis)
+#   GET /vl/actif/<ticker>               VL base 100 d'un actif
+#   GET /vl/poche/<poche>                VL d'une poche (actifs équipondérés)
+#   GET /vl/portefeuille                 VL des poches cotées, pondérées selon COMPOSITION_SPE
+#   GET /liquidite?montant=&participation=   ADV, Amihud, spreads estimés, jours pour liquider `montant`
+#   GET /transparence?par=emetteur|secteur|pays   exposition du portefeuille après transparisation des fonds
+#   GET /stress?mesure=pnl|couverture    P&L des lignes, poches et du portefeuille sous les scénarios de stress
+#                                        (null sans historique sur la période), ou part des poids couverte
+#   GET /photo?date=&champ=&tickers=     dernière valeur connue de chaque série à une date (base SQL)
+#   GET /agregats?frequence=mois&fonction=dernier&tickers=&debut=&fin=   agrégats par période (base SQL)
+#
+# Les routes de cours, VL, performances et stress acceptent ?au=2025-04-08 : panels tels qu'enregistrés à
+# cette date (python versions.py), pour reproduire une réponse passée.
+#
+# JSON par défaut, Arrow IPC avec ?format=arrow ou Accept: application/vnd.apache.arrow.stream.
+# Chaque réponse porte un ETag (hash du contenu) ; If-None-Match renvoie 304 sans corps.
+
+TYPE_ARROW = "application/vnd.apache.arrow.stream"
+TAILLE_CACHE = 256
+
+
+class CacheReponses:
+    # Cache LRU des réponses calculées : clé -> (corps, type, etag)
+    def __init__(self, taille=TAILLE_CACHE):
+        self.taille = taille
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def lire(self, cle):
+        with self._verrou:
+            if cle in self._entrees:
+                self._entrees.move_to_end(cle)
+                return self._entrees[cle]
+        return None
+
+    def ecrire(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = valeur
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille:
+                self._entrees.popitem(last=False)
+
+
+class ErreurApi(Exception):
+    def __init__(self, statut, message):
+        super().__init__(message)
+        self.statut = statut
+
+
+def _panel(rendement="prix", au=None):
+    # Panels publiés en mémoire partagée, réunis sur un seul index de dates.
+    # rendement="total" : séries ajustées des opérations sur titres, dividendes réinvestis
+    # au="2025-04-08" : panels tels qu'enregistrés à cette date (versions.py)
+    if rendement not in ("prix", "total"):
+        raise ValueError(f"rendement doit valoir 'prix' ou 'total', pas {rendement!r}")
+    if au is not None:
+        try:
+            panels = [lire_panel(p, au=au) for p in PANELS if os.path.exists(p)]
+        except (KeyError, FileNotFoundError) as e:
+            raise ErreurApi(404, str(e).strip("'\""))
+        if rendement == "total":
+            operations = lire_operations()
+            panels = [ajuster_panel(p, operations)[1] for p in panels]
+    elif rendement == "total":
+        panels = [charger_panels_ajustes(p)[1] for p in PANELS if os.path.exists(p)]
+    else:
+        panels = [charger_panel_partage(p) for p in PANELS if os.path.exists(p)]
+    if not panels:
+        raise ErreurApi(503, "Aucun fichier de cours disponible")
+    return pd.concat(panels, axis=1).sort_index()
+
+
+def _panel_aligne(au=None):
+    # Vue commune aux VL : dernière valeur connue (5 jours ouvrés au plus) sur l'union des dates
+    return aligner_en_cache(_panel(au=au), "union", version=(_version_donnees(), au))
+
+
+def _version_donnees():
+    # Change dès qu'un fichier de cours ou un inventaire est modifié : invalide les entrées du cache
+    return tuple(os.stat(p).st_mtime_ns if os.path.exists(p) else None
+                 for p in PANELS + OHLCV + [OPERATIONS, BASE]) + version_inventaires()
+
+
+def _colonnes(panel, tickers):
+    manquants = [t for t in tickers if t not in panel.columns]
+    if manquants:
+        raise ErreurApi(404, f"Ticker inconnu : {', '.join(manquants)}")
+    return panel[tickers]
+
+
+def _serie(serie):
+    serie = serie.dropna()
+    return pd.DataFrame({"date": serie.index.strftime("%Y-%m-%d"), serie.name: serie.values})
+
+
+def _route(chemin, params):
+    # Renvoie un DataFrame (sérialisé ensuite en JSON ou Arrow)
+    morceaux = [unquote(m) for m in chemin.split("/") if m]
+    if morceaux == ["actifs"]:
+        return pd.DataFrame(actifs())
+    if morceaux == ["esg"]:
+        return pd.DataFrame({"Nom": list(SCORES_ESG.keys()), "Score ESG": list(SCORES_ESG.values())})
+
+    if morceaux == ["liquidite"]:
+        tableaux = [tableau_liquidite(lire_ohlcv_en_cache(p)[0], float(params.get("montant", 1e6)),
+                                      float(params.get("participation", PARTICIPATION)))
+                    for p in OHLCV if os.path.exists(p)]
+        if not tableaux:
+            raise ErreurApi(503, "Aucun fichier OHLCV disponible")
+        return pd.concat(tableaux).rename_axis("Ticker").reset_index()
+    if morceaux == ["transparence"]:
+        par = params.get("par", "emetteur")
+        if par not in ("emetteur", "secteur", "pays"):
+            raise ErreurApi(400, f"par doit valoir 'emetteur', 'secteur' ou 'pays', pas {par!r}")
+        transparence = charger_transparence()
+        poids = poids_portefeuille()
+        exposition = (transparence.exposition(poids) if par == "emetteur"
+                      else transparence.exposition_par(poids, par)).iloc[0]
+        exposition = exposition[exposition != 0].sort_values(ascending=False)
+        return pd.DataFrame({par.capitalize(): exposition.index, "Exposition": exposition.to_numpy()})
+    if len(morceaux) == 2 and morceaux[0] == "prix":
+        # Lecture directe de la colonne dans le panel compact qui la contient, sans réunir les panels
+        for chemin_panel in PANELS:
+            if os.path.exists(chemin_panel):
+                compact = charger_panel_compact(chemin_panel, dtype="float64")
+                if morceaux[1] in compact:
+                    return _serie(compact.serie(morceaux[1], params.get("debut"), params.get("fin")))
+        raise ErreurApi(404, f"Ticker inconnu : {morceaux[1]}")
+    if morceaux in (["photo"], ["agregats"]):
+        # Requêtes calculées par le moteur SQL, sans charger les panels
+        if not os.path.exists(BASE):
+            raise ErreurApi(503, "Base SQL des cours absente : lancer python base_sql.py")
+        base = charger_base()
+        tickers = params["tickers"].split(",") if "tickers" in params else None
+        champ = params.get("champ", "clot")
+        try:
+            if morceaux == ["photo"]:
+                photo = base.photo(params.get("date"), tickers, champ).reset_index()
+                return photo.assign(date=photo["date"].dt.strftime("%Y-%m-%d"))
+            return base.agreger(params.get("frequence", "mois"), params.get("fonction", "dernier"), tickers,
+                                params.get("debut"), params.get("fin"), champ, large=False)
+        except ValueError as e:
+            raise ErreurApi(400, str(e))
+
+    au = params.get("au")
+    if morceaux == ["stress"]:
+        # Scénario sans aucun choc connu pour un portefeuille (période hors du panel) : P&L null, pas 0
+        pnl, couverture = stresser(_panel("total", au))
+        mesure = params.get("mesure", "pnl")
+        if mesure not in ("pnl", "couverture"):
+            raise ErreurApi(400, f"mesure doit valoir 'pnl' ou 'couverture', pas {mesure!r}")
+        tableau = pnl.where(couverture > 0) if mesure == "pnl" else couverture
+        return tableau.rename_axis("Scénario").reset_index()
+    panel = _panel(au=au)
+    if morceaux == ["performances"]:
+        tickers = params["tickers"].split(",") if "tickers" in params else [
+            t for poche in ACTIFS_COTES.values() for t in poche.values() if t in panel.columns]
+        panel_perf = _panel(params.get("rendement", "prix"), au)
+        return calculer_performances(_colonnes(panel_perf, tickers)).rename_axis("Ticker").reset_index()
+    if len(morceaux) == 3 and morceaux[:2] == ["vl", "actif"]:
+        return _serie(calculer_vl(_colonnes(_panel_aligne(au), [morceaux[2]])))
+    if len(morceaux) == 3 and morceaux[:2] == ["vl", "poche"]:
+        if morceaux[2] not in ACTIFS_COTES:
+            raise ErreurApi(404, f"Poche inconnue ou sans actif coté : {morceaux[2]}")
+        tickers = [t for t in ACTIFS_COTES[morceaux[2]].values() if t in panel.columns]
+        return _serie(calculer_vl(_panel_aligne(au)[tickers]))
+    if morceaux == ["vl", "portefeuille"]:
+        # Les poches sans cours (actifs projet) sont exclues et les poids renormalisés
+        vl_poches = {}
+        aligne = _panel_aligne(au)
+        for poche, actifs_poche in ACTIFS_COTES.items():
+            tickers = [t for t in actifs_poche.values() if t in panel.columns]
+            if tickers:
+                vl_poches[poche] = calculer_vl(aligne[tickers])
+        if not vl_poches:
+            raise ErreurApi(404, "Aucune poche cotée dans les fichiers de cours")
+        vl = calculer_vl(pd.DataFrame(vl_poches), {p: COMPOSITION_SPE[p] for p in vl_poches})
+        return _serie(vl)
+    raise ErreurApi(404, f"Ressource inconnue : {chemin}")
+
+
+def _serialiser(df, format_):
+    if format_ == "arrow":
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ErreurApi(406, "Format Arrow indisponible : pyarrow n'est pas installé")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tampon = io.BytesIO()
+        with pa.ipc.new_stream(tampon, table.schema) as flux:
+            flux.write_table(table)
+        return tampon.getvalue(), TYPE_ARROW
+    corps = df.to_json(orient="records", force_ascii=False, date_format="iso")
+    return corps.encode("utf-8"), "application/json; charset=utf-8"
+
+
+def repondre(chemin, requete, accept="", cache=None):
+    # Corps, type et ETag d'une requête GET, servis depuis le cache si les données n'ont pas changé
+    params = {k: v[-1] for k, v in parse_qs(requete).items()}
+    format_ = params.pop("format", "arrow" if TYPE_ARROW in accept else "json")
+    cle = (chemin, tuple(sorted(params.items())), format_, _version_donnees())
+    if cache is not None:
+        reponse = cache.lire(cle)
+        if reponse is not None:
+            return reponse
+    corps, type_ = _serialiser(_route(chemin, params), format_)
+    reponse = (corps, type_, '"' + hashlib.sha256(corps).hexdigest()[:32] + '"')
+    if cache is not None:
+        cache.ecrire(cle, reponse)
+    return reponse
+
+
+class GestionnaireApi(BaseHTTPRequestHandler):
+    cache = CacheReponses()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            corps, type_, etag = repondre(url.path, url.query, self.headers.get("Accept", ""), self.cache)
+        except ErreurApi as e:
+            self._envoyer(e.statut, json.dumps({"erreur": str(e)}).encode("utf-8"), "application/json")
+            return
+        except (KeyError, TypeError, ValueError) as e:
+            # Paramètres mal formés (dates illisibles, etc.)
+            self._envoyer(400, json.dumps({"erreur": str(e)}).encode("utf-8"), "application/json")
+            return
+        etags_client = [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]
+        if etag in etags_client or "*" in etags_client:
+            self._envoyer(304, b"", None, etag)
+        else:
+            self._envoyer(200, corps, type_, etag)
+
+    def _envoyer(self, statut, corps, type_, etag=None):
+        self.send_response(statut)
+        if type_:
+            self.send_header("Content-Type", type_)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        if corps:
+            self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def servir(hote="127.0.0.1", port=8502):
+    serveur = ThreadingHTTPServer((hote, port), GestionnaireApi)
+    print(f"API disponible sur http://{hote}:{port}")
+    serveur.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP locale des analyses du portefeuille")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+    servir(args.hote, args.port)
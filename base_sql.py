@@ -0,0 +1,352 @@
+import argparse
+import hashlib
+import importlib.util
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from referentiel import OHLCV, PANELS
+
+# Base SQL embarquée des cours, en format long (ticker, date, champ, valeur) : une ligne par valeur
+# présente, sans les cases vides d'un panel large où des milliers de séries se recouvrent peu. Les
+# questions sont posées au moteur (plage de dates, photo à une date, agrégats par période) au lieu de
+# charger les CSV dans pandas. DuckDB si le paquet est installé, sinon SQLite (bibliothèque standard).
+#
+# La base est remplie depuis les panels de cours (champ « clot ») et les fichiers OHLCV (ouv, haut, bas,
+# vol). Seuls les fichiers modifiés depuis le dernier chargement sont relus, et dans ceux-ci seules les
+# séries modifiées sont écrites : un jour de cours ajouté n'insère que les lignes de ce jour.
+#
+#   python base_sql.py                               # charge PANELS et OHLCV
+#   python base_sql.py --photo 2025-04-08
+#   python base_sql.py --agreger mois --fonction dernier --tickers SW.PA,CAP.PA
+
+MOTEUR = "duckdb" if importlib.util.find_spec("duckdb") else "sqlite"
+BASE = f"financial_data/cours.{MOTEUR}"
+# Champs lus dans les fichiers OHLCV ; les clôtures viennent des panels (séries en quarantaine retirées)
+CHAMPS_OHLCV = ["ouv", "haut", "bas", "vol"]
+
+# Clé de période de chaque fréquence d'agrégation (format strftime, identique dans les deux moteurs). Une
+# semaine est désignée par la date de son lundi (semaine ISO) : celle qui chevauche deux années n'est pas
+# coupée au 1er janvier comme avec %W
+FREQUENCES = {"jour": "%Y-%m-%d", "semaine": "%Y-%m-%d", "mois": "%Y-%m", "annee": "%Y"}
+LUNDI = {"sqlite": "date(date, '-6 days', 'weekday 1')", "duckdb": "date_trunc('week', date)"}
+FONCTIONS = {"min": "MIN(valeur)", "max": "MAX(valeur)", "moyenne": "AVG(valeur)", "somme": "SUM(valeur)",
+             "nombre": "COUNT(valeur)"}
+
+_SCHEMAS = {
+    "sqlite": [
+        "CREATE TABLE IF NOT EXISTS cours (ticker TEXT NOT NULL, date TEXT NOT NULL, champ TEXT NOT NULL, "
+        "valeur REAL, PRIMARY KEY (ticker, date, champ)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS series (ticker TEXT NOT NULL, champ TEXT NOT NULL, premiere_date TEXT, "
+        "derniere_date TEXT, valeurs INTEGER, empreinte TEXT, source TEXT, PRIMARY KEY (ticker, champ))",
+        "CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, version TEXT, tickers INTEGER, lignes INTEGER)",
+    ],
+    "duckdb": [
+        "CREATE TABLE IF NOT EXISTS cours (ticker VARCHAR NOT NULL, date DATE NOT NULL, champ VARCHAR NOT NULL, "
+        "valeur DOUBLE)",
+        "CREATE INDEX IF NOT EXISTS cours_ticker_date ON cours (ticker, date)",
+        # Sans clé primaire : DuckDB refuse de réinsérer une clé supprimée dans la même transaction
+        "CREATE TABLE IF NOT EXISTS series (ticker VARCHAR NOT NULL, champ VARCHAR NOT NULL, premiere_date DATE, "
+        "derniere_date DATE, valeurs INTEGER, empreinte VARCHAR, source VARCHAR)",
+        "CREATE TABLE IF NOT EXISTS sources (source VARCHAR PRIMARY KEY, version VARCHAR, tickers INTEGER, "
+        "lignes INTEGER)",
+    ],
+}
+
+
+def _periode(moteur, frequence):
+    if frequence not in FREQUENCES:
+        raise ValueError(f"frequence doit valoir {', '.join(FREQUENCES)}, pas {frequence!r}")
+    # strftime(format, date) pour SQLite, strftime(date, format) pour DuckDB
+    date = LUNDI[moteur] if frequence == "semaine" else "date"
+    if moteur == "sqlite":
+        return f"strftime('{FREQUENCES[frequence]}', {date})"
+    return f"strftime({date}, '{FREQUENCES[frequence]}')"
+
+
+def _version(chemin):
+    stat = os.stat(chemin)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _empreinte(jours, valeurs):
+    h = hashlib.blake2b(digest_size=8)
+    h.update(np.ascontiguousarray(jours, dtype="datetime64[D]").tobytes())
+    h.update(np.ascontiguousarray(valeurs, dtype=float).tobytes())
+    return h.hexdigest()
+
+
+def _series_matrice(valeurs, jours, colonnes, champ):
+    # Matrice dates x tickers -> (ticker, champ, dates, valeurs) des seules cases renseignées, colonne par colonne
+    valeurs = np.asarray(valeurs, dtype=float)
+    jours = np.asarray(jours).astype("datetime64[D]")
+    for j, ticker in enumerate(colonnes):
+        presentes = ~np.isnan(valeurs[:, j])
+        yield str(ticker), champ, jours[presentes], valeurs[presentes, j]
+
+
+class BaseCours:
+    def __init__(self, chemin=None, moteur=MOTEUR):
+        if moteur not in _SCHEMAS:
+            raise ValueError(f"moteur doit valoir 'duckdb' ou 'sqlite', pas {moteur!r}")
+        self.moteur = moteur
+        self.chemin = chemin or BASE.replace(f".{MOTEUR}", f".{moteur}")
+        os.makedirs(os.path.dirname(self.chemin) or ".", exist_ok=True)
+        # Une connexion partagée par les threads (API) : les accès sont sérialisés
+        self._verrou = threading.Lock()
+        if moteur == "duckdb":
+            import duckdb
+            self.connexion = duckdb.connect(self.chemin)
+        else:
+            import sqlite3
+            self.connexion = sqlite3.connect(self.chemin, check_same_thread=False, isolation_level=None)
+            self.connexion.execute("PRAGMA journal_mode=WAL")
+            self.connexion.execute("PRAGMA synchronous=NORMAL")
+        for instruction in _SCHEMAS[moteur]:
+            self.connexion.execute(instruction)
+
+    def fermer(self):
+        self.connexion.close()
+
+    def requete(self, sql, parametres=()):
+        # Résultat d'une requête SQL quelconque en DataFrame (colonnes « date » converties en dates)
+        with self._verrou:
+            curseur = self.connexion.execute(sql, list(parametres))
+            if self.moteur == "duckdb":
+                resultat = curseur.df()
+            else:
+                resultat = pd.DataFrame(curseur.fetchall(), columns=[d[0] for d in curseur.description])
+        if "date" in resultat:
+            resultat["date"] = pd.to_datetime(resultat["date"])
+        return resultat
+
+    # Chargement
+
+    def _supprimer(self, table, paires):
+        # Lignes des couples (ticker, champ) donnés
+        if self.moteur == "sqlite":
+            self.connexion.executemany(f"DELETE FROM {table} WHERE ticker = ? AND champ = ?", paires)
+        else:
+            self._inserer("a_supprimer", pd.DataFrame(paires, columns=["ticker", "champ"]), temporaire=True)
+            self.connexion.execute(f"DELETE FROM {table} WHERE EXISTS (SELECT 1 FROM a_supprimer s "
+                                   f"WHERE s.ticker = {table}.ticker AND s.champ = {table}.champ)")
+
+    def _inserer(self, table, df, temporaire=False):
+        # DuckDB lit le DataFrame directement ; SQLite reçoit des tuples Python (dates en texte ISO)
+        if self.moteur == "duckdb":
+            self.connexion.register("a_inserer", df)
+            if temporaire:
+                self.connexion.execute(f"CREATE OR REPLACE TEMP TABLE {table} AS SELECT * FROM a_inserer")
+            else:
+                self.connexion.execute(f"INSERT INTO {table} SELECT * FROM a_inserer")
+            self.connexion.unregister("a_inserer")
+        else:
+            marques = ", ".join("?" * df.shape[1])
+            self.connexion.executemany(f"INSERT INTO {table} VALUES ({marques})",
+                                       zip(*[df[c].tolist() for c in df.columns]))
+
+    def ecrire_series(self, series, source=None, version=None):
+        # series : itérable de (ticker, champ, dates croissantes, valeurs). Rend les lignes de chaque couple
+        # (ticker, champ) égales à la série donnée, en une transaction. Une série identique à celle en base
+        # n'est pas touchée ; une série dont l'historique déjà en base est inchangé (même empreinte jusqu'à sa
+        # dernière date connue) ne reçoit que ses nouvelles dates ; une série corrigée est réécrite. Les séries
+        # de la même source absentes de `series` (retirées du panel) sont supprimées. Renvoie le nombre de
+        # lignes écrites.
+        connues = {(t, c): (np.datetime64(pd.Timestamp(d), "D"), e, origine) for t, c, d, e, origine in self.requete(
+            "SELECT ticker, champ, derniere_date, empreinte, source FROM series").itertuples(index=False, name=None)}
+        presentes, a_reecrire, blocs, resumes = set(), [], [], []
+        n_tickers, n_lignes = set(), 0
+        for ticker, champ, jours, valeurs in series:
+            if not len(jours):
+                continue
+            cle = (ticker, champ)
+            presentes.add(cle)
+            n_tickers.add(ticker)
+            n_lignes += len(jours)
+            empreinte = _empreinte(jours, valeurs)
+            connue = connues.get(cle)
+            if connue is not None and connue[1] == empreinte:
+                continue
+            debut = 0
+            if connue is not None:
+                n = int(np.searchsorted(jours, connue[0], side="right"))
+                if n and _empreinte(jours[:n], valeurs[:n]) == connue[1]:
+                    debut = n
+                else:
+                    a_reecrire.append(cle)
+            blocs.append((ticker, champ, jours[debut:], valeurs[debut:]))
+            resumes.append((ticker, champ, str(jours[0]), str(jours[-1]), len(jours), empreinte, source))
+        retirees = [cle for cle, connue in connues.items()
+                    if source is not None and connue[2] == source and cle not in presentes]
+
+        tailles = [len(b[2]) for b in blocs]
+        nouvelles = pd.DataFrame({
+            "ticker": np.repeat([b[0] for b in blocs], tailles).astype(object),
+            "date": np.concatenate([b[2] for b in blocs]).astype(str) if blocs else np.empty(0, dtype=str),
+            "champ": np.repeat([b[1] for b in blocs], tailles).astype(object),
+            "valeur": np.concatenate([b[3] for b in blocs]) if blocs else np.empty(0),
+        })
+        resumes = pd.DataFrame(resumes, columns=["ticker", "champ", "premiere_date", "derniere_date", "valeurs",
+                                                 "empreinte", "source"])
+        with self._verrou:
+            c = self.connexion
+            c.execute("BEGIN")
+            try:
+                if a_reecrire or retirees:
+                    self._supprimer("cours", a_reecrire + retirees)
+                if len(resumes) or retirees:
+                    self._supprimer("series", retirees + [(t, ch) for t, ch in zip(resumes["ticker"], resumes["champ"])])
+                if len(resumes):
+                    self._inserer("series", resumes)
+                if len(nouvelles):
+                    self._inserer("cours", nouvelles)
+                if source is not None:
+                    c.execute("DELETE FROM sources WHERE source = ?", [source])
+                    c.execute("INSERT INTO sources VALUES (?, ?, ?, ?)", [source, version, len(n_tickers), n_lignes])
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+        return len(nouvelles)
+
+    def remplacer(self, lignes, source=None, version=None):
+        # Lignes longues (ticker, date, champ, valeur) : une série par couple (ticker, champ)
+        lignes = lignes.dropna(subset=["valeur"]).sort_values(["ticker", "champ", "date"], kind="stable")
+        return self.ecrire_series(((t, c, groupe["date"].to_numpy(dtype="datetime64[D]"),
+                                    groupe["valeur"].to_numpy(dtype=float))
+                                   for (t, c), groupe in lignes.groupby(["ticker", "champ"], sort=False)),
+                                  source, version)
+
+    def charger_panel(self, panel, champ="clot", source=None, version=None):
+        # Panel large (dates x tickers) : les cases vides ne sont pas écrites
+        panel = panel.sort_index()
+        return self.ecrire_series(_series_matrice(panel.to_numpy(dtype=float), panel.index.values, panel.columns,
+                                                  champ), source, version)
+
+    def charger_ohlcv(self, ohlcv, source=None, version=None):
+        # ohlcv : {champ: PanelCompact} (ingestion.lire_ohlcv)
+        return self.ecrire_series((serie for champ in CHAMPS_OHLCV for serie in _series_matrice(
+            ohlcv[champ].valeurs, ohlcv[champ].jours.astype("datetime64[D]"), ohlcv[champ].colonnes, champ)),
+            source, version)
+
+    def versions_sources(self):
+        return dict(self.requete("SELECT source, version FROM sources").itertuples(index=False, name=None))
+
+    def charger_fichiers(self, panels=PANELS, ohlcv=OHLCV, forcer=False):
+        # Recharge les fichiers modifiés depuis leur dernier chargement ; {fichier: lignes écrites}
+        from ingestion import charger_panel, lire_ohlcv
+
+        connues = self.versions_sources()
+        chargees = {}
+        for chemin in [p for p in panels if os.path.exists(p)] + [p for p in ohlcv if os.path.exists(p)]:
+            version = _version(chemin)
+            if not forcer and connues.get(chemin) == version:
+                continue
+            if chemin in ohlcv:
+                chargees[chemin] = self.charger_ohlcv(lire_ohlcv(chemin)[0], chemin, version)
+            else:
+                chargees[chemin] = self.charger_panel(charger_panel(chemin), "clot", chemin, version)
+        if chargees:
+            # Tout est reporté dans le fichier de base (et non laissé dans le journal) : son contenu ne change
+            # plus jusqu'au prochain chargement
+            with self._verrou:
+                self.connexion.execute("PRAGMA wal_checkpoint(TRUNCATE)" if self.moteur == "sqlite" else "CHECKPOINT")
+        return chargees
+
+    # Requêtes
+
+    def _filtres(self, tickers=None, debut=None, fin=None, champ="clot", table=""):
+        # Clause WHERE et ses paramètres (table : préfixe des colonnes, « s. » par exemple)
+        conditions, parametres = [f"{table}champ = ?"], [champ]
+        if tickers is not None:
+            tickers = list(tickers)
+            conditions.append(f"{table}ticker IN ({', '.join('?' * len(tickers))})" if tickers else "FALSE")
+            parametres += tickers
+        for operateur, date in ((">=", debut), ("<=", fin)):
+            if date is not None:
+                conditions.append(f"{table}date {operateur} ?")
+                parametres.append(pd.Timestamp(date).strftime("%Y-%m-%d"))
+        return " AND ".join(conditions), parametres
+
+    def plage(self, tickers=None, debut=None, fin=None, champ="clot", large=True):
+        # Valeurs d'un champ entre deux dates ; panel large (dates x tickers) ou lignes (ticker, date, valeur)
+        filtre, parametres = self._filtres(tickers, debut, fin, champ)
+        lignes = self.requete(f"SELECT ticker, date, valeur FROM cours WHERE {filtre} ORDER BY ticker, date", parametres)
+        if not large:
+            return lignes
+        panel = lignes.pivot(index="date", columns="ticker", values="valeur").rename_axis(columns=None)
+        return panel.reindex(columns=[t for t in tickers if t in panel.columns]) if tickers is not None else panel
+
+    def photo(self, date=None, tickers=None, champ="clot"):
+        # Dernière valeur connue de chaque ticker à la date donnée (ou à la dernière date), avec sa date :
+        # une recherche dans l'index (ticker, date) par série, sans parcourir l'historique
+        filtre, parametres = self._filtres(tickers, champ=champ, table="s.")
+        borne = "" if date is None else " AND m.date <= ?"
+        parametres = ([] if date is None else [pd.Timestamp(date).strftime("%Y-%m-%d")]) + parametres
+        return self.requete(
+            "SELECT s.ticker, c.date, c.valeur FROM series s JOIN cours c ON c.ticker = s.ticker "
+            "AND c.champ = s.champ AND c.date = (SELECT MAX(m.date) FROM cours m WHERE m.ticker = s.ticker "
+            f"AND m.champ = s.champ{borne}) WHERE {filtre} "
+            "ORDER BY s.ticker", parametres).set_index("ticker")
+
+    def agreger(self, frequence="mois", fonction="dernier", tickers=None, debut=None, fin=None, champ="clot", large=True):
+        # Agrégat d'un champ par ticker et par période, calculé par le moteur : premier, dernier, min, max,
+        # moyenne, somme, nombre
+        filtre, parametres = self._filtres(tickers, debut, fin, champ)
+        periode = _periode(self.moteur, frequence)
+        if fonction in ("premier", "dernier"):
+            ordre = "ASC" if fonction == "premier" else "DESC"
+            sql = (f"SELECT ticker, periode, valeur FROM (SELECT ticker, {periode} AS periode, valeur, "
+                   f"ROW_NUMBER() OVER (PARTITION BY ticker, {periode} ORDER BY date {ordre}) AS rang "
+                   f"FROM cours WHERE {filtre}) AS extremes WHERE rang = 1 ORDER BY ticker, periode")
+        elif fonction in FONCTIONS:
+            sql = (f"SELECT ticker, {periode} AS periode, {FONCTIONS[fonction]} AS valeur FROM cours "
+                   f"WHERE {filtre} GROUP BY ticker, periode ORDER BY ticker, periode")
+        else:
+            raise ValueError(f"fonction doit valoir premier, dernier, {', '.join(FONCTIONS)}, pas {fonction!r}")
+        lignes = self.requete(sql, parametres)
+        if not large:
+            return lignes
+        panel = lignes.pivot(index="periode", columns="ticker", values="valeur").rename_axis(columns=None)
+        return panel.reindex(columns=[t for t in tickers if t in panel.columns]) if tickers is not None else panel
+
+    def resume(self):
+        # Une ligne par ticker et champ : première et dernière date, nombre de valeurs
+        resume = self.requete("SELECT * FROM series ORDER BY ticker, champ")
+        return resume.astype({"premiere_date": "datetime64[ns]", "derniere_date": "datetime64[ns]"})
+
+
+_bases = {}
+_verrou_bases = threading.Lock()
+
+
+def charger_base(chemin=BASE):
+    # Une connexion par fichier de base et par processus
+    with _verrou_bases:
+        if chemin not in _bases:
+            _bases[chemin] = BaseCours(chemin)
+        return _bases[chemin]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Base SQL embarquée des cours")
+    parser.add_argument("--base", default=BASE)
+    parser.add_argument("--forcer", action="store_true", help="recharger tous les fichiers")
+    parser.add_argument("--photo", nargs="?", const="", help="dernières valeurs connues à cette date")
+    parser.add_argument("--agreger", choices=list(FREQUENCES))
+    parser.add_argument("--fonction", default="dernier")
+    parser.add_argument("--champ", default="clot")
+    parser.add_argument("--tickers", help="liste séparée par des virgules")
+    args = parser.parse_args()
+    base = BaseCours(args.base)
+    tickers = args.tickers.split(",") if args.tickers else None
+    if args.photo is not None:
+        print(base.photo(args.photo or None, tickers, args.champ).to_string())
+    elif args.agreger:
+        print(base.agreger(args.agreger, args.fonction, tickers, champ=args.champ).to_string())
+    else:
+        for chemin, lignes in base.charger_fichiers(forcer=args.forcer).items():
+            print(f"{chemin} : {lignes} lignes")
+        print(base.resume().groupby("champ")["valeurs"].agg(["count", "sum"]).to_string())
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Les modules du projet sont à la racine du dépôt (pas de paquet installé)
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RACINE not in sys.path:
+    sys.path.insert(0, RACINE)
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from alertes import MoteurAlertes
+
+from .donnees import panel_synthetique
+
+
+def _regles(tickers, n_regles, graine=0):
+    # Règles de drawdown, de cours et d'inactivité réparties sur 500 portefeuilles clients
+    rng = np.random.default_rng(graine)
+    mesures = rng.choice(["drawdown", "cours", "inactivite"], n_regles)
+    return pd.DataFrame({
+        "id": [f"R{i:06d}" for i in range(n_regles)],
+        "portefeuille": [f"CLIENT{i % 500:03d}" for i in range(n_regles)],
+        "mesure": mesures,
+        "actif": rng.choice(tickers, n_regles),
+        "operateur": ">",
+        "seuil": np.select([mesures == "drawdown", mesures == "cours"], [0.2, 200.0], 3.0),
+    })
+
+
+class AlertesIncrementales:
+    # Une nouvelle séance ajoutée au panel : suivi incrémental, ou tout recalculer depuis l'historique
+    params = ([100, 1000], [1000, 100000])
+    param_names = ["n_tickers", "n_regles"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_regles):
+        self.panel = panel_synthetique(n_tickers, 5)
+        self.regles = _regles(self.panel.columns, n_regles)
+        self.moteur = MoteurAlertes(self.regles)
+        self.moteur.mettre_a_jour(self.panel)
+        self.rng = np.random.default_rng(1)
+        self.jour = self.panel.index[-1]
+
+    def _seance(self):
+        # Séance suivante : 30 % des séries cotent
+        self.jour += pd.offsets.BDay()
+        derniers = self.moteur.dernier[self.moteur.series.get_indexer(self.panel.columns)]
+        valeurs = derniers * np.exp(self.rng.normal(0, 0.02, len(derniers)))
+        valeurs[self.rng.random(len(valeurs)) > 0.3] = np.nan
+        return pd.DataFrame([valeurs], index=[self.jour], columns=self.panel.columns)
+
+    def time_mise_a_jour(self, n_tickers, n_regles):
+        self.moteur.mettre_a_jour(self._seance())
+
+    def time_recalcul_historique(self, n_tickers, n_regles):
+        MoteurAlertes(self.regles).mettre_a_jour(self.panel)
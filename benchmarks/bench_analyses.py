@@ -0,0 +1,24 @@
+from analyses import calculer_drawdowns, calculer_performances, calculer_rendements
+
+from .donnees import ANNEES, TICKERS, panel_synthetique
+
+
+class AnalysesPanel:
+    params = (TICKERS, ANNEES)
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        self.panel = panel_synthetique(n_tickers, n_annees)
+
+    def time_calculer_rendements(self, n_tickers, n_annees):
+        calculer_rendements(self.panel)
+
+    def time_calculer_drawdowns(self, n_tickers, n_annees):
+        calculer_drawdowns(self.panel)
+
+    def time_calculer_performances(self, n_tickers, n_annees):
+        calculer_performances(self.panel)
+
+    def peakmem_calculer_performances(self, n_tickers, n_annees):
+        calculer_performances(self.panel)
@@ -0,0 +1,44 @@
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from base_sql import BaseCours
+
+from .donnees import panel_synthetique
+
+
+class BaseSQL:
+    # Requêtes poussées au moteur (SQLite sans DuckDB) sur un panel long, et chargement d'un jour de cours
+    params = ([100, 1000], [10])
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        self.dossier = tempfile.mkdtemp()
+        self.panel = panel_synthetique(n_tickers, n_annees)
+        self.base = BaseCours(os.path.join(self.dossier, "cours.base"))
+        self.base.charger_panel(self.panel, source="panel")
+        self.tickers = list(self.panel.columns[:5])
+        self.date = self.panel.index[len(self.panel) // 2]
+        self.jour = self.panel.index[-1]
+
+    def teardown(self, n_tickers, n_annees):
+        self.base.fermer()
+        shutil.rmtree(self.dossier, ignore_errors=True)
+
+    def time_plage(self, n_tickers, n_annees):
+        self.base.plage(self.tickers, self.date, self.date + pd.DateOffset(years=1))
+
+    def time_photo(self, n_tickers, n_annees):
+        self.base.photo(self.date)
+
+    def time_agreger_mois(self, n_tickers, n_annees):
+        self.base.agreger("mois", "dernier", self.tickers)
+
+    def time_charger_jour_ajoute(self, n_tickers, n_annees):
+        # Une nouvelle date à chaque appel : seules ses lignes sont insérées
+        self.jour += pd.offsets.BDay()
+        self.panel.loc[self.jour] = self.panel.iloc[-1].to_numpy() * 1.001
+        self.base.charger_panel(self.panel, source="panel")
@@ -0,0 +1,24 @@
+from calendrier import aligner, aligner_en_cache
+
+from .donnees import ANNEES, TICKERS, panel_synthetique
+
+
+class AlignementPanel:
+    params = (TICKERS, ANNEES, ["union", "XPAR"])
+    param_names = ["n_tickers", "n_annees", "calendrier"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees, calendrier):
+        if n_tickers * n_annees > 50000:
+            raise NotImplementedError
+        self.panel = panel_synthetique(n_tickers, n_annees)
+        aligner_en_cache(self.panel, calendrier, version="bench")
+
+    def time_aligner(self, n_tickers, n_annees, calendrier):
+        aligner(self.panel, calendrier)
+
+    def time_aligner_en_cache(self, n_tickers, n_annees, calendrier):
+        aligner_en_cache(self.panel, calendrier, version="bench")
+
+    def peakmem_aligner(self, n_tickers, n_annees, calendrier):
+        aligner(self.panel, calendrier)
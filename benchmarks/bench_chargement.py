@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+from ingestion import charger_panel
+from panel_partage import _nom, attacher_panel, publier_si_perime
+
+from .donnees import ANNEES, TICKERS, fichier_panel
+
+
+class ChargementPanel:
+    # Lecture du CSV large utilisé par chaque branche de dashSG.py
+    params = (TICKERS, ANNEES)
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        self.chemin = fichier_panel(n_tickers, n_annees)
+        self.partage = os.path.join(tempfile.gettempdir(), "bench_finance_durable", "partage")
+        self.version = publier_si_perime(self.chemin, self.partage)
+
+    def time_charger_panel(self, n_tickers, n_annees):
+        charger_panel(self.chemin)
+
+    def peakmem_charger_panel(self, n_tickers, n_annees):
+        charger_panel(self.chemin)
+
+    def time_attacher_panel_partage(self, n_tickers, n_annees):
+        # Coût pour un worker supplémentaire une fois le panel publié
+        attacher_panel(_nom(self.chemin), self.version, self.partage)
+
+    def peakmem_attacher_panel_partage(self, n_tickers, n_annees):
+        attacher_panel(_nom(self.chemin), self.version, self.partage)
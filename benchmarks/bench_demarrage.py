@@ -0,0 +1,26 @@
+from . import RACINE
+
+
+def _importer(module):
+    # Code mesuré et code de préparation, exécutés dans un interpréteur neuf
+    return f"import {module}", f"import sys; sys.path.insert(0, {RACINE!r})"
+
+
+class ImportModules:
+    # Coût d'import de chaque module au démarrage d'un worker
+    timeout = 120
+
+    def timeraw_import_ingestion(self):
+        return _importer("ingestion")
+
+    def timeraw_import_graphiques(self):
+        return _importer("graphiques")
+
+    def timeraw_import_instrumentation(self):
+        return _importer("instrumentation")
+
+    def timeraw_import_analyses(self):
+        return _importer("analyses")
+
+    def timeraw_import_demarrage(self):
+        return _importer("demarrage")
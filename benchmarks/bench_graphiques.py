@@ -0,0 +1,33 @@
+import pandas as pd
+
+from graphiques import figure_cours, figure_repartition, figure_scores_esg
+
+from .donnees import ANNEES, panel_synthetique
+
+
+class FiguresDashboard:
+    # Construction des figures d'une branche « action » de dashSG.py
+    params = ([10, 10000], ANNEES)
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        self.panel = panel_synthetique(n_tickers, n_annees)
+        self.symbole = self.panel.columns[0]
+        self.esg_data = pd.DataFrame({
+            "Entreprise": ["Sodexo", "Capgemini", "EssilorLuxottica", "Acer", "Yamaha"],
+            "Score ESG": [59, 80, 64, 88, 59]
+        })
+
+    def time_figure_cours(self, n_tickers, n_annees):
+        figure_cours(self.panel, self.symbole, "Actif")
+
+    def time_figure_cours_json(self, n_tickers, n_annees):
+        # Sérialisation envoyée au navigateur par st.plotly_chart
+        figure_cours(self.panel, self.symbole, "Actif").to_json()
+
+    def time_figure_scores_esg(self, n_tickers, n_annees):
+        figure_scores_esg(self.esg_data)
+
+    def time_figure_repartition(self, n_tickers, n_annees):
+        figure_repartition({"Actifs Projet": 25, "Obligations Corporate": 10, "Actions Durables Inclusion": 20}, "Répartition")
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from impact import COLONNES_KPIS, MoteurImpact
+
+
+def _kpis(n_projets, n_indicateurs=20, graine=0):
+    # Un chiffre d'affaires et n_indicateurs indicateurs par projet, sur trois années
+    rng = np.random.default_rng(graine)
+    projets = np.repeat([f"PROJET{p:05d}" for p in range(n_projets)], 3 * (n_indicateurs + 1))
+    indicateurs = np.tile(np.repeat(["Chiffre d'affaires"] + [f"Indicateur {k}" for k in range(n_indicateurs)], 3), n_projets)
+    kpis = pd.DataFrame({
+        "projet": projets,
+        "indicateur": indicateurs,
+        "valeur": rng.lognormal(10, 2, len(projets)),
+        "unite": np.where(indicateurs == "Chiffre d'affaires", "€", "unités"),
+        "annee": np.tile([2021, 2022, 2023], len(projets) // 3),
+    })
+    return kpis[COLONNES_KPIS]
+
+
+class ImpactAllocations:
+    params = ([100, 1000], [1, 1000])
+    param_names = ["n_projets", "n_allocations"]
+    timeout = 600
+
+    def setup(self, n_projets, n_allocations):
+        self.kpis = _kpis(n_projets)
+        rng = np.random.default_rng(1)
+        projets = self.kpis["projet"].unique()
+        self.allocations = pd.DataFrame(rng.uniform(0, 1e6, (n_allocations, n_projets)), columns=projets)
+        self.moteur = MoteurImpact(self.kpis, self.allocations)
+        self.projet = projets[0]
+        # Un indicateur d'un projet mis à jour
+        self.kpis_modifies = self.kpis.copy()
+        self.kpis_modifies.loc[1, "valeur"] *= 1.1
+
+    def time_calcul_complet(self, n_projets, n_allocations):
+        MoteurImpact(self.kpis, self.allocations)
+
+    def time_modification_montant(self, n_projets, n_allocations):
+        self.moteur.modifier_allocation({self.projet: np.random.uniform(0, 1e6)}, self.allocations.index[0])
+
+    def time_modification_kpi(self, n_projets, n_allocations):
+        self.moteur.mettre_a_jour_kpis(self.kpis_modifies)
+        self.moteur.mettre_a_jour_kpis(self.kpis)
@@ -0,0 +1,28 @@
+import shutil
+import tempfile
+
+from ingestion import lire_txt_en_dataframe, merge_fichiers_avec_isin
+
+from .donnees import ANNEES, fichiers_exports
+
+
+class IngestionTxt:
+    # Lecture des exports .txt et fusion en data_fonds.csv
+    # (la fusion par pd.merge successifs est quadratique : plafonnée à 1 000 fichiers)
+    params = ([10, 100, 1000], ANNEES)
+    param_names = ["n_fichiers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_fichiers, n_annees):
+        self.fichiers, self.mapping_isin = fichiers_exports(n_fichiers, n_annees)
+        self.sortie = tempfile.mkdtemp()
+
+    def time_lire_txt_en_dataframe(self, n_fichiers, n_annees):
+        lire_txt_en_dataframe(self.fichiers[0])
+
+    def time_merge_fichiers_avec_isin(self, n_fichiers, n_annees):
+        merge_fichiers_avec_isin(self.fichiers, self.mapping_isin, dossier_output=self.sortie)
+
+    def teardown(self, n_fichiers, n_annees):
+        # CSV, rapport qualité et OHLCV écrits par la fusion
+        shutil.rmtree(self.sortie, ignore_errors=True)
@@ -0,0 +1,44 @@
+from generateur import generer_releases_isr
+from ingestion import filtrer_fonds_isr
+from label_isr import HistoriqueISR, differences
+
+from .donnees import fichier_liste_isr, liste_isr_synthetique
+
+
+class FiltrageISR:
+    # Recherche des mots-clés dans les listes de fonds labellisés
+    params = [10, 1000, 10000]
+    param_names = ["n_fonds"]
+
+    def setup(self, n_fonds):
+        self.listes = [liste_isr_synthetique(n_fonds, graine=g) for g in (6, 7)]
+        self.fichier = fichier_liste_isr(n_fonds)
+
+    def time_filtrer_dataframes(self, n_fonds):
+        filtrer_fonds_isr(self.listes)
+
+    def time_filtrer_excel(self, n_fonds):
+        filtrer_fonds_isr([self.fichier])
+
+
+class DiffListesISR:
+    # Différences entre deux listes et historique de plusieurs releases
+    params = [1000, 10000, 100000]
+    param_names = ["n_fonds"]
+
+    def setup(self, n_fonds):
+        self.releases = generer_releases_isr(n_fonds, 5)
+        self.historique = HistoriqueISR()
+        for i, liste in enumerate(self.releases):
+            self.historique.ajouter_release(f"r{i}", liste)
+
+    def time_differences(self, n_fonds):
+        differences(self.releases[0], self.releases[1])
+
+    def time_ajouter_release(self, n_fonds):
+        historique = HistoriqueISR()
+        historique.ajouter_release("r0", self.releases[0])
+        historique.ajouter_release("r1", self.releases[1])
+
+    def time_differences_historique(self, n_fonds):
+        self.historique.differences("r0", "r4")
@@ -0,0 +1,23 @@
+from generateur import generer_ohlcv
+from liquidite import tableau_liquidite
+from panel_compact import PanelCompact
+
+from .donnees import ANNEES, TICKERS, panel_synthetique
+
+
+class IndicateursLiquidite:
+    params = (TICKERS, ANNEES)
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        if n_tickers * n_annees > 50000:
+            raise NotImplementedError
+        ohlcv = generer_ohlcv(panel_synthetique(n_tickers, n_annees))
+        self.ohlcv = {champ: PanelCompact.depuis_dataframe(df) for champ, df in ohlcv.items()}
+
+    def time_tableau_liquidite(self, n_tickers, n_annees):
+        tableau_liquidite(self.ohlcv, positions=1e6)
+
+    def peakmem_tableau_liquidite(self, n_tickers, n_annees):
+        tableau_liquidite(self.ohlcv, positions=1e6)
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from operations import AjusteurIncremental, ajuster_panel, charger_panels_ajustes
+from panel_partage import _nom, attacher_panel
+
+from .donnees import ANNEES, TICKERS, fichier_panel, panel_synthetique
+
+
+def _operations(panel, par_ticker_an=1, graine=0):
+    # Un dividende par ticker et par an, et quelques divisions
+    rng = np.random.default_rng(graine)
+    n = max(1, int(panel.shape[1] * len(panel) / 252 * par_ticker_an))
+    operations = pd.DataFrame({
+        "date": panel.index[rng.integers(0, len(panel), n)],
+        "ticker": rng.choice(panel.columns, n),
+        "type": rng.choice(["dividende", "division"], n, p=[0.98, 0.02]),
+    })
+    operations["valeur"] = np.where(operations["type"] == "division", 2.0, rng.uniform(0.1, 3.0, n))
+    return operations.drop_duplicates(["date", "ticker", "type"])
+
+
+class AjustementOperations:
+    params = (TICKERS, ANNEES)
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        if n_tickers * n_annees > 50000:
+            raise NotImplementedError
+        self.panel = panel_synthetique(n_tickers, n_annees)
+        self.operations = _operations(self.panel)
+
+    def time_ajustement_complet(self, n_tickers, n_annees):
+        ajuster_panel(self.panel, self.operations)
+
+    def peakmem_ajustement_complet(self, n_tickers, n_annees):
+        ajuster_panel(self.panel, self.operations)
+
+
+class AjoutDate:
+    # Nouvelle date en fin de panel : seule la dernière ligne est chaînée
+    params = (TICKERS, ANNEES)
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+    number = 1
+    warmup_time = 0
+
+    def setup(self, n_tickers, n_annees):
+        if n_tickers * n_annees > 50000:
+            raise NotImplementedError
+        self.panel = panel_synthetique(n_tickers, n_annees)
+        self.operations = _operations(self.panel)
+        self.ajusteur = AjusteurIncremental()
+        self.ajusteur.mettre_a_jour(self.panel.iloc[:-1], self.operations)
+
+    def time_ajout_d_une_date(self, n_tickers, n_annees):
+        self.ajusteur.mettre_a_jour(self.panel, self.operations)
+
+
+class PanelsAjustesPartages:
+    # Coût pour un worker une fois les panels ajustés publiés en mémoire partagée : attachement par mmap,
+    # sans recalcul ni copie
+    params = ([100, 1000], [5, 30])
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        self.dossier = tempfile.mkdtemp()
+        chemin = fichier_panel(n_tickers, n_annees)
+        charger_panels_ajustes(chemin, os.path.join(self.dossier, "operations.csv"), self.dossier)
+        nom = _nom(chemin)
+        self.noms = [f"{nom}.prix", f"{nom}.total"]
+
+    def teardown(self, n_tickers, n_annees):
+        shutil.rmtree(self.dossier, ignore_errors=True)
+
+    def time_attacher_panels_ajustes(self, n_tickers, n_annees):
+        [attacher_panel(nom, dossier=self.dossier) for nom in self.noms]
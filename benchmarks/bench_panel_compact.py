@@ -0,0 +1,35 @@
+from panel_compact import PanelCompact
+
+from .donnees import ANNEES, TICKERS, panel_synthetique
+
+
+class PanelCompactFloat32:
+    # Empreinte mémoire et accès aux séries : panel compact float32 face au DataFrame float64
+    params = (TICKERS, ANNEES)
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        if n_tickers * n_annees > 50000:
+            raise NotImplementedError
+        self.df = panel_synthetique(n_tickers, n_annees)
+        self.compact = PanelCompact.depuis_dataframe(self.df)
+        self.ticker = self.compact.colonnes[-1]
+
+    def track_octets_dataframe(self, n_tickers, n_annees):
+        return int(self.df.memory_usage(index=True, deep=True).sum())
+
+    def track_octets_compact(self, n_tickers, n_annees):
+        return self.compact.nbytes
+
+    def time_colonne_dataframe(self, n_tickers, n_annees):
+        self.df[self.ticker]
+
+    def time_colonne_compact(self, n_tickers, n_annees):
+        self.compact.colonne(self.ticker)
+
+    def time_fenetre_compact(self, n_tickers, n_annees):
+        self.compact.fenetre("2020-01-01", "2020-12-31")
+
+    def time_serie_compact(self, n_tickers, n_annees):
+        self.compact.serie(self.ticker)
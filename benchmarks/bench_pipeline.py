@@ -0,0 +1,39 @@
+import os
+import shutil
+import tempfile
+
+from pipeline import Etape, EtatPipeline, controler_panels, executer_pipeline, plan, tableau_performances
+
+from .donnees import fichier_panel
+
+
+class PassageDeNuit:
+    # Passage sans changement (empreintes reprises de l'état : seules les dates de modification sont lues),
+    # et empreinte d'un fichier de cours jamais vu
+    params = ([100, 1000], [10])
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        self.dossier = tempfile.mkdtemp()
+        self.csv_file = fichier_panel(n_tickers, n_annees)
+        qualite = os.path.join(self.dossier, "qualite.csv")
+        self.etapes = [
+            Etape("controles", controler_panels, {"panels": [self.csv_file]}, {"rapport": qualite}),
+            Etape("performances", tableau_performances, {"panels": [self.csv_file], "qualite": qualite},
+                  {"performances": os.path.join(self.dossier, "performances.csv")}),
+        ]
+        self.etat = os.path.join(self.dossier, "pipeline.json")
+        executer_pipeline(self.etapes, chemin_etat=self.etat)
+
+    def teardown(self, n_tickers, n_annees):
+        shutil.rmtree(self.dossier, ignore_errors=True)
+
+    def time_passage_a_jour(self, n_tickers, n_annees):
+        executer_pipeline(self.etapes, chemin_etat=self.etat)
+
+    def time_plan(self, n_tickers, n_annees):
+        plan(self.etapes, chemin_etat=self.etat)
+
+    def time_empreinte_nouveau_fichier(self, n_tickers, n_annees):
+        EtatPipeline(os.path.join(self.dossier, "absent.json")).empreinte(self.csv_file)
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+
+from panel_partage import _nom, attacher_panel
+from pyramide import NIVEAUX, Pyramide, charger_pyramides_ajustees
+
+from .donnees import ANNEES, TICKERS, fichier_panel, panel_synthetique
+
+
+class PyramideMultiResolution:
+    params = (TICKERS, ANNEES)
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        if n_tickers * n_annees > 50000:
+            raise NotImplementedError
+        self.panel = panel_synthetique(n_tickers, n_annees)
+        self.pyramide = Pyramide.depuis_panel(self.panel)
+        self.tickers = list(self.panel.columns[:10])
+
+    def time_construction(self, n_tickers, n_annees):
+        Pyramide.depuis_panel(self.panel)
+
+    def time_vue_max_niveau_choisi(self, n_tickers, n_annees):
+        # Zoom arrière complet : niveau le plus fin tenant dans 900 pixels
+        self.pyramide.vue(self.tickers)
+
+    def time_vue_max_journaliere(self, n_tickers, n_annees):
+        self.pyramide.vue(self.tickers, niveau="jour")
+
+    def track_points_vue_max(self, n_tickers, n_annees):
+        return len(self.pyramide.vue(self.tickers))
+
+
+class AjoutPyramide:
+    # Une date ajoutée : seules les dernières périodes de chaque niveau sont refaites
+    params = (TICKERS, ANNEES)
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+    number = 1
+    warmup_time = 0
+
+    def setup(self, n_tickers, n_annees):
+        if n_tickers * n_annees > 50000:
+            raise NotImplementedError
+        self.panel = panel_synthetique(n_tickers, n_annees)
+        self.pyramide = Pyramide.depuis_panel(self.panel.iloc[:-1])
+
+    def time_ajout_d_une_date(self, n_tickers, n_annees):
+        self.pyramide.mettre_a_jour(self.panel)
+
+
+class PyramidesPartagees:
+    # Coût pour un worker une fois les pyramides ajustées publiées : attachement des niveaux agrégés par mmap
+    # et pyramide montée sur ces tableaux, sans recalcul ni copie
+    params = ([100, 1000], [5, 30])
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        self.dossier = tempfile.mkdtemp()
+        chemin = fichier_panel(n_tickers, n_annees)
+        self.pyramides = charger_pyramides_ajustees(chemin, self.dossier)
+        nom = _nom(chemin)
+        self.jour = attacher_panel(f"{nom}.prix", dossier=self.dossier)
+        self.noms = [f"{nom}.prix.{niveau}" for niveau in NIVEAUX[1:]]
+        self.tickers = self.pyramides[0].colonnes[:10]
+
+    def teardown(self, n_tickers, n_annees):
+        shutil.rmtree(self.dossier, ignore_errors=True)
+
+    def time_attacher_pyramide(self, n_tickers, n_annees):
+        niveaux = [attacher_panel(nom, dossier=self.dossier) for nom in self.noms]
+        Pyramide.depuis_niveaux(self.jour, dict(zip(NIVEAUX[1:], niveaux)))
+
+    def time_vue_max_niveau_choisi(self, n_tickers, n_annees):
+        self.pyramides[0].vue(self.tickers)
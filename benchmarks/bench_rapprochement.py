@@ -0,0 +1,22 @@
+import pandas as pd
+
+from generateur import generer_liste_isr
+from rapprochement import COLONNES_DECISIONS, apparier, rapprocher, references
+
+
+class RapprochementNoms:
+    # Noms d'exports (compactés, sans espaces) rapprochés des fonds d'une liste ISR de n_fonds lignes
+    params = [1000, 10000, 100000]
+    param_names = ["n_fonds"]
+
+    def setup(self, n_fonds):
+        self.references = references([generer_liste_isr(n_fonds, graine=1)])
+        noms = self.references["nom"].sample(frac=0.5, random_state=0)
+        self.sources = (noms.str.upper().str.replace(" ", "", regex=False) + "RC").tolist()
+        self.decisions = pd.DataFrame(columns=COLONNES_DECISIONS)
+
+    def time_apparier(self, n_fonds):
+        apparier(self.sources, self.references["nom"])
+
+    def time_rapprocher(self, n_fonds):
+        rapprocher(self.sources, self.references, self.decisions)
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from simulation import SimulateurAllocation
+
+
+class SimulationAllocation:
+    # Un poids de poche ou de ligne déplacé (curseur) : mise à jour de rang 1, ou tout recalculer
+    params = [10, 100, 1000]
+    param_names = ["n_lignes"]
+
+    def setup(self, n_lignes):
+        rng = np.random.default_rng(0)
+        lignes = [f"L{i:05d}" for i in range(n_lignes)]
+        facteurs = rng.normal(0, 0.1, (n_lignes, 5))
+        covariance = facteurs @ facteurs.T + np.diag(rng.uniform(0.01, 0.09, n_lignes))
+        self.covariance = pd.DataFrame(covariance, index=lignes, columns=lignes)
+        self.esperances = pd.Series(rng.normal(0.05, 0.03, n_lignes), index=lignes)
+        self.scores = dict(zip(lignes[::2], rng.uniform(30, 90, len(lignes[::2]))))
+        # Trois poches de tailles égales
+        self.poches = {f"Poche {k}": {l: 1.0 for l in lignes[k::3]} for k in range(3)}
+        self.composition = {p: 20.0 for p in self.poches}
+        self.simulateur = SimulateurAllocation(self.covariance, self.esperances, self.scores,
+                                               poches=self.poches, composition=self.composition)
+        self.ligne = lignes[0]
+
+    def time_modifier_poche(self, n_lignes):
+        self.simulateur.modifier_poche("Poche 1", np.random.uniform(0, 40))
+        self.simulateur.indicateurs()
+        self.simulateur.contributions_risque()
+
+    def time_modifier_poids(self, n_lignes):
+        self.simulateur.modifier_poids(self.ligne, np.random.uniform(0, 1))
+        self.simulateur.indicateurs()
+
+    def time_recalcul_complet(self, n_lignes):
+        composition = dict(self.composition, **{"Poche 1": np.random.uniform(0, 40)})
+        simulateur = SimulateurAllocation(self.covariance, self.esperances, self.scores, poches=self.poches,
+                                          composition=composition)
+        simulateur.indicateurs()
+        simulateur.contributions_risque()
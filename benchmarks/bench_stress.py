@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from stress import fenetres_glissantes, grille_chocs, stresser
+
+from .donnees import ANNEES, TICKERS, panel_synthetique
+
+
+class StressPortefeuilles:
+    # Fenêtres historiques glissantes et grille de chocs, appliquées à 100 portefeuilles modèles
+    params = (TICKERS, ANNEES)
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        if n_tickers * n_annees > 50000:
+            raise NotImplementedError
+        self.panel = panel_synthetique(n_tickers, n_annees)
+        facteur = list(self.panel.columns[:min(10, n_tickers)])
+        self.facteurs = {"Actions": facteur}
+        self.scenarios = {**fenetres_glissantes(self.panel.index, pas=max(1, len(self.panel) // 400)),
+                          **grille_chocs(Actions=np.linspace(-0.4, 0.1, 11), taux=np.linspace(-0.01, 0.03, 9))}
+        rng = np.random.default_rng(0)
+        self.portefeuilles = pd.DataFrame(rng.dirichlet(np.ones(n_tickers), 100), columns=self.panel.columns)
+
+    def time_stresser(self, n_tickers, n_annees):
+        stresser(self.panel, self.portefeuilles, self.scenarios, self.facteurs)
+
+    def peakmem_stresser(self, n_tickers, n_annees):
+        stresser(self.panel, self.portefeuilles, self.scenarios, self.facteurs)
@@ -0,0 +1,33 @@
+import os
+import shutil
+import tempfile
+
+from generateur import ServeurCotations
+from telechargement import rafraichir_panel
+
+
+class TelechargementConcurrent:
+    # Rafraîchissement d'un an de cours depuis un serveur local (20 ms de latence par requête, 10 % de
+    # réponses 429/503 à retenter)
+    params = ([10, 100, 1000], [1, 16])
+    param_names = ["n_tickers", "concurrence"]
+    timeout = 600
+    number = 1
+    repeat = 3
+    warmup_time = 0
+
+    def setup(self, n_tickers, concurrence):
+        self.serveur = ServeurCotations(taux_erreur=0.1, latence=0.02).demarrer()
+        self.dossier = tempfile.mkdtemp()
+        self.tickers = [f"T{i:05d}" for i in range(n_tickers)]
+
+    def teardown(self, n_tickers, concurrence):
+        self.serveur.arreter()
+        shutil.rmtree(self.dossier, ignore_errors=True)
+
+    def time_rafraichir_panel(self, n_tickers, concurrence):
+        chemin = os.path.join(self.dossier, "panel.csv")
+        if os.path.exists(chemin):
+            os.remove(chemin)
+        rafraichir_panel(chemin, self.tickers, debut="2024-01-01", fin="2024-12-31", url=self.serveur.url,
+                         debit=1000, rafale=100, concurrence=concurrence, delai_initial=0.01)
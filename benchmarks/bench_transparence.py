@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from generateur import generer_inventaires
+from transparence import MatriceTransparence
+
+
+class TransparisationFonds:
+    # Portefeuilles de fonds transparisés sur un univers de 20 000 émetteurs
+    params = ([10, 100, 500], [1, 100])
+    param_names = ["n_fonds", "n_portefeuilles"]
+    timeout = 600
+
+    def setup(self, n_fonds, n_portefeuilles):
+        self.inventaires = generer_inventaires(n_fonds)
+        self.matrice = MatriceTransparence(self.inventaires)
+        rng = np.random.default_rng(0)
+        self.poids = pd.DataFrame(rng.dirichlet(np.ones(n_fonds), n_portefeuilles), columns=self.matrice.lignes)
+
+    def time_construction(self, n_fonds, n_portefeuilles):
+        MatriceTransparence(self.inventaires)
+
+    def time_exposition_emetteurs(self, n_fonds, n_portefeuilles):
+        self.matrice.exposition(self.poids)
+
+    def time_exposition_secteurs(self, n_fonds, n_portefeuilles):
+        self.matrice.exposition_par(self.poids, "secteur")
+
+    def peakmem_exposition_emetteurs(self, n_fonds, n_portefeuilles):
+        self.matrice.exposition(self.poids)
@@ -0,0 +1,21 @@
+from validation import controler_panel
+
+from .donnees import ANNEES, TICKERS, panel_synthetique
+
+
+class ControleQualite:
+    params = (TICKERS, ANNEES)
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+
+    def setup(self, n_tickers, n_annees):
+        # Au-delà de ~50 000 ticker-années, les matrices de travail dépassent quelques Go
+        if n_tickers * n_annees > 50000:
+            raise NotImplementedError
+        self.panel = panel_synthetique(n_tickers, n_annees)
+
+    def time_controler_panel(self, n_tickers, n_annees):
+        controler_panel(self.panel)
+
+    def peakmem_controler_panel(self, n_tickers, n_annees):
+        controler_panel(self.panel)
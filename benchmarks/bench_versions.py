@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from versions import enregistrer_panel, lire_panel
+
+from .donnees import panel_synthetique
+
+
+class VersionsPanel:
+    # Historique des panels : première version, version du lendemain (une date ajoutée, seuls les morceaux du
+    # dernier mois sont réécrits), série ajoutée (seuls ses morceaux sont écrits), relecture complète ou de
+    # quelques colonnes
+    params = ([100, 1000], [10])
+    param_names = ["n_tickers", "n_annees"]
+    timeout = 600
+    number = 1
+    repeat = 5
+    warmup_time = 0
+
+    def setup(self, n_tickers, n_annees):
+        self.dossier = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.dossier, "panel.csv")
+        self.panel = panel_synthetique(n_tickers, n_annees)
+        enregistrer_panel(self.csv_file, self.panel)
+        self.jour = self.panel.index[-1]
+        self.colonnes = list(self.panel.columns[::max(n_tickers // 5, 1)])
+
+    def teardown(self, n_tickers, n_annees):
+        shutil.rmtree(self.dossier, ignore_errors=True)
+
+    def time_premiere_version(self, n_tickers, n_annees):
+        enregistrer_panel(self.csv_file, self.panel, dossier=tempfile.mkdtemp(dir=self.dossier))
+
+    def time_version_suivante(self, n_tickers, n_annees):
+        # Une nouvelle date à chaque appel : chaque appel enregistre bien une version
+        self.jour += pd.offsets.BDay()
+        self.panel.loc[self.jour] = self.panel.iloc[-1].to_numpy() * 1.001
+        enregistrer_panel(self.csv_file, self.panel)
+
+    def time_ajout_d_une_serie(self, n_tickers, n_annees):
+        # Une nouvelle colonne à chaque appel
+        self.panel[f"FONDS{len(self.panel.columns)}"] = self.panel.iloc[:, 0].to_numpy()
+        enregistrer_panel(self.csv_file, self.panel)
+
+    def time_lire_panel(self, n_tickers, n_annees):
+        lire_panel(self.csv_file)
+
+    def time_lire_colonnes(self, n_tickers, n_annees):
+        lire_panel(self.csv_file, colonnes=self.colonnes)
@@ -0,0 +1,59 @@
+import os
+import tempfile
+
+import pandas as pd
+
+from generateur import ecrire_export_txt, ecrire_liste_isr, ecrire_panel_csv, generer_liste_isr, generer_panel
+
+# Tailles de panel couvertes par les benchmarks
+TICKERS = [10, 100, 1000, 10000]
+ANNEES = [1, 5, 30]
+
+DOSSIER_CACHE = os.path.join(tempfile.gettempdir(), "bench_finance_durable")
+
+
+def _periode(n_annees):
+    fin = pd.Timestamp("2025-04-09")
+    return {"debut": fin - pd.DateOffset(years=n_annees), "fin": fin}
+
+
+def panel_synthetique(n_tickers, n_annees, graine=0):
+    return generer_panel(n_tickers, places=("XPAR", "XTKS", "XTAI"), graine=graine, **_periode(n_annees))
+
+
+def fichier_panel(n_tickers, n_annees):
+    # CSV large au format de financial_data/data_actifs.csv, écrit une seule fois
+    os.makedirs(DOSSIER_CACHE, exist_ok=True)
+    chemin = os.path.join(DOSSIER_CACHE, f"panel_{n_tickers}_{n_annees}.csv")
+    if not os.path.exists(chemin):
+        ecrire_panel_csv(chemin, n_tickers, places=("XPAR", "XTKS", "XTAI"), **_periode(n_annees))
+    return chemin
+
+
+def fichiers_exports(n_fichiers, n_annees):
+    # Un export .txt par fonds, et le mapping fichier -> ISIN correspondant
+    dossier = os.path.join(DOSSIER_CACHE, f"exports_{n_fichiers}_{n_annees}")
+    panel = None
+    fichiers, mapping_isin = [], {}
+    os.makedirs(dossier, exist_ok=True)
+    for i in range(n_fichiers):
+        chemin = os.path.join(dossier, f"FONDS{i:05d}.txt")
+        if not os.path.exists(chemin):
+            if panel is None:
+                panel = generer_panel(n_fichiers, places=("FONDS",), graine=1, **_periode(n_annees))
+            ecrire_export_txt(panel.iloc[:, i], chemin)
+        fichiers.append(chemin)
+        mapping_isin[chemin] = f"FR{i:010d}"
+    return fichiers, mapping_isin
+
+
+def liste_isr_synthetique(n_fonds, graine=0):
+    return generer_liste_isr(n_fonds, graine=graine)
+
+
+def fichier_liste_isr(n_fonds):
+    os.makedirs(DOSSIER_CACHE, exist_ok=True)
+    chemin = os.path.join(DOSSIER_CACHE, f"liste_isr_{n_fonds}.xlsx")
+    if not os.path.exists(chemin):
+        ecrire_liste_isr(chemin, generer_liste_isr(n_fonds))
+    return chemin
@@ -0,0 +1,213 @@
+import datetime as dt
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Calendriers de cotation des places présentes dans les fichiers de cours, et alignement des panels
+# sur un calendrier commun.
+# "FONDS" désigne le calendrier de publication des valeurs liquidatives des fonds français/luxembourgeois.
+
+# Jours fériés à date fixe (mois, jour) par place de cotation
+FERIES_FIXES = {
+    "XPAR": [(1, 1), (5, 1), (12, 25), (12, 26)],
+    "XTKS": [(1, 1), (1, 2), (1, 3), (2, 11), (4, 29), (5, 3), (5, 4), (5, 5), (11, 3), (11, 23), (12, 31)],
+    "XTAI": [(1, 1), (2, 28), (4, 4), (5, 1), (10, 10)],
+    "FONDS": [(1, 1), (12, 25)],
+}
+
+# Fêtes du calendrier lunaire pour la bourse de Taïwan (dates grégoriennes)
+NOUVEL_AN_LUNAIRE = {
+    2000: (2, 5), 2001: (1, 24), 2002: (2, 12), 2003: (2, 1), 2004: (1, 22), 2005: (2, 9), 2006: (1, 29),
+    2007: (2, 18), 2008: (2, 7), 2009: (1, 26), 2010: (2, 14), 2011: (2, 3), 2012: (1, 23), 2013: (2, 10),
+    2014: (1, 31), 2015: (2, 19), 2016: (2, 8), 2017: (1, 28), 2018: (2, 16), 2019: (2, 5), 2020: (1, 25),
+    2021: (2, 12), 2022: (2, 1), 2023: (1, 22), 2024: (2, 10), 2025: (1, 29), 2026: (2, 17), 2027: (2, 6),
+    2028: (1, 26), 2029: (2, 13), 2030: (2, 3),
+}
+BATEAUX_DRAGONS = {
+    2000: (6, 6), 2001: (6, 25), 2002: (6, 15), 2003: (6, 4), 2004: (6, 22), 2005: (6, 11), 2006: (5, 31),
+    2007: (6, 19), 2008: (6, 8), 2009: (5, 28), 2010: (6, 16), 2011: (6, 6), 2012: (6, 23), 2013: (6, 12),
+    2014: (6, 2), 2015: (6, 20), 2016: (6, 9), 2017: (5, 30), 2018: (6, 18), 2019: (6, 7), 2020: (6, 25), 2021: (6, 14),
+    2022: (6, 3), 2023: (6, 22), 2024: (6, 10), 2025: (5, 31), 2026: (6, 19), 2027: (6, 9), 2028: (5, 28),
+    2029: (6, 16), 2030: (6, 5),
+}
+MI_AUTOMNE = {
+    2000: (9, 12), 2001: (10, 1), 2002: (9, 21), 2003: (9, 11), 2004: (9, 28), 2005: (9, 18), 2006: (10, 6),
+    2007: (9, 25), 2008: (9, 14), 2009: (10, 3), 2010: (9, 22), 2011: (9, 12), 2012: (9, 30), 2013: (9, 19),
+    2014: (9, 8), 2015: (9, 27), 2016: (9, 15), 2017: (10, 4), 2018: (9, 24), 2019: (9, 13), 2020: (10, 1), 2021: (9, 21),
+    2022: (9, 10), 2023: (9, 29), 2024: (9, 17), 2025: (10, 6), 2026: (9, 25), 2027: (9, 15), 2028: (10, 3),
+    2029: (9, 22), 2030: (9, 12),
+}
+
+# Années couvertes par les tables de jours fériés (calculées une fois par place) : celles des fêtes lunaires,
+# hors desquelles les fermetures de Taïwan seraient manquantes
+ANNEES_TABLES = range(max(min(t) for t in (NOUVEL_AN_LUNAIRE, BATEAUX_DRAGONS, MI_AUTOMNE)),
+                      min(max(t) for t in (NOUVEL_AN_LUNAIRE, BATEAUX_DRAGONS, MI_AUTOMNE)) + 1)
+
+
+def _paques(annee):
+    # Algorithme de Meeus/Jones/Butcher (calendrier grégorien)
+    a, b, c = annee % 19, annee // 100, annee % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mois = (h + l - 7 * m + 114) // 31
+    jour = (h + l - 7 * m + 114) % 31 + 1
+    return dt.date(annee, mois, jour)
+
+
+def _nieme_lundi(annee, mois, n):
+    premier = dt.date(annee, mois, 1)
+    return premier + dt.timedelta(days=(7 - premier.weekday()) % 7 + 7 * (n - 1))
+
+
+def _feries_japon(annee):
+    # Fêtes mobiles japonaises (lundis, équinoxes) et jours de remplacement quand une fête tombe un dimanche
+    feries = [dt.date(annee, mois, jour) for mois, jour in FERIES_FIXES["XTKS"]]
+    feries.append(dt.date(annee, 2, 23) if annee >= 2020 else dt.date(annee, 12, 23))
+    feries += [_nieme_lundi(annee, 1, 2), _nieme_lundi(annee, 7, 3), _nieme_lundi(annee, 9, 3), _nieme_lundi(annee, 10, 2)]
+    if annee >= 2016:
+        feries.append(dt.date(annee, 8, 11))
+    decalage = int((annee - 1980) / 4)
+    feries.append(dt.date(annee, 3, int(20.8431 + 0.242194 * (annee - 1980) - decalage)))
+    feries.append(dt.date(annee, 9, int(23.2488 + 0.242194 * (annee - 1980) - decalage)))
+    remplacements = []
+    for jour in sorted(set(feries)):
+        if jour.weekday() == 6:
+            suivant = jour + dt.timedelta(days=1)
+            while suivant in feries or suivant in remplacements:
+                suivant += dt.timedelta(days=1)
+            remplacements.append(suivant)
+    return feries + remplacements
+
+
+def _feries_taiwan(annee):
+    feries = [dt.date(annee, mois, jour) for mois, jour in FERIES_FIXES["XTAI"]]
+    if annee in NOUVEL_AN_LUNAIRE:
+        # Fermeture approximative : veille du Nouvel An lunaire et trois jours suivants
+        nouvel_an = dt.date(annee, *NOUVEL_AN_LUNAIRE[annee])
+        feries += [nouvel_an + dt.timedelta(days=d) for d in range(-1, 4)]
+    for table in (BATEAUX_DRAGONS, MI_AUTOMNE):
+        if annee in table:
+            feries.append(dt.date(annee, *table[annee]))
+    return feries
+
+
+@lru_cache(maxsize=None)
+def table_feries(place):
+    # Table précalculée des jours fériés d'une place sur ANNEES_TABLES
+    feries = []
+    for annee in ANNEES_TABLES:
+        if place == "XTKS":
+            feries += _feries_japon(annee)
+        elif place == "XTAI":
+            feries += _feries_taiwan(annee)
+        else:
+            feries += [dt.date(annee, mois, jour) for mois, jour in FERIES_FIXES.get(place, [])]
+            if place in ("XPAR", "FONDS"):
+                paques = _paques(annee)
+                feries += [paques - dt.timedelta(days=2), paques + dt.timedelta(days=1)]
+    return pd.DatetimeIndex(sorted(set(feries)))
+
+
+def jours_feries(place, annees):
+    annees = list(annees)
+    table = table_feries(place)
+    return table[table.year.isin(annees)]
+
+
+def jours_ouvres(place, debut, fin):
+    jours = np.arange(np.datetime64(pd.Timestamp(debut).date()), np.datetime64(pd.Timestamp(fin).date()) + 1)
+    feries = table_feries(place).values.astype("datetime64[D]")
+    return pd.DatetimeIndex(jours[np.is_busday(jours, holidays=feries)]).as_unit("ns")
+
+
+# Suffixe Yahoo Finance -> place de cotation
+SUFFIXES = {".PA": "XPAR", ".TW": "XTAI", ".T": "XTKS"}
+
+
+def place_de(ticker):
+    # Les identifiants sans suffixe (ISIN, codes Morningstar .F) sont des fonds
+    for suffixe, place in SUFFIXES.items():
+        if str(ticker).endswith(suffixe):
+            return place
+    return "FONDS"
+
+
+def aligner(panel, calendrier="XPAR", limite=5):
+    # Vue « as of » du panel sur un calendrier cible : à chaque date, dernière valeur connue de chaque
+    # série si elle date d'au plus `limite` séances de la place cible (jours ouvrés pour "union", "ouvres" ou
+    # un DatetimeIndex), NaN sinon.
+    # calendrier : une place ("XPAR", "XTKS", ...), "union" (toutes les dates du panel), "ouvres"
+    # (lundi-vendredi) ou un DatetimeIndex.
+    panel = panel.sort_index()
+    index = panel.index
+    if len(index) == 0:
+        return panel
+    if isinstance(calendrier, pd.DatetimeIndex):
+        cible = calendrier
+    elif calendrier == "union":
+        cible = index
+    elif calendrier == "ouvres":
+        cible = pd.bdate_range(index[0], index[-1])
+    else:
+        cible = jours_ouvres(calendrier, index[0], index[-1])
+    cible = cible.rename(index.name)
+
+    # Position de la dernière observation valide de chaque série, à chaque ligne du panel source
+    valeurs = panel.to_numpy(dtype="float64")
+    lignes = np.arange(len(index), dtype=np.int32)[:, None]
+    derniere = np.maximum.accumulate(np.where(~np.isnan(valeurs), lignes, np.int32(-1)), axis=0)
+
+    # Ligne source applicable à chaque date cible (dernière date <= date cible)
+    source = index.searchsorted(cible, side="right") - 1
+    positions = np.where(source[:, None] >= 0, derniere[np.maximum(source, 0)], -1)
+    alignees = np.take_along_axis(valeurs, np.maximum(positions, 0), axis=0)
+
+    # Ancienneté en séances entre l'observation utilisée et la date cible (rangs de séances calculés une
+    # fois par date, puis simple soustraction sur la matrice)
+    origine = index.values[0].astype("datetime64[D]")
+    place = isinstance(calendrier, str) and calendrier not in ("union", "ouvres")
+    feries = table_feries(calendrier).values.astype("datetime64[D]") if place else []
+    rang_obs = np.busday_count(origine, index.values.astype("datetime64[D]"), holidays=feries)
+    rang_cible = np.busday_count(origine, cible.values.astype("datetime64[D]"), holidays=feries)
+    anciennete = rang_cible[:, None] - rang_obs[np.maximum(positions, 0)]
+    alignees[(positions < 0) | (anciennete > limite)] = np.nan
+    return pd.DataFrame(alignees, index=cible, columns=panel.columns)
+
+
+# Vues alignées déjà calculées : (version du panel, calendrier, limite) -> DataFrame
+_cache = OrderedDict()
+_verrou = threading.Lock()
+TAILLE_CACHE = 16
+
+
+def version_panel(panel):
+    # Version publiée (panel_partage) si elle existe, sinon empreinte du contenu
+    if "version" in panel.attrs:
+        return ("version", tuple(panel.columns), panel.attrs["version"], panel.attrs.get("source_mtime_ns"))
+    empreinte = hashlib.sha256(pd.util.hash_pandas_object(panel, index=True).to_numpy().tobytes())
+    empreinte.update(repr(tuple(panel.columns)).encode())
+    return ("contenu", empreinte.hexdigest())
+
+
+def aligner_en_cache(panel, calendrier="XPAR", limite=5, version=None):
+    # Une seule vue alignée par version de panel, partagée par les analyses et les graphiques
+    cle_calendrier = tuple(calendrier) if isinstance(calendrier, pd.DatetimeIndex) else calendrier
+    cle = (version if version is not None else version_panel(panel), cle_calendrier, limite)
+    with _verrou:
+        if cle in _cache:
+            _cache.move_to_end(cle)
+            return _cache[cle]
+    vue = aligner(panel, calendrier, limite)
+    with _verrou:
+        _cache[cle] = vue
+        while len(_cache) > TAILLE_CACHE:
+            _cache.popitem(last=False)
+    return vue
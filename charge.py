@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Test de charge du dashboard sans navigateur : N sessions simultanées dans un même processus (comme les
+# sessions d'un serveur Streamlit), pilotées par l'API de test de Streamlit. Chaque session clique au hasard
+# dans sa page (catégories, actifs, périodes, montants, boutons) et chaque réexécution est chronométrée.
+#
+#   python charge.py                                   # 1, 5, 10 et 20 sessions, 30 s par palier
+#   python charge.py --sessions 1,10,50 --duree 60 --pages dashSG.py,codeStreamli.py --json charge.json
+#
+# Par palier : latence des réexécutions (p50, p95, p99), réexécutions par seconde, erreurs, mémoire
+# résidente du processus et par session, CPU consommé (en cœurs). Tout tourne en local sur financial_data/.
+
+PAGES = ["dashSG.py", "ptfSG.py", "stressSG.py"]
+# Pages déclarées dans la navigation de codeStreamli.py : elle ne se construit que si toutes existent
+NAVIGATION = ["dashGE.py", "dashSG.py", "dashES.py", "dashEG.py", "stressSG.py"]
+SESSIONS = [1, 5, 10, 20]
+DUREE = 30.0
+DELAI_MAX = 120
+
+
+def _rss():
+    # Mémoire résidente actuelle du processus (octets)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _cpu():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _action_aleatoire(at, rng):
+    # Un clic au hasard parmi les widgets affichés ; renvoie une description de l'action (None sans widget)
+    widgets = [w for w in list(at.radio) + list(at.selectbox) if len(w.options) > 1]
+    widgets += list(at.checkbox) + list(at.toggle) + list(at.number_input) + list(at.button)
+    if not widgets:
+        return None
+    widget = widgets[rng.integers(len(widgets))]
+    type_ = type(widget).__name__
+    if type_ in ("Radio", "Selectbox"):
+        widget.set_value(widget.options[rng.integers(len(widget.options))])
+    elif type_ in ("Checkbox", "Toggle"):
+        widget.set_value(not widget.value)
+    elif type_ == "NumberInput":
+        pas = widget.step or 1
+        widget.set_value(type(widget.value)(max(widget.min or 0, widget.value + pas * rng.integers(-5, 6))))
+    else:
+        widget.click()
+    return f"{type_}:{widget.label}"
+
+
+class Session(threading.Thread):
+    def __init__(self, page, graine, fin, latences, erreurs, verrou):
+        super().__init__(daemon=True)
+        self.page, self.fin = page, fin
+        self.rng = np.random.default_rng(graine)
+        self.latences, self.erreurs, self.verrou = latences, erreurs, verrou
+
+    def _executer(self, at):
+        debut = time.perf_counter()
+        at.run(timeout=DELAI_MAX)
+        duree = time.perf_counter() - debut
+        with self.verrou:
+            self.latences.append(duree)
+            self.erreurs.extend(f"{self.page} : {e.message}" for e in at.exception)
+
+    def run(self):
+        from streamlit.testing.v1 import AppTest
+
+        try:
+            at = AppTest.from_file(self.page, default_timeout=DELAI_MAX)
+            navigation = [p for p in NAVIGATION if os.path.exists(p)]
+            self._executer(at)
+            while time.perf_counter() < self.fin:
+                # Dans la navigation, une action sur trois change de page ; sans widget, simple réaffichage
+                if self.page == "codeStreamli.py" and navigation and self.rng.random() < 1 / 3:
+                    at.switch_page(navigation[self.rng.integers(len(navigation))])
+                else:
+                    _action_aleatoire(at, self.rng)
+                self._executer(at)
+        except Exception as e:
+            with self.verrou:
+                self.erreurs.append(f"{self.page} : {type(e).__name__}: {e}")
+
+
+def mesurer_palier(n_sessions, pages=PAGES, duree=DUREE, graine=0):
+    # n_sessions sessions réparties sur les pages, pendant `duree` secondes
+    latences, erreurs, verrou = [], [], threading.Lock()
+    memoire_avant, cpu_avant, debut = _rss(), _cpu(), time.perf_counter()
+    fin = debut + duree
+    sessions = [Session(pages[i % len(pages)], [graine, i], fin, latences, erreurs, verrou) for i in range(n_sessions)]
+    pic = [memoire_avant]
+
+    def echantillonner():
+        while any(s.is_alive() for s in sessions):
+            pic[0] = max(pic[0], _rss())
+            time.sleep(0.2)
+
+    for session in sessions:
+        session.start()
+    echantillonneur = threading.Thread(target=echantillonner, daemon=True)
+    echantillonneur.start()
+    for session in sessions:
+        session.join(duree + DELAI_MAX)
+    echantillonneur.join(1)
+    ecoule = time.perf_counter() - debut
+
+    latences = np.array(latences) if latences else np.array([np.nan])
+    p50, p95, p99 = np.percentile(latences, [50, 95, 99])
+    return {
+        "sessions": n_sessions,
+        "reexecutions": int(np.isfinite(latences).sum()),
+        "par_seconde": float(np.isfinite(latences).sum() / ecoule),
+        "p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(np.nanmax(latences)),
+        "erreurs": len(erreurs),
+        "exemples_erreurs": sorted(set(erreurs))[:5],
+        "rss_mo": pic[0] / 2 ** 20,
+        "rss_par_session_mo": (pic[0] - memoire_avant) / 2 ** 20 / n_sessions,
+        "cpu_coeurs": (_cpu() - cpu_avant) / ecoule,
+    }
+
+
+def prechauffer(pages=PAGES):
+    # Une exécution de chaque page : imports et caches des données chargés comme sur un serveur lancé
+    from streamlit.testing.v1 import AppTest
+
+    for page in pages:
+        AppTest.from_file(page, default_timeout=DELAI_MAX).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test de charge du dashboard (sessions simultanées, sans navigateur)")
+    parser.add_argument("--sessions", default=",".join(map(str, SESSIONS)), help="paliers, ex. 1,5,10,20")
+    parser.add_argument("--duree", type=float, default=DUREE, help="durée de chaque palier en secondes")
+    parser.add_argument("--pages", default=",".join(PAGES))
+    parser.add_argument("--json", help="fichier où écrire les résultats")
+    args = parser.parse_args()
+
+    pages = [p for p in args.pages.split(",") if os.path.exists(p)]
+    manquantes = [p for p in NAVIGATION if not os.path.exists(p)]
+    if "codeStreamli.py" in pages and manquantes:
+        # Sinon chaque session mesurerait l'erreur « Unable to create Page » au lieu de la navigation
+        print(f"codeStreamli.py ignoré : pages de la navigation absentes ({', '.join(manquantes)})", file=sys.stderr)
+        pages.remove("codeStreamli.py")
+    if not pages:
+        sys.exit("Aucune page trouvée")
+    # Les erreurs des pages sont comptées dans le rapport : pas de trace Streamlit à chaque réexécution
+    from streamlit import logger
+    logger.set_log_level("critical")
+    prechauffer(pages)
+    resultats = []
+    print(f"{'sessions':>8} {'réexéc.':>8} {'/s':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'RSS Mo':>8} "
+          f"{'Mo/sess.':>8} {'CPU':>5} {'erreurs':>7}")
+    for n in [int(n) for n in args.sessions.split(",")]:
+        r = mesurer_palier(n, pages, args.duree)
+        resultats.append(r)
+        print(f"{n:>8} {r['reexecutions']:>8} {r['par_seconde']:>6.1f} {r['p50']:>7.3f} {r['p95']:>7.3f} "
+              f"{r['p99']:>7.3f} {r['rss_mo']:>8.0f} {r['rss_par_session_mo']:>8.1f} {r['cpu_coeurs']:>5.2f} "
+              f"{r['erreurs']:>7}")
+        for erreur in r["exemples_erreurs"]:
+            print(f"{'':>8} {erreur}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(resultats, f, indent=2, ensure_ascii=False)
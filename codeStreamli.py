@@ -1,11 +1,21 @@
+import os
 import streamlit as st
 
+from demarrage import lancer_prechauffage
+from instrumentation import chrono
+
+# Imports lourds et panels chargés en arrière-plan dès la première requête du worker
+lancer_prechauffage()
+
 pages = {
     "Investir avec nous": [
         st.Page("dashGE.py", title="Général"),
         st.Page("dashSG.py", title="Investissement Socialement Responsable : Inclusion et Équité"),
         st.Page("dashES.py", title="Investissement Écologiquement Responsable : Eau"),
         st.Page("dashEG.py", title="Investissement Ethique : Investir en Europe"),
+    ],
+    "Risques": [
+        st.Page("stressSG.py", title="Scénarios de stress"),
     ]
     #"Resources": [
         #st.Page("learn.py", title="Learn about us"),
@@ -13,5 +23,10 @@ pages = {
     #],
 }
 
+# Page de profilage, affichée seulement si PROFILAGE=1 au lancement du serveur
+if os.environ.get("PROFILAGE") == "1":
+    pages["Outils"] = [st.Page("profilage.py", title="Profilage")]
+
 pg = st.navigation(pages)
-pg.run()
\ No newline at end of file
+with chrono("page", pg.title):
+    pg.run()
@@ -1,8 +1,10 @@
 
+
 import streamlit as st
-import pandas as pd
-import yfinance as yf
-import plotly.express as px
+
+from graphiques import figure_cours, figure_repartition, figure_scores_esg
+from instrumentation import chrono
+from referentiel import COMPOSITION_SPE, donnees_scores_esg
 
 # -------------------------------
 # TITRE ET INTRODUCTION
@@ -23,14 +25,42 @@ st.markdown(
 # -------------------------------
 st.header("Composition de la partie spécifique liée à la thématique de l'inclusion sociale")
 
-composition_spe = {
-    "Actifs Projet": 25,
-    "Obligations Corporate": 10,
-    "Actions Durables Inclusion": 20
-}
-df_generale = pd.DataFrame(list(composition_spe.items()), columns=["Actif", "Poids (%)"])
-fig_generale = px.pie(df_generale, values="Poids (%)", names="Actif", title="Répartition des actifs de la partie spécifique")
-st.plotly_chart(fig_generale, use_container_width=True)
+composition_spe = COMPOSITION_SPE
+with chrono("calcul", "composition"):
+    fig_generale = figure_repartition(composition_spe, "Répartition des actifs de la partie spécifique")
+with chrono("rendu", "composition"):
+    st.plotly_chart(fig_generale, use_container_width=True)
+
+with st.expander("Simuler une autre répartition des poches cotées"):
+    # Streamlit exécute le contenu d'un expander même replié : rien n'est importé ni calculé (panels ajustés,
+    # covariance) tant que la simulation n'est pas lancée
+    if st.toggle("Lancer la simulation", key="simulation_active"):
+        from simulation import charger_simulateur
+
+        # Simulateur gardé dans la session : un curseur déplacé ne met à jour que sa poche
+        if "simulateur" not in st.session_state:
+            simulateur = charger_simulateur()
+            st.session_state["simulateur"] = simulateur
+            st.session_state["simulation_reference"] = simulateur.indicateurs() if simulateur else None
+        simulateur, avant = st.session_state["simulateur"], st.session_state["simulation_reference"]
+        if simulateur is None:
+            st.info("Aucun fichier de cours disponible.")
+        else:
+            colonnes = st.columns(len(simulateur.poches))
+            composition = {poche: colonne.slider(poche, 0, 50, int(composition_spe[poche]), key=f"simulation_{poche}")
+                           for colonne, poche in zip(colonnes, simulateur.poches)}
+            with chrono("calcul", "simulation"):
+                apres = simulateur.modifier_composition(composition).indicateurs()
+                contributions = simulateur.contributions_poches()
+            colonnes = st.columns(3)
+            colonnes[0].metric("Volatilité annualisée", f"{apres['Volatilité']:.1%}",
+                               f"{(apres['Volatilité'] - avant['Volatilité']) * 100:+.2f} pts", delta_color="inverse")
+            colonnes[1].metric("Rendement attendu", f"{apres['Rendement attendu']:.1%}",
+                               f"{(apres['Rendement attendu'] - avant['Rendement attendu']) * 100:+.2f} pts")
+            colonnes[2].metric("Score ESG moyen", f"{apres['Score ESG']:.1f}", f"{apres['Score ESG'] - avant['Score ESG']:+.1f}")
+            st.caption("Contributions au risque des poches cotées : "
+                       + ", ".join(f"{p} {c:.0%}" for p, c in contributions.items())
+                       + ". Estimations sur les rendements hebdomadaires passés, poches cotées renormalisées.")
 
 # -------------------------------
 # DÉTAIL DES ACTIFS SPÉCIFIQUES
@@ -995,6 +1025,9 @@ elif choix=="Obligations Corporate":
 #   ACTIONS DURABLES INCLUSION
 # -------------------------------
 elif choix == "Actions Durables Inclusion":
+    # Import différé : pyramide charge pandas, numpy et pyarrow (via ingestion), inutiles aux autres sections
+    from pyramide import PERIODES, charger_pyramides_ajustees, vues_periode
+
     actions = {
     "Sodexo": {
         "ticker": "SW.PA",
@@ -1042,14 +1075,17 @@ elif choix == "Actions Durables Inclusion":
     if choix == "Sodexo":
         # Récupération des données financières
         csv_file = "financial_data/data_actifs.csv"
-        df = pd.read_csv(csv_file, parse_dates=[0], index_col=0)
-        df_plot = df[[symbole]].dropna().reset_index()
-        df_plot.columns = ["Date", symbole]
+        with chrono("chargement", choix):
+            pyramides = charger_pyramides_ajustees(csv_file)
 
         # Affichage du cours du fonds
         st.subheader(f"Cours de l’action {choix}")
-        fig = px.line(df_plot, x="Date", y=symbole, title=f"{choix} - Cours")
-        st.plotly_chart(fig)
+        periode = st.radio("Période", list(PERIODES), index=len(PERIODES) - 1, horizontal=True, key=f"periode_{choix}")
+        with chrono("calcul", choix):
+            df, total = vues_periode(pyramides, symbole, periode)
+            fig = figure_cours(df, symbole, choix, total)
+        with chrono("rendu", choix):
+            st.plotly_chart(fig)
 
         st.markdown("### Caractéristiques générales de l'actif")
 
@@ -1154,25 +1190,27 @@ elif choix == "Actions Durables Inclusion":
 
         # Analyse comparative
         st.subheader("Comparaison des Notations ESG")
-        esg_data = pd.DataFrame({
-            "Entreprise": ["Sodexo", "Capgemini", "EssilorLuxottica", "Acer", "Yamaha"],
-            "Score ESG": [59, 80, 64, 88, 59]
-        })
-        fig = px.bar(esg_data, x="Entreprise", y="Score ESG", color="Score ESG", title="Comparaison des Scores ESG")
-        st.plotly_chart(fig)
+        esg_data = donnees_scores_esg()
+        with chrono("calcul", choix):
+            fig = figure_scores_esg(esg_data)
+        with chrono("rendu", choix):
+            st.plotly_chart(fig)
 
 
     elif choix == "Capgemini":
         # Récupération des données financières
         csv_file = "financial_data/data_actifs.csv"
-        df = pd.read_csv(csv_file, parse_dates=[0], index_col=0)
-        df_plot = df[[symbole]].dropna().reset_index()
-        df_plot.columns = ["Date", symbole]
+        with chrono("chargement", choix):
+            pyramides = charger_pyramides_ajustees(csv_file)
 
         # Affichage du cours du fonds
         st.subheader(f"Cours de l’action {choix}")
-        fig = px.line(df_plot, x="Date", y=symbole, title=f"{choix} - Cours")
-        st.plotly_chart(fig)
+        periode = st.radio("Période", list(PERIODES), index=len(PERIODES) - 1, horizontal=True, key=f"periode_{choix}")
+        with chrono("calcul", choix):
+            df, total = vues_periode(pyramides, symbole, periode)
+            fig = figure_cours(df, symbole, choix, total)
+        with chrono("rendu", choix):
+            st.plotly_chart(fig)
 
         st.markdown("### Caractéristiques générales de l'actif")
 
@@ -1279,24 +1317,26 @@ elif choix == "Actions Durables Inclusion":
 
         # Analyse comparative
         st.subheader("Comparaison des Notations ESG")
-        esg_data = pd.DataFrame({
-            "Entreprise": ["Sodexo", "Capgemini", "EssilorLuxottica", "Acer", "Yamaha"],
-            "Score ESG": [59, 80, 64, 88, 59]
-        })
-        fig = px.bar(esg_data, x="Entreprise", y="Score ESG", color="Score ESG", title="Comparaison des Scores ESG")
-        st.plotly_chart(fig)
+        esg_data = donnees_scores_esg()
+        with chrono("calcul", choix):
+            fig = figure_scores_esg(esg_data)
+        with chrono("rendu", choix):
+            st.plotly_chart(fig)
 
     elif choix == "EssilorLuxottica":
         # Récupération des données financières
         csv_file = "financial_data/data_actifs.csv"
-        df = pd.read_csv(csv_file, parse_dates=[0], index_col=0)
-        df_plot = df[[symbole]].dropna().reset_index()
-        df_plot.columns = ["Date", symbole]
+        with chrono("chargement", choix):
+            pyramides = charger_pyramides_ajustees(csv_file)
 
         # Affichage du cours du fonds
         st.subheader(f"Cours de l’action {choix}")
-        fig = px.line(df_plot, x="Date", y=symbole, title=f"{choix} - Cours")
-        st.plotly_chart(fig)
+        periode = st.radio("Période", list(PERIODES), index=len(PERIODES) - 1, horizontal=True, key=f"periode_{choix}")
+        with chrono("calcul", choix):
+            df, total = vues_periode(pyramides, symbole, periode)
+            fig = figure_cours(df, symbole, choix, total)
+        with chrono("rendu", choix):
+            st.plotly_chart(fig)
 
         st.markdown("### Caractéristiques générales de l'actif")
 
@@ -1403,25 +1443,27 @@ elif choix == "Actions Durables Inclusion":
         
         # Analyse comparative
         st.subheader("Comparaison des Notations ESG")
-        esg_data = pd.DataFrame({
-            "Entreprise": ["Sodexo", "Capgemini", "EssilorLuxottica", "Acer", "Yamaha"],
-            "Score ESG": [59, 80, 64, 88, 59]
-        })
-        fig = px.bar(esg_data, x="Entreprise", y="Score ESG", color="Score ESG", title="Comparaison des Scores ESG")
-        st.plotly_chart(fig)
+        esg_data = donnees_scores_esg()
+        with chrono("calcul", choix):
+            fig = figure_scores_esg(esg_data)
+        with chrono("rendu", choix):
+            st.plotly_chart(fig)
 
 
     elif choix == "Acer":
         # Récupération des données financières
         csv_file = "financial_data/data_actifs.csv"
-        df = pd.read_csv(csv_file, parse_dates=[0], index_col=0)
-        df_plot = df[[symbole]].dropna().reset_index()
-        df_plot.columns = ["Date", symbole]
+        with chrono("chargement", choix):
+            pyramides = charger_pyramides_ajustees(csv_file)
 
         # Affichage du cours du fonds
         st.subheader(f"Cours de l’action {choix}")
-        fig = px.line(df_plot, x="Date", y=symbole, title=f"{choix} - Cours")
-        st.plotly_chart(fig)
+        periode = st.radio("Période", list(PERIODES), index=len(PERIODES) - 1, horizontal=True, key=f"periode_{choix}")
+        with chrono("calcul", choix):
+            df, total = vues_periode(pyramides, symbole, periode)
+            fig = figure_cours(df, symbole, choix, total)
+        with chrono("rendu", choix):
+            st.plotly_chart(fig)
 
         st.markdown("### Caractéristiques générales de l'actif")
 
@@ -1543,24 +1585,26 @@ elif choix == "Actions Durables Inclusion":
         
         # Analyse comparative
         st.subheader("Comparaison des Notations ESG")
-        esg_data = pd.DataFrame({
-            "Entreprise": ["Sodexo", "Capgemini", "EssilorLuxottica", "Acer", "Yamaha"],
-            "Score ESG": [59, 80, 64, 88, 59]
-        })
-        fig = px.bar(esg_data, x="Entreprise", y="Score ESG", color="Score ESG", title="Comparaison des Scores ESG")
-        st.plotly_chart(fig)
+        esg_data = donnees_scores_esg()
+        with chrono("calcul", choix):
+            fig = figure_scores_esg(esg_data)
+        with chrono("rendu", choix):
+            st.plotly_chart(fig)
 
     elif choix == "Yamaha":
         # Récupération des données financières
         csv_file = "financial_data/data_actifs.csv"
-        df = pd.read_csv(csv_file, parse_dates=[0], index_col=0)
-        df_plot = df[[symbole]].dropna().reset_index()
-        df_plot.columns = ["Date", symbole]
+        with chrono("chargement", choix):
+            pyramides = charger_pyramides_ajustees(csv_file)
 
         # Affichage du cours du fonds
         st.subheader(f"Cours de l’action {choix}")
-        fig = px.line(df_plot, x="Date", y=symbole, title=f"{choix} - Cours")
-        st.plotly_chart(fig)
+        periode = st.radio("Période", list(PERIODES), index=len(PERIODES) - 1, horizontal=True, key=f"periode_{choix}")
+        with chrono("calcul", choix):
+            df, total = vues_periode(pyramides, symbole, periode)
+            fig = figure_cours(df, symbole, choix, total)
+        with chrono("rendu", choix):
+            st.plotly_chart(fig)
 
         st.markdown("### Caractéristiques générales de l'actif")
 
@@ -1674,12 +1718,11 @@ elif choix == "Actions Durables Inclusion":
 
         # Analyse comparative
         st.subheader("Comparaison des Notations ESG")
-        esg_data = pd.DataFrame({
-            "Entreprise": ["Sodexo", "Capgemini", "EssilorLuxottica", "Acer", "Yamaha"],
-            "Score ESG": [59, 80, 64, 88, 59]
-        })
-        fig = px.bar(esg_data, x="Entreprise", y="Score ESG", color="Score ESG", title="Comparaison des Scores ESG")
-        st.plotly_chart(fig)
+        esg_data = donnees_scores_esg()
+        with chrono("calcul", choix):
+            fig = figure_scores_esg(esg_data)
+        with chrono("rendu", choix):
+            st.plotly_chart(fig)
 
     elif choix == "APM Group":
 
@@ -1791,12 +1834,11 @@ elif choix == "Actions Durables Inclusion":
 
         # Analyse comparative
         st.subheader("Comparaison des Notations ESG")
-        esg_data = pd.DataFrame({
-            "Entreprise": ["Sodexo", "Capgemini", "EssilorLuxottica", "Acer", "Yamaha"],
-            "Score ESG": [59, 80, 64, 88, 59]
-        })
-        fig = px.bar(esg_data, x="Entreprise", y="Score ESG", color="Score ESG", title="Comparaison des Scores ESG")
-        st.plotly_chart(fig)
+        esg_data = donnees_scores_esg()
+        with chrono("calcul", choix):
+            fig = figure_scores_esg(esg_data)
+        with chrono("rendu", choix):
+            st.plotly_chart(fig)
 
 
 # -------------------------------
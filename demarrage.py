@@ -0,0 +1,93 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+# Démarrage à froid des workers : préchauffage des caches et mesure du temps de démarrage par page.
+#
+#   python demarrage.py                  # toutes les pages présentes
+#   python demarrage.py ptfSG.py         # une page
+
+PAGES = ["codeStreamli.py", "dashGE.py", "dashSG.py", "dashES.py", "dashEG.py", "ptfSG.py"]
+PANELS = ["financial_data/data_actifs.csv", "financial_data/data_fonds.csv"]
+
+# Budget en secondes pour le premier affichage d'une page dans un worker neuf (imports compris)
+BUDGETS = {
+    "codeStreamli.py": 1.0,
+    "ptfSG.py": 1.0,
+    "dashSG.py": 3.0,
+}
+BUDGET_PAR_DEFAUT = 3.0
+
+# Bibliothèques dont on surveille le chargement par les pages
+LOURDES = ["pandas", "numpy", "plotly", "yfinance", "scipy", "pyarrow"]
+
+_prechauffage = None
+_verrou = threading.Lock()
+
+
+def prechauffer(panels=PANELS):
+    # Imports lourds, parsing des panels et séries ajustées, pour que la première session n'attende pas
+    from graphiques import _px
+    from pyramide import charger_pyramides_ajustees
+
+    _px()
+    for panel in panels:
+        if os.path.exists(panel):
+            charger_pyramides_ajustees(panel)
+
+
+def lancer_prechauffage(panels=PANELS):
+    # Une seule fois par processus, en arrière-plan : n'allonge pas le premier rendu
+    global _prechauffage
+    with _verrou:
+        if _prechauffage is None:
+            _prechauffage = threading.Thread(target=prechauffer, args=(panels,), name="prechauffage", daemon=True)
+            _prechauffage.start()
+    return _prechauffage
+
+
+_MESURE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+avant = set(sys.modules)
+debut = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+at.run()
+froid = time.perf_counter() - debut
+debut = time.perf_counter()
+at.run()
+chaud = time.perf_counter() - debut
+erreurs = [e.message for e in at.exception]
+lourdes = [m for m in json.loads(sys.argv[2]) if m in sys.modules and m not in avant]
+print(json.dumps({"froid": froid, "chaud": chaud, "lourdes": lourdes, "erreurs": erreurs}))
+"""
+
+
+def mesurer_demarrage(page):
+    # Premier et second rendu de la page dans un interpréteur neuf (Streamlit déjà importé)
+    resultat = subprocess.run([sys.executable, "-c", _MESURE, page, json.dumps(LOURDES)],
+                              capture_output=True, text=True)
+    if resultat.returncode:
+        return {"page": page, "erreurs": [resultat.stderr.strip().splitlines()[-1]]}
+    mesure = json.loads(resultat.stdout.strip().splitlines()[-1])
+    mesure["page"] = page
+    mesure["budget"] = BUDGETS.get(page, BUDGET_PAR_DEFAUT)
+    return mesure
+
+
+if __name__ == "__main__":
+    pages = sys.argv[1:] or [p for p in PAGES if os.path.exists(p)]
+    depassement = False
+    for page in pages:
+        mesure = mesurer_demarrage(page)
+        if mesure.get("erreurs"):
+            print(f"{page:<18} erreur : {mesure['erreurs'][0]}")
+            depassement = True
+            continue
+        statut = "ok" if mesure["froid"] <= mesure["budget"] else "HORS BUDGET"
+        depassement |= statut != "ok"
+        print(f"{page:<18} froid {mesure['froid']:6.2f}s  chaud {mesure['chaud']:6.2f}s  "
+              f"budget {mesure['budget']:.1f}s  {statut}  imports : {', '.join(mesure['lourdes']) or '-'}")
+    sys.exit(1 if depassement else 0)
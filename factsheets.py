@@ -0,0 +1,188 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+from analyses import calculer_performances, calculer_vl
+from calendrier import aligner_en_cache
+from graphiques import _px, figure_scores_esg
+from ingestion import charger_panel
+from referentiel import ACTIFS_COTES, COMPOSITION_SPE, PANELS, SCORES_ESG, donnees_scores_esg
+from versions import lire_panel
+
+# Génération en lot des fiches (factsheets) statiques : une par actif des fichiers de cours et une par poche.
+#
+#   python factsheets.py --sortie factsheets --processus 8 [--pdf] [--forcer] [--au 2025-04-08]
+#
+# Les fiches dont les données n'ont pas changé depuis la dernière génération ne sont pas refaites
+# (hash des entrées conservé dans manifeste.json). Le graphique ESG, commun à toutes les fiches, est
+# construit une seule fois.
+
+# À incrémenter quand la mise en page change, pour régénérer toutes les fiches
+VERSION_GABARIT = "1"
+
+STYLE = """
+body { font-family: sans-serif; margin: 2em; color: #222; }
+table { width: 100%; border-collapse: collapse; margin-bottom: 1.5em; }
+th, td { padding: 8px; text-align: left; border-bottom: 1px solid #ddd; }
+tr:nth-child(even) { background-color: #f9f9f9; }
+th { background-color: #f2f2f2; }
+footer { margin-top: 2em; font-size: 0.8em; color: #777; }
+"""
+
+
+def _tableau(lignes):
+    corps = "".join(f"<tr><td><b>{html.escape(str(k))}</b></td><td>{html.escape(str(v))}</td></tr>" for k, v in lignes)
+    return f'<table><tr><th>Catégorie</th><th>Détails</th></tr>{corps}</table>'
+
+
+def _format_performances(perf):
+    pourcentages = ["Rendement total", "Rendement annualisé", "Volatilité", "Max drawdown"]
+    return [(k, f"{v:.2%}" if k in pourcentages else f"{v:.2f}") for k, v in perf.items() if pd.notna(v)]
+
+
+def _graphique(fig, statique):
+    # HTML interactif (plotly.js chargé une fois par fiche depuis le dossier de sortie) ou SVG pour le PDF
+    if statique:
+        return fig.to_image(format="svg").decode("utf-8")
+    return fig.to_html(full_html=False, include_plotlyjs=False)
+
+
+def _page(titre, blocs):
+    return (f'<!DOCTYPE html><html lang="fr"><head><meta charset="utf-8"><title>{html.escape(titre)}</title>'
+            f'<script src="plotly.min.js"></script><style>{STYLE}</style></head><body>'
+            f'<h1>{html.escape(titre)}</h1>{"".join(blocs)}'
+            '<footer>© 2025 - Dashboard ESG_Reghina&amp;Coline&amp;Cosima | Données publiques.</footer></body></html>')
+
+
+def _ecrire(chemin, contenu, pdf):
+    if pdf:
+        try:
+            from weasyprint import HTML
+        except ImportError:
+            raise RuntimeError("La génération PDF nécessite weasyprint (et kaleido pour les graphiques)")
+        HTML(string=contenu, base_url=os.path.dirname(chemin)).write_pdf(chemin)
+    else:
+        with open(chemin, "w", encoding="utf-8") as f:
+            f.write(contenu)
+
+
+def fiche_actif(tache):
+    # Exécutée dans un processus du pool : ne reçoit que la série de l'actif et le graphique ESG déjà rendu
+    serie, nom, infos, bloc_esg, chemin, pdf = tache
+    fig = _px().line(serie.dropna().rename_axis("Date").reset_index(), x="Date", y=serie.name, title=f"{nom} - Cours")
+    perf = calculer_performances(serie.to_frame()).iloc[0]
+    blocs = [
+        "<h2>Caractéristiques générales de l'actif</h2>", _tableau(infos),
+        "<h2>Performance historique</h2>", _tableau(_format_performances(perf)),
+        "<h2>Cours</h2>", _graphique(fig, pdf),
+    ]
+    if bloc_esg:
+        blocs += ["<h2>Comparaison des Notations ESG</h2>", bloc_esg]
+    _ecrire(chemin, _page(nom, blocs), pdf)
+    return chemin
+
+
+def fiche_poche(tache):
+    panel, poche, poids, composition, bloc_esg, chemin, pdf = tache
+    vl = calculer_vl(panel)
+    fig = _px().line(vl.rename_axis("Date").reset_index(), x="Date", y="VL", title=f"{poche} - VL base 100")
+    perf = calculer_performances(vl.to_frame()).iloc[0]
+    blocs = [
+        "<h2>Composition</h2>", _tableau([("Poids dans le portefeuille", f"{poids} %")] + composition),
+        "<h2>Performance historique (actifs équipondérés)</h2>", _tableau(_format_performances(perf)),
+        "<h2>Valeur liquidative</h2>", _graphique(fig, pdf),
+    ]
+    if bloc_esg:
+        blocs += ["<h2>Comparaison des Notations ESG</h2>", bloc_esg]
+    _ecrire(chemin, _page(f"Poche {poche}", blocs), pdf)
+    return chemin
+
+
+def _empreinte(*elements):
+    h = hashlib.sha256(VERSION_GABARIT.encode())
+    for element in elements:
+        if isinstance(element, (pd.Series, pd.DataFrame)):
+            h.update(pd.util.hash_pandas_object(element, index=True).to_numpy().tobytes())
+        else:
+            h.update(json.dumps(element, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _nom_fichier(nom, extension):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in nom) + extension
+
+
+def generer_factsheets(sortie="factsheets", panels=PANELS, processus=None, pdf=False, forcer=False, au=None):
+    # au="2025-04-08" : fiches refaites sur les panels tels qu'enregistrés à cette date (versions.py)
+    os.makedirs(sortie, exist_ok=True)
+    extension = ".pdf" if pdf else ".html"
+    chemin_manifeste = os.path.join(sortie, "manifeste.json")
+    manifeste = {}
+    if os.path.exists(chemin_manifeste) and not forcer:
+        with open(chemin_manifeste) as f:
+            manifeste = json.load(f)
+
+    lire = charger_panel if au is None else partial(lire_panel, au=au)
+    panel = pd.concat([lire(p) for p in panels if os.path.exists(p)], axis=1).sort_index()
+    noms = {ticker: nom for poche in ACTIFS_COTES.values() for nom, ticker in poche.items()}
+    poches = {ticker: poche for poche, actifs_poche in ACTIFS_COTES.items() for ticker in actifs_poche.values()}
+
+    # Rendu unique du graphique ESG et de plotly.js, réutilisés par toutes les fiches
+    bloc_esg = _graphique(figure_scores_esg(donnees_scores_esg()), pdf)
+    if not pdf and not os.path.exists(os.path.join(sortie, "plotly.min.js")):
+        from plotly.offline import get_plotlyjs
+        with open(os.path.join(sortie, "plotly.min.js"), "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+
+    taches_actifs, taches_poches, nouveau = [], [], {}
+    for ticker in panel.columns:
+        serie = panel[ticker]
+        nom = noms.get(ticker, ticker)
+        infos = [("Nom", nom), ("Identifiant", ticker), ("Poche", poches.get(ticker, "-")),
+                 ("Score ESG", SCORES_ESG.get(nom, "-"))]
+        fichier = _nom_fichier(ticker, extension)
+        nouveau[fichier] = _empreinte(serie, infos, SCORES_ESG)
+        if manifeste.get(fichier) != nouveau[fichier] or not os.path.exists(os.path.join(sortie, fichier)):
+            taches_actifs.append((serie, nom, infos, bloc_esg, os.path.join(sortie, fichier), pdf))
+
+    # Les VL de poches sont calculées sur la vue alignée (fériés des places comblés, 5 jours ouvrés au plus)
+    aligne = aligner_en_cache(panel, "union")
+    for poche, actifs_poche in ACTIFS_COTES.items():
+        tickers = [t for t in actifs_poche.values() if t in panel.columns]
+        if not tickers:
+            continue
+        composition = [(nom, ticker) for nom, ticker in actifs_poche.items() if ticker in panel.columns]
+        fichier = _nom_fichier(f"poche_{poche}", extension)
+        nouveau[fichier] = _empreinte(panel[tickers], composition, COMPOSITION_SPE[poche], SCORES_ESG)
+        if manifeste.get(fichier) != nouveau[fichier] or not os.path.exists(os.path.join(sortie, fichier)):
+            taches_poches.append((aligne[tickers], poche, COMPOSITION_SPE[poche], composition, bloc_esg,
+                                  os.path.join(sortie, fichier), pdf))
+
+    generees = []
+    if taches_actifs or taches_poches:
+        with ProcessPoolExecutor(max_workers=processus) as pool:
+            generees += list(pool.map(fiche_actif, taches_actifs, chunksize=16))
+            generees += list(pool.map(fiche_poche, taches_poches))
+
+    with open(chemin_manifeste, "w") as f:
+        json.dump(nouveau, f, indent=1)
+    return generees, len(nouveau) - len(generees)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génération en lot des fiches actifs et poches")
+    parser.add_argument("--sortie", default="factsheets")
+    parser.add_argument("--processus", type=int, default=None)
+    parser.add_argument("--pdf", action="store_true", help="PDF (weasyprint et kaleido requis) au lieu de HTML")
+    parser.add_argument("--forcer", action="store_true", help="régénérer toutes les fiches")
+    parser.add_argument("--au", help="utiliser les panels tels qu'enregistrés à cette date (versions.py)")
+    args = parser.parse_args()
+    generees, inchangees = generer_factsheets(args.sortie, processus=args.processus, pdf=args.pdf, forcer=args.forcer,
+                                              au=args.au)
+    print(f"{len(generees)} fiches générées, {inchangees} inchangées, dans {args.sortie}/")
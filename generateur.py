@@ -0,0 +1,397 @@
+import json
+import os
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+import pandas as pd
+
+from calendrier import jours_feries, jours_ouvres
+
+# Générateur de données de marché synthétiques, aux mêmes formats que les fichiers du projet :
+# panel large (data_actifs.csv / data_fonds.csv), exports de cotations .txt, listes du label ISR.
+# Tout est déterministe pour une graine donnée, quelle que soit la taille des blocs écrits sur disque.
+
+# Nombre de dates tirées par générateur aléatoire : fixe, pour que le résultat ne dépende pas du découpage
+TAILLE_BLOC = 256
+
+def _parametres_tickers(n_tickers, places, graine, n_dates, n_secteurs):
+    # Caractéristiques fixes de chaque série : place, dérive, volatilité, secteur, vie de la série
+    rng = np.random.default_rng([graine, 0])
+    params = pd.DataFrame({
+        "place": rng.choice(places, size=n_tickers),
+        "mu": rng.normal(0.06, 0.04, size=n_tickers),
+        "sigma": rng.uniform(0.08, 0.45, size=n_tickers),
+        "secteur": rng.integers(0, n_secteurs, size=n_tickers),
+        "prix_initial": rng.uniform(10, 500, size=n_tickers).round(2),
+        "debut": 0,
+        "fin": n_dates,
+    })
+    # Une partie des séries commence en retard ou s'arrête avant la fin (fonds liquidés, cotations figées)
+    tardives = rng.random(n_tickers) < 0.1
+    params.loc[tardives, "debut"] = rng.integers(0, max(n_dates // 2, 1), size=tardives.sum())
+    arretees = rng.random(n_tickers) < 0.05
+    params.loc[arretees, "fin"] = n_dates - rng.integers(1, max(n_dates // 10, 2), size=arretees.sum())
+    return params
+
+
+def _chocs(rng, n_lignes, n_tickers, n_secteurs, ddl):
+    # Chocs centrés réduits, gaussiens ou Student (queues épaisses)
+    if ddl is None:
+        return (rng.standard_normal(n_lignes), rng.standard_normal((n_lignes, n_secteurs)),
+                rng.standard_normal((n_lignes, n_tickers)))
+    echelle = np.sqrt((ddl - 2) / ddl)
+    return (rng.standard_t(ddl, n_lignes) * echelle, rng.standard_t(ddl, (n_lignes, n_secteurs)) * echelle,
+            rng.standard_t(ddl, (n_lignes, n_tickers)) * echelle)
+
+
+def iter_panel(n_tickers, debut="2015-01-01", fin="2025-04-09", places=("XPAR",), correlation_marche=0.3,
+               correlation_secteur=0.2, n_secteurs=10, ddl=4, taux_manquants=0.005, taille_morceau=TAILLE_BLOC,
+               graine=0, prefixe="T"):
+    # Panel large de cours, produit par morceaux de dates pour pouvoir l'écrire sur disque sans tout garder en mémoire
+    if taille_morceau % TAILLE_BLOC:
+        raise ValueError(f"taille_morceau doit être un multiple de {TAILLE_BLOC}")
+
+    places = list(places)
+    dates = pd.bdate_range(debut, fin, name="date")
+    params = _parametres_tickers(n_tickers, places, graine, len(dates), n_secteurs)
+    colonnes = [f"{prefixe}{i:05d}" for i in range(n_tickers)]
+
+    # Jours de fermeture de chaque place sur toute la période
+    annees = range(dates[0].year, dates[-1].year + 1)
+    fermetures = {place: dates.isin(jours_feries(place, annees)) for place in places}
+    colonnes_place = {place: (params["place"] == place).to_numpy() for place in places}
+
+    mu = params["mu"].to_numpy()
+    sigma = params["sigma"].to_numpy()
+    secteur = params["secteur"].to_numpy()
+    debut_idx = params["debut"].to_numpy()
+    fin_idx = params["fin"].to_numpy()
+    poids_idio = np.sqrt(1 - correlation_marche - correlation_secteur)
+    log_prix = np.log(params["prix_initial"].to_numpy())
+
+    for depart in range(0, len(dates), taille_morceau):
+        morceau = []
+        for bloc in range(depart, min(depart + taille_morceau, len(dates)), TAILLE_BLOC):
+            n_lignes = min(TAILLE_BLOC, len(dates) - bloc)
+            rng = np.random.default_rng([graine, 1, bloc // TAILLE_BLOC])
+            marche, secteurs, idio = _chocs(rng, n_lignes, n_tickers, n_secteurs, ddl)
+            chocs = (np.sqrt(correlation_marche) * marche[:, None] + np.sqrt(correlation_secteur) * secteurs[:, secteur]
+                     + poids_idio * idio)
+            rendements = (mu - 0.5 * sigma ** 2) / 252 + sigma / np.sqrt(252) * chocs
+            chemin = log_prix + np.cumsum(rendements, axis=0)
+            log_prix = chemin[-1]
+            prix = np.exp(chemin).round(2)
+
+            # Trous : séries pas encore cotées ou arrêtées, fériés de chaque place, valeurs manquantes isolées
+            lignes = np.arange(bloc, bloc + n_lignes)[:, None]
+            prix[(lignes < debut_idx) | (lignes >= fin_idx)] = np.nan
+            for place in places:
+                prix[np.ix_(fermetures[place][bloc:bloc + n_lignes], colonnes_place[place])] = np.nan
+            prix[rng.random(prix.shape) < taux_manquants] = np.nan
+            morceau.append(prix)
+
+        index = dates[depart:depart + sum(len(m) for m in morceau)]
+        # Les jours où aucune place n'a coté n'apparaissent pas dans les fichiers réels
+        yield pd.DataFrame(np.vstack(morceau), index=index, columns=colonnes).dropna(how="all")
+
+
+def generer_panel(n_tickers, **kwargs):
+    return pd.concat(iter_panel(n_tickers, **kwargs))
+
+
+def ecrire_panel_csv(chemin, n_tickers, taille_morceau=TAILLE_BLOC * 4, **kwargs):
+    # Écriture en flux : seul un morceau de dates est en mémoire à la fois
+    with open(chemin, "w", newline="") as f:
+        for i, morceau in enumerate(iter_panel(n_tickers, taille_morceau=taille_morceau, **kwargs)):
+            morceau.to_csv(f, header=(i == 0), date_format="%Y-%m-%d")
+    return chemin
+
+
+def generer_obligation(debut="2021-09-29", fin="2025-04-08", coupon=0.00125, echeance="2031-09-29",
+                       taux_initial=0.01, taux_long=0.025, vitesse=0.5, vol_taux=0.008, graine=0):
+    # Cours pied de coupon (base 100) d'une obligation à coupon annuel, taux actuariel suivant un Vasicek
+    rng = np.random.default_rng([graine, 2])
+    dates = jours_ouvres("XPAR", debut, fin)
+    pas = 1 / 252
+    taux = np.empty(len(dates))
+    taux[0] = taux_initial
+    chocs = rng.standard_normal(len(dates))
+    for i in range(1, len(dates)):
+        taux[i] = taux[i - 1] + vitesse * (taux_long - taux[i - 1]) * pas + vol_taux * np.sqrt(pas) * chocs[i]
+
+    # Flux restants : une matrice dates x échéances de coupons, actualisée en une fois
+    echeance = pd.Timestamp(echeance)
+    coupons = pd.date_range(end=echeance, periods=int((echeance - dates[0]).days // 365) + 2, freq=pd.DateOffset(years=1))
+    maturites = (coupons.values[None, :] - dates.values[:, None]) / np.timedelta64(365, "D")
+    restants = maturites > 0
+    actualisation = np.where(restants, (1 + taux[:, None]) ** -np.where(restants, maturites, 0), 0)
+    prix = 100 * coupon * actualisation.sum(axis=1) + 100 * actualisation[:, -1]
+
+    # Coupon couru retiré pour obtenir un prix pied de coupon
+    precedent = np.where(restants, -np.inf, maturites).max(axis=1)
+    couru = 100 * coupon * np.clip(-precedent, 0, 1)
+    return pd.Series((prix - couru).round(3), index=dates, name="prix")
+
+
+def _ohlcv(clot, rng, volume_median=None):
+    # Ouverture = clôture de la veille, plus haut/bas autour, volumes log-normaux (matrice dates x séries)
+    amplitude = np.abs(rng.normal(0, 0.01, size=(2,) + clot.shape))
+    ouv = np.vstack([clot[:1], clot[:-1]])
+    haut = np.maximum(ouv, clot) * (1 + amplitude[0])
+    bas = np.minimum(ouv, clot) * (1 - amplitude[1])
+    if volume_median is None:
+        volume_median = np.full(clot.shape[1], np.exp(10))
+    vol = np.floor(volume_median * rng.lognormal(0, 1, size=clot.shape))
+    return ouv, haut, bas, np.where(np.isnan(clot), np.nan, vol)
+
+
+def generer_ohlcv(panel, graine=0):
+    # OHLCV synthétique à partir d'un panel de clôtures : liquidité très variable d'un actif à l'autre
+    # (volume médian entre 100 et 10 millions de titres)
+    rng = np.random.default_rng([graine, 4])
+    clot = panel.to_numpy(dtype="float64")
+    volume_median = 10 ** rng.uniform(2, 7, size=clot.shape[1])
+    champs = dict(zip(["ouv", "haut", "bas", "vol"], _ohlcv(clot, rng, volume_median)))
+    champs["clot"] = clot
+    return {c: pd.DataFrame(v, index=panel.index, columns=panel.columns) for c, v in champs.items()}
+
+
+def ecrire_export_txt(serie, chemin, devise="EUR", ohlc=False, graine=0):
+    # Export de cotations au format des fichiers .txt (date jj/mm/aaaa hh:mm, tabulations, tabulation finale)
+    serie = serie.dropna()
+    clot = serie.to_numpy()
+    if ohlc:
+        ouv, haut, bas, vol = (x[:, 0] for x in _ohlcv(clot[:, None], np.random.default_rng([graine, 3])))
+    else:
+        ouv = haut = bas = clot
+        vol = np.zeros(len(clot), dtype=int)
+    df = pd.DataFrame({
+        "date": serie.index.strftime("%d/%m/%Y 00:00"),
+        "ouv": np.round(ouv, 2), "haut": np.round(haut, 2), "bas": np.round(bas, 2), "clot": np.round(clot, 2),
+        "vol": vol, "devise": devise, "": "",
+    })
+    df.to_csv(chemin, sep="\t", index=False)
+    return chemin
+
+
+SGP = ["MIROVA", "CANDRIAM", "ROBECO", "AXA INVESTMENT MANAGERS", "AMUNDI", "ECOFI", "LA FINANCIERE DE L'ECHIQUIER",
+       "SYCOMORE AM", "123 INVESTMENT MANAGERS", "A PLUS FINANCE"]
+CLASSES = ["Actions", "Immobilier", "Obligations", "Diversifié", "Monétaire", "Convertible", "Fonds de fonds"]
+ZONES = ["Zone Euro", "Monde", "Europe", "France", "OCDE", "USA"]
+MOTS_NOMS = ["INSERTION", "EMPLOIS", "INCLUSION", "DIVERSITY", "EQUITY", "SANTE", "HEALTH", "CLIMAT", "EUROPE",
+             "SUSTAINABLE", "BOND", "EURO", "CORPORATE", "GREEN", "IMPACT", "SOLIDAIRE", "DYNAMIQUE", "GLOBAL"]
+MESSAGE_ISR = "Bonjour, vous trouverez dans ce fichier la liste des fonds qui ont obtenu le label ISR."
+
+
+def generer_liste_isr(n_fonds, graine=0):
+    # Liste au format du label ISR : SGP, FONDS, CLASSE D'ACTIFS, FOCUS GÉO, ISIN (avec des trous)
+    rng = np.random.default_rng([graine, 4])
+    mots = rng.choice(MOTS_NOMS, size=(n_fonds, 3))
+    df = pd.DataFrame({
+        "SGP": rng.choice(SGP, size=n_fonds),
+        "FONDS": [" ".join(m) + f" {i}" for i, m in enumerate(mots)],
+        "CLASSE D'ACTIFS": rng.choice(CLASSES, size=n_fonds),
+        "FOCUS GÉO": rng.choice(ZONES, size=n_fonds),
+        "ISIN": [f"{p}{i:010d}" for p, i in zip(rng.choice(["FR", "LU", "IE"], size=n_fonds), range(n_fonds))],
+    })
+    df.loc[rng.random(n_fonds) < 0.1, "CLASSE D'ACTIFS"] = None
+    df.loc[rng.random(n_fonds) < 0.3, "FOCUS GÉO"] = None
+    df.loc[rng.random(n_fonds) < 0.2, "ISIN"] = None
+    return df.sort_values(["SGP", "FONDS"]).reset_index(drop=True)
+
+
+def generer_releases_isr(n_fonds, n_releases, taux_changement=0.02, graine=0):
+    # Publications successives de la liste : à chaque release, une part `taux_changement` des fonds perd le
+    # label, autant de nouveaux fonds l'obtiennent, et autant de fonds voient une colonne corrigée
+    rng = np.random.default_rng([graine, 8])
+    liste = generer_liste_isr(n_fonds, graine=graine)
+    suivant = n_fonds
+    releases = [liste]
+    for _ in range(n_releases - 1):
+        n = max(1, int(len(liste) * taux_changement))
+        liste = liste.drop(index=rng.choice(liste.index, n, replace=False))
+        nouveaux = generer_liste_isr(n, graine=graine + suivant)
+        nouveaux["FONDS"] = [f"{nom} N{suivant + i}" for i, nom in enumerate(nouveaux["FONDS"])]
+        suivant += n
+        liste = pd.concat([liste, nouveaux], ignore_index=True)
+        corriges = rng.choice(liste.index, n, replace=False)
+        liste.loc[corriges, "FOCUS GÉO"] = rng.choice(ZONES, n)
+        liste = liste.sort_values(["SGP", "FONDS"]).reset_index(drop=True)
+        releases.append(liste)
+    return releases
+
+
+def ecrire_liste_isr(chemin, liste):
+    # Même mise en page que les fichiers publiés : message d'accueil en A1, en-têtes en ligne 2
+    message = [MESSAGE_ISR] + [None] * (len(liste.columns) - 1)
+    lignes = pd.DataFrame([message, liste.columns.tolist()] + liste.values.tolist())
+    lignes.to_excel(chemin, index=False, header=False)
+    return chemin
+
+
+SECTEURS = ["Technologie", "Santé", "Finance", "Industrie", "Consommation", "Énergie", "Services publics",
+            "Immobilier", "Matériaux", "Télécoms", "Services"]
+PAYS = ["France", "Allemagne", "Pays-Bas", "Italie", "Espagne", "États-Unis", "Royaume-Uni", "Japon", "Suisse",
+        "Taïwan", "Canada", "Suède"]
+
+
+def generer_inventaires(n_fonds, n_lignes=2000, n_emetteurs=20000, graine=0):
+    # Inventaires de fonds : chaque fonds détient n_lignes émetteurs d'un univers commun, avec des poids
+    # concentrés (log-normaux) ; un émetteur a un secteur et un pays fixes
+    rng = np.random.default_rng([graine, 5])
+    secteurs = rng.choice(SECTEURS, n_emetteurs)
+    pays = rng.choice(PAYS, n_emetteurs, p=np.linspace(2, 0.5, len(PAYS)) / np.linspace(2, 0.5, len(PAYS)).sum())
+    tables = []
+    for f in range(n_fonds):
+        # Tirage sans remise avec préférence pour les grands émetteurs (indices faibles)
+        cles = rng.random(n_emetteurs) ** (1 / np.linspace(3, 1, n_emetteurs))
+        emetteurs = np.argsort(cles)[-min(n_lignes, n_emetteurs):]
+        poids = rng.lognormal(0, 1, len(emetteurs))
+        tables.append(pd.DataFrame({
+            "fonds": f"FONDS{f:05d}",
+            "emetteur": [f"EMETTEUR {e:06d}" for e in emetteurs],
+            "secteur": secteurs[emetteurs],
+            "pays": pays[emetteurs],
+            "poids": np.round(100 * poids / poids.sum(), 4),
+        }))
+    return pd.concat(tables, ignore_index=True)
+
+
+def ecrire_inventaires(dossier, n_fonds, **kwargs):
+    # Un CSV par fonds, au format lu par transparence.lire_inventaires
+    os.makedirs(dossier, exist_ok=True)
+    for fonds, table in generer_inventaires(n_fonds, **kwargs).groupby("fonds"):
+        table.drop(columns="fonds").to_csv(os.path.join(dossier, f"{fonds}.csv"), index=False)
+    return dossier
+
+
+def cotations_ticker(ticker, debut="2010-01-01", fin="2025-04-09", graine=0):
+    # Série OHLCV synthétique propre à un ticker (la même à chaque appel)
+    rng = np.random.default_rng([graine, 6, zlib.crc32(ticker.encode())])
+    jours = np.arange(np.datetime64(debut, "D"), np.datetime64(fin, "D") + 1)
+    dates = pd.DatetimeIndex(jours[np.is_busday(jours)], name="date")
+    clot = (rng.uniform(10, 500) * np.exp(np.cumsum(rng.normal(0.0002, 0.015, len(dates)))))[:, None]
+    ouv, haut, bas, vol = (x[:, 0] for x in _ohlcv(clot, rng))
+    return pd.DataFrame({"ouv": ouv, "haut": haut, "bas": bas, "clot": clot[:, 0], "vol": vol}, index=dates).round(4)
+
+
+class ServeurCotations:
+    # Serveur HTTP local imitant l'API chart de Yahoo Finance, pour télécharger hors connexion
+    # (telechargement.py --url ...). Une part `taux_erreur` des requêtes reçoit un 429 ou un 503 pour
+    # exercer les reprises ; les tickers commençant par INCONNU renvoient 404. Pour des tests déterministes,
+    # les `premieres_erreurs` premières requêtes sont toutes en erreur (429, 503, 429...), et `retry_after`
+    # est la valeur de l'en-tête Retry-After des 429.
+    def __init__(self, port=0, taux_erreur=0.0, latence=0.0, graine=0, gmtoffset=3600, premieres_erreurs=0,
+                 retry_after="0"):
+        self.taux_erreur, self.latence, self.graine, self.gmtoffset = taux_erreur, latence, graine, gmtoffset
+        self.premieres_erreurs, self.retry_after = premieres_erreurs, retry_after
+        self.rng = np.random.default_rng([graine, 7])
+        self.requetes = 0
+        self.erreurs = 0
+        self._series = {}
+        self._verrou = threading.Lock()
+        serveur = self
+
+        class Gestionnaire(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                statut, corps = serveur.repondre(self.path)
+                self.send_response(statut)
+                if statut == 429:
+                    self.send_header("Retry-After", str(serveur.retry_after))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corps)))
+                self.end_headers()
+                self.wfile.write(corps)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Gestionnaire)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v8/finance/chart/{{ticker}}"
+
+    def repondre(self, chemin):
+        url = urlparse(chemin)
+        ticker = unquote(url.path.rstrip("/").split("/")[-1])
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        with self._verrou:
+            self.requetes += 1
+            en_erreur = self.requetes <= self.premieres_erreurs or self.rng.random() < self.taux_erreur
+            self.erreurs += en_erreur
+            numero = self.requetes
+        if not en_erreur and ticker not in self._series and not ticker.startswith("INCONNU"):
+            self._series[ticker] = cotations_ticker(ticker, graine=self.graine)
+        if self.latence:
+            threading.Event().wait(self.latence)
+        if en_erreur:
+            return (429 if numero % 2 else 503), b'{"chart": {"result": null, "error": {"code": "Too Many Requests"}}}'
+        if ticker.startswith("INCONNU"):
+            return 404, b'{"chart": {"result": null, "error": {"code": "Not Found", "description": "No data found"}}}'
+        serie = self._series[ticker]
+        debut = pd.Timestamp(int(params.get("period1", 0)), unit="s")
+        fin = pd.Timestamp(int(params.get("period2", 2 ** 31)), unit="s")
+        serie = serie[(serie.index >= debut) & (serie.index < fin)]
+        # Horodatage de l'ouverture (9 h locale) en secondes UTC, comme l'API
+        secondes = (serie.index + pd.Timedelta(hours=9) - pd.Timestamp("1970-01-01")) // pd.Timedelta(seconds=1)
+        horodatages = (secondes - self.gmtoffset).tolist()
+        resultat = {"meta": {"symbol": ticker, "gmtoffset": self.gmtoffset}, "timestamp": horodatages,
+                    "indicators": {"quote": [{"open": serie["ouv"].tolist(), "high": serie["haut"].tolist(),
+                                              "low": serie["bas"].tolist(), "close": serie["clot"].tolist(),
+                                              "volume": serie["vol"].tolist()}]}}
+        return 200, json.dumps({"chart": {"result": [resultat], "error": None}}).encode()
+
+    def demarrer(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def arreter(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.demarrer()
+
+    def __exit__(self, *exc):
+        self.arreter()
+
+
+
+class RecepteurWebhook:
+    # Serveur HTTP local qui garde les corps JSON reçus en POST (alertes.CanalWebhook), pour tester les
+    # notifications hors connexion
+    def __init__(self, port=0):
+        self.recus = []
+        self._verrou = threading.Lock()
+        recepteur = self
+
+        class Gestionnaire(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                corps = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with recepteur._verrou:
+                    recepteur.recus.append(json.loads(corps or b"null"))
+                self.send_response(204)
+                self.end_headers()
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Gestionnaire)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/alertes"
+
+    def demarrer(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def arreter(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.demarrer()
+
+    def __exit__(self, *exc):
+        self.arreter()
@@ -0,0 +1,35 @@
+import pandas as pd
+
+
+def _px():
+    # plotly.express est long à importer : chargé au premier graphique seulement
+    import plotly.express as px
+    return px
+
+
+def figure_repartition(composition, title):
+    donnees = {"Actif": list(composition.keys()), "Poids (%)": list(composition.values())}
+    return _px().pie(donnees, values="Poids (%)", names="Actif", title=title)
+
+
+def figure_cours(df, symbole, nom, total=None):
+    # Cours d'un actif du panel, sans les dates manquantes ; avec la série rendement total (dividendes
+    # réinvestis) quand elle diffère du cours
+    df_plot = df[[symbole]].dropna().reset_index()
+    df_plot.columns = ["Date", symbole]
+    if total is None or symbole not in total or total[symbole].equals(df[symbole]):
+        return _px().line(df_plot, x="Date", y=symbole, title=f"{nom} - Cours")
+    series = {"Cours (rendement prix)": df[symbole], "Rendement total": total[symbole]}
+    df_plot = pd.DataFrame(series).dropna(how="all").rename_axis("Date").reset_index()
+    return _px().line(df_plot, x="Date", y=list(series), title=f"{nom} - Cours et rendement total",
+                      labels={"value": symbole, "variable": ""})
+
+
+def figure_scores_esg(esg_data):
+    return _px().bar(esg_data, x="Entreprise", y="Score ESG", color="Score ESG", title="Comparaison des Scores ESG")
+
+
+def figure_stress(pnl, title="P&L par scénario"):
+    # Carte de chaleur scénarios x portefeuilles, pertes en rouge
+    return _px().imshow(pnl * 100, text_auto=".1f", aspect="auto", color_continuous_scale="RdYlGn",
+                        color_continuous_midpoint=0, labels={"color": "P&L (%)", "x": "", "y": ""}, title=title)
@@ -0,0 +1,179 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from kpis_impact import COLONNES_KPIS, KPIS, lire_lignes_kpis
+
+# Indicateurs d'impact des actifs projet et impact attribuable à une allocation.
+#
+# Les indicateurs sont stockés dans financial_data/impact.csv (valeurs de referentiel.KPIS_IMPACT tant
+# que le fichier n'existe pas) :
+#   projet,indicateur,valeur,unite,annee
+#   La Varappe,Personnes accompagnées,9958,personnes,2023
+#   La Varappe,Chiffre d'affaires,90000000,€,2023
+#
+# Impact par euro investi : indicateur / base d'attribution du projet (chiffre d'affaires, ou montants
+# mobilisés pour un financeur), avec la valeur la plus récente de chaque indicateur. L'impact d'une
+# allocation (montants en € par projet) est le produit allocations x intensités ; un changement de montant
+# ou d'indicateur ne recalcule que la contribution des projets concernés. La lecture du fichier et le
+# formatage, sans pandas, sont dans kpis_impact.py.
+
+# Indicateurs en € servant de base d'attribution, par ordre de préférence
+BASES_ATTRIBUTION = ["Chiffre d'affaires", "Montants mobilisés"]
+NON_ATTRIBUE = "Non attribué"
+
+
+def lire_kpis(chemin=KPIS):
+    kpis = pd.DataFrame(lire_lignes_kpis(chemin), columns=COLONNES_KPIS).astype({"valeur": float})
+    kpis["annee"] = pd.to_numeric(kpis["annee"], errors="coerce").astype("Int64")
+    return kpis
+
+
+def ajouter_kpis(nouveaux, chemin=KPIS):
+    # Ajoute des indicateurs au fichier (les doublons projet/indicateur/année sont remplacés par la dernière valeur)
+    nouveaux = pd.DataFrame(nouveaux, columns=COLONNES_KPIS)
+    nouveaux["annee"] = pd.to_numeric(nouveaux["annee"], errors="coerce").astype("Int64")
+    kpis = pd.concat([lire_kpis(chemin), nouveaux], ignore_index=True)
+    kpis = kpis.drop_duplicates(["projet", "indicateur", "annee"], keep="last").sort_values(["projet", "indicateur", "annee"])
+    os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+    kpis.to_csv(chemin, index=False)
+    return kpis
+
+
+def derniers_kpis(kpis, annee=None):
+    # Valeur la plus récente de chaque indicateur (au plus tard `annee`) ; une valeur sans année ne sert
+    # que si aucune valeur datée n'existe
+    if annee is not None:
+        kpis = kpis[kpis["annee"].isna() | (kpis["annee"] <= annee)]
+    kpis = kpis.sort_values("annee", na_position="first", kind="stable")
+    return kpis.drop_duplicates(["projet", "indicateur"], keep="last").reset_index(drop=True)
+
+
+def calculer_intensites(kpis, annee=None):
+    # Impact par euro investi : DataFrame projets x indicateurs, et unité de chaque indicateur.
+    # Les projets sans base d'attribution ont une ligne nulle.
+    derniers = derniers_kpis(kpis, annee)
+    unites = derniers.groupby("indicateur")["unite"].unique()
+    incoherents = unites[unites.map(len) > 1]
+    if len(incoherents):
+        raise ValueError(f"Unités différentes pour un même indicateur : {', '.join(incoherents.index)}")
+    valeurs = derniers.pivot(index="projet", columns="indicateur", values="valeur")
+    bases = valeurs.reindex(columns=BASES_ATTRIBUTION).bfill(axis=1).iloc[:, 0]
+    intensites = valeurs.drop(columns=BASES_ATTRIBUTION, errors="ignore")
+    intensites = intensites.div(bases.where(bases > 0), axis=0).fillna(0.0)
+    return intensites, unites.map(lambda u: u[0]).reindex(intensites.columns), bases
+
+
+class MoteurImpact:
+    # Impact d'une ou plusieurs allocations (montants en € par projet) : impact = allocations @ intensités.
+    # Le résultat est tenu à jour par différences : un montant modifié ajoute (delta x ligne d'intensités du
+    # projet), un indicateur modifié ajoute (montants du projet x delta d'intensité).
+    def __init__(self, kpis, allocations=None, annee=None):
+        self.annee = annee
+        self.projets = pd.Index([])
+        self.indicateurs = pd.Index([])
+        self.allocations = pd.DataFrame()
+        self._intensites = np.zeros((0, 0))
+        self._montants = np.zeros((0, 0))
+        self._impact = np.zeros((0, 0))
+        self.projets_recalcules = 0
+        self.mettre_a_jour_kpis(kpis)
+        if allocations is not None:
+            self.definir_allocations(allocations)
+
+    def _position(self, nom):
+        # Les noms de projet sont comparés sans tenir compte de la casse ; -1 pour un projet sans indicateur
+        return self._cles.get(str(nom).strip().upper(), -1)
+
+    def _recalculer(self):
+        positions = np.array([self._position(n) for n in self.allocations.columns], dtype=int)
+        connus = positions >= 0
+        self._montants = np.zeros((len(self.allocations), len(self.projets)))
+        np.add.at(self._montants, (slice(None), positions[connus]), self.allocations.to_numpy()[:, connus])
+        self._impact = self._montants @ self._intensites
+        self.projets_recalcules = len(self.projets)
+
+    def definir_allocations(self, allocations):
+        # allocations : {projet: montant} ou DataFrame allocations x projets
+        if isinstance(allocations, pd.DataFrame):
+            self.allocations = allocations.astype(float).fillna(0.0)
+        else:
+            self.allocations = pd.DataFrame([pd.Series(allocations, dtype=float)], index=["Portefeuille"]).fillna(0.0)
+        self._recalculer()
+        return self
+
+    def modifier_allocation(self, montants, allocation="Portefeuille"):
+        # Nouveaux montants {projet: montant} pour une allocation ; seuls les projets modifiés sont recalculés
+        if allocation not in self.allocations.index:
+            self.allocations.loc[allocation] = 0.0
+            self._montants = np.vstack([self._montants, np.zeros(len(self.projets))])
+            self._impact = np.vstack([self._impact, np.zeros(len(self.indicateurs))])
+        ligne = self.allocations.index.get_loc(allocation)
+        modifies = []
+        for projet, montant in montants.items():
+            if projet not in self.allocations.columns:
+                self.allocations[projet] = 0.0
+            ancien = self.allocations.at[allocation, projet]
+            if montant != ancien:
+                self.allocations.at[allocation, projet] = float(montant)
+                position = self._position(projet)
+                if position >= 0:
+                    self._montants[ligne, position] += montant - ancien
+                    modifies.append((position, montant - ancien))
+        if modifies:
+            positions, deltas = map(np.array, zip(*modifies))
+            self._impact[ligne] += deltas @ self._intensites[positions]
+        self.projets_recalcules = len(modifies)
+        return self
+
+    def mettre_a_jour_kpis(self, kpis):
+        intensites, self.unites, self.bases = calculer_intensites(kpis, self.annee)
+        if not (intensites.index.equals(self.projets) and intensites.columns.equals(self.indicateurs)):
+            # Nouveau projet ou nouvel indicateur : tout est recalculé
+            self.projets, self.indicateurs = intensites.index, intensites.columns
+            self._cles = {str(p).strip().upper(): i for i, p in enumerate(self.projets)}
+            self._intensites = intensites.to_numpy()
+            self._recalculer()
+            return self
+        nouvelles = intensites.to_numpy()
+        modifies = np.flatnonzero((nouvelles != self._intensites).any(axis=1))
+        if len(modifies):
+            self._impact += self._montants[:, modifies] @ (nouvelles[modifies] - self._intensites[modifies])
+            self._intensites = nouvelles
+        self.projets_recalcules = len(modifies)
+        return self
+
+    def impact(self):
+        # Impact attribuable de chaque allocation : DataFrame allocations x indicateurs (unités dans self.unites)
+        return pd.DataFrame(self._impact.copy(), index=self.allocations.index, columns=self.indicateurs)
+
+    def impact_par_euro(self):
+        investi = self.allocations.sum(axis=1).to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return pd.DataFrame(self._impact / investi[:, None], index=self.allocations.index, columns=self.indicateurs)
+
+    def montants_non_attribues(self):
+        # Montants placés sur des projets sans indicateur ou sans base d'attribution
+        attribuables = self.bases.where(self.bases > 0).notna().to_numpy()
+        return (self.allocations.sum(axis=1) - self._montants[:, attribuables].sum(axis=1)).rename(NON_ATTRIBUE)
+
+
+def kpis_projet(nom, kpis):
+    # Indicateurs d'un projet (toutes années), nom comparé sans tenir compte de la casse
+    return kpis[kpis["projet"].str.upper() == nom.strip().upper()].sort_values(["indicateur", "annee"])
+
+
+# Indicateurs relus seulement quand le fichier change
+_cache = {}
+_verrou = threading.Lock()
+
+
+def charger_kpis(chemin=KPIS):
+    version = os.stat(chemin).st_mtime_ns if os.path.exists(chemin) else None
+    with _verrou:
+        entree = _cache.get(chemin)
+        if entree is None or entree[0] != version:
+            entree = _cache[chemin] = (version, lire_kpis(chemin))
+        return entree[1]
@@ -0,0 +1,193 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from referentiel import DEVISES
+
+# Mots-clés utilisés pour repérer les fonds liés à l'inclusion dans les listes ISR
+MOTS_CLES_ISR = ['inclusion', 'diversity', 'emploi', 'health', 'santé', 'equity']
+
+
+def filtrer_fonds_isr(datafiles, keywords=MOTS_CLES_ISR):
+    # Initialiser une liste pour stocker les résultats
+    total_matching_cells = []
+
+    for datafile in datafiles:
+        # Charger le fichier Excel (ou un DataFrame déjà chargé)
+        df = datafile if isinstance(datafile, pd.DataFrame) else pd.read_excel(datafile)
+
+        # Sélectionner la deuxième colonne (B), peu importe son nom réel
+        col_b_name = df.columns[1]
+
+        # Filtrer les cellules contenant au moins un des mots-clés
+        masque = df[col_b_name].astype(str).str.contains('|'.join(keywords), case=False, na=False)
+        matching_cells = df.loc[masque, col_b_name].tolist()
+
+        # Ajouter les résultats avec le nom du fichier comme référence
+        nom = datafile if isinstance(datafile, str) else getattr(datafile, 'name', None)
+        total_matching_cells.extend([(nom, cell) for cell in matching_cells])
+
+    return pd.DataFrame(total_matching_cells, columns=['Fichier', 'Nom du Fonds'])
+
+
+COLONNES_EXPORT = ['date', 'ouv', 'haut', 'bas', 'clot', 'vol', 'devise']
+
+
+def lire_export(chemin_fichier):
+    # Export de cotations complet (séparateur = tabulation, tabulation en fin de ligne)
+    df = pd.read_csv(chemin_fichier, sep='\t')
+    df = df.iloc[:, :len(COLONNES_EXPORT)]
+    df.columns = COLONNES_EXPORT
+
+    # Convertir les dates en datetime
+    df['date'] = pd.to_datetime(df['date'], dayfirst=True)
+    return df
+
+
+CHAMPS_OHLCV = ['ouv', 'haut', 'bas', 'clot', 'vol']
+
+
+def assembler_ohlcv(exports, dtype=np.float32):
+    # exports : {identifiant: export lu par lire_export}. Stockage en colonnes : une matrice
+    # dates x identifiants par champ (PanelCompact), sur l'union des dates des exports
+    from panel_compact import PanelCompact, _jours
+
+    colonnes = list(exports)
+    jours = np.unique(np.concatenate([_jours(e['date']) for e in exports.values()])) if exports else np.empty(0, np.int32)
+    matrices = {c: np.full((len(jours), len(colonnes)), np.nan, dtype=dtype, order='F') for c in CHAMPS_OHLCV}
+    for j, export in enumerate(exports.values()):
+        lignes = np.searchsorted(jours, _jours(export['date']))
+        for champ in CHAMPS_OHLCV:
+            matrices[champ][lignes, j] = export[champ].to_numpy(dtype=dtype)
+    devises = {ident: ','.join(sorted(e['devise'].dropna().astype(str).unique())) for ident, e in exports.items()}
+    return {champ: PanelCompact(matrices[champ], jours, colonnes) for champ in CHAMPS_OHLCV}, devises
+
+
+def ecrire_ohlcv(chemin, ohlcv, devises=None):
+    # Un seul fichier .npz non compressé : chaque champ est un tableau séparé, lu à la demande
+    premier = ohlcv[CHAMPS_OHLCV[0]]
+    devises = devises or {}
+    np.savez(chemin, jours=premier.jours, colonnes=np.array(premier.colonnes, dtype=str),
+             devises=np.array([devises.get(c, '') for c in premier.colonnes], dtype=str),
+             **{champ: ohlcv[champ].valeurs for champ in CHAMPS_OHLCV})
+
+
+def lire_ohlcv(chemin):
+    from panel_compact import PanelCompact
+
+    with np.load(chemin, allow_pickle=False) as f:
+        colonnes = f['colonnes'].tolist()
+        ohlcv = {champ: PanelCompact(np.asfortranarray(f[champ]), f['jours'], colonnes) for champ in CHAMPS_OHLCV}
+        devises = dict(zip(colonnes, f['devises'].tolist()))
+    return ohlcv, devises
+
+
+@lru_cache(maxsize=8)
+def _lire_ohlcv_version(chemin, version):
+    return lire_ohlcv(chemin)
+
+
+def lire_ohlcv_en_cache(chemin):
+    return _lire_ohlcv_version(chemin, os.stat(chemin).st_mtime_ns)
+
+
+def lire_txt_en_dataframe(chemin_fichier):
+    # Garder seulement les colonnes "date" et "close"
+    df = lire_export(chemin_fichier)[['date', 'clot']]
+    df.columns = ['date', 'close']
+    return df
+
+
+def merge_fichiers_avec_isin(fichiers, mapping_isin=None, dossier_output='financial_data', nom_fichier='data_fonds.csv',
+                             valider=True, ohlcv=True, listes_isr=(), versionner=True, devises_attendues=None):
+    from validation import appliquer_quarantaine, controler_panel, resumer_export
+
+    # Devise attendue de chaque série (referentiel.DEVISES par défaut), comparée à celle de son export
+    devises_attendues = DEVISES if devises_attendues is None else devises_attendues
+
+    # Sans dictionnaire : identifiants trouvés par rapprochement des noms de fichiers (rapprochement.py).
+    # Les exports sans correspondance automatique ou validée sont laissés de côté ; la table de
+    # rapprochement est écrite à côté du CSV (rapprochement_data_fonds.csv) pour les valider
+    non_rapproches = []
+    if mapping_isin is None:
+        from rapprochement import exports_a_verifier, mapping_exports
+        mapping_isin, table = mapping_exports(fichiers, listes_isr)
+        os.makedirs(dossier_output, exist_ok=True)
+        table.to_csv(os.path.join(dossier_output, f"rapprochement_{nom_fichier}"), index=False)
+        non_rapproches = [f for f in fichiers if f not in mapping_isin]
+        if len(non_rapproches) == len(fichiers):
+            raise ValueError(exports_a_verifier(table, non_rapproches))
+        fichiers = [f for f in fichiers if f in mapping_isin]
+
+    merged_df = None
+    infos_exports = {}
+    exports = {}
+
+    # Créer le dossier s'il n'existe pas
+    os.makedirs(dossier_output, exist_ok=True)
+
+    for fichier in fichiers:
+        isin = mapping_isin.get(fichier)
+        if not isin:
+            raise ValueError(f"Aucun ISIN trouvé pour le fichier : {fichier}")
+
+        export = lire_export(fichier)
+        if ohlcv:
+            exports[isin] = export
+        if valider:
+            infos_exports[isin] = resumer_export(export)
+        df = export[['date', 'clot']].rename(columns={'clot': isin})
+
+        if merged_df is None:
+            merged_df = df
+        else:
+            merged_df = pd.merge(merged_df, df, on='date', how='outer')
+
+    # Trier par date et réinitialiser l'index
+    merged_df = merged_df.sort_values('date').reset_index(drop=True)
+
+    # Contrôles qualité : rapport écrit à côté du CSV, séries en quarantaine retirées du panel
+    if valider:
+        devises = {isin: infos['devises_export'] for isin, infos in infos_exports.items() if infos['devises_export']}
+        rapport = controler_panel(merged_df.set_index('date'), devises=devises, infos_exports=infos_exports,
+                                  devises_attendues={isin: devises_attendues[isin] for isin in infos_exports
+                                                     if isin in devises_attendues})
+        rapport.to_csv(os.path.join(dossier_output, f"qualite_{nom_fichier}"), index_label='serie')
+        merged_df = appliquer_quarantaine(merged_df.set_index('date'), rapport).reset_index()
+
+    # OHLCV complet des séries retenues, à côté du CSV des clôtures (ohlcv_data_fonds.npz)
+    if ohlcv:
+        retenus = {isin: exports[isin] for isin in merged_df.columns if isin in exports}
+        chemin_ohlcv = os.path.join(dossier_output, f"ohlcv_{os.path.splitext(nom_fichier)[0]}.npz")
+        ecrire_ohlcv(chemin_ohlcv, *assembler_ohlcv(retenus))
+
+    # Construire le chemin de sortie complet
+    chemin_csv = os.path.join(dossier_output, nom_fichier)
+
+    # Sauvegarder le dataframe dans un fichier CSV
+    merged_df.to_csv(chemin_csv, index=False)
+
+    # Nouvel état enregistré dans l'historique des panels (versions.py), relisible à une date donnée
+    if versionner:
+        from versions import enregistrer_panel
+        enregistrer_panel(chemin_csv, merged_df.set_index('date'))
+    merged_df.attrs["non_rapproches"] = non_rapproches
+    return merged_df
+
+
+def charger_panel(csv_file="financial_data/data_actifs.csv"):
+    # Panel large : une colonne par ticker/ISIN, index = dates
+    return pd.read_csv(csv_file, parse_dates=[0], index_col=0)
+
+
+@lru_cache(maxsize=8)
+def _charger_panel_version(csv_file, version):
+    return charger_panel(csv_file)
+
+
+def charger_panel_en_cache(csv_file="financial_data/data_actifs.csv"):
+    # Un seul parsing par version du fichier, partagé par toutes les sessions du serveur
+    # (le DataFrame renvoyé est partagé : ne pas le modifier en place)
+    return _charger_panel_version(csv_file, os.stat(csv_file).st_mtime_ns)
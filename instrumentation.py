@@ -0,0 +1,115 @@
+import bisect
+import threading
+import time
+from contextlib import ContextDecorator
+
+# Mesure des temps passés dans les pages Streamlit (chargements, calculs, rendus de graphiques).
+# Les durées sont agrégées en histogrammes par section et par actif, dans le processus du serveur.
+
+# Bornes des histogrammes en secondes (mêmes ordres de grandeur que les buckets Prometheus par défaut)
+BORNES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogramme:
+    def __init__(self, bornes=BORNES):
+        self.bornes = bornes
+        self.comptes = [0] * (len(bornes) + 1)
+        self.total = 0.0
+        self.nombre = 0
+        self.maximum = 0.0
+
+    def observer(self, duree):
+        self.comptes[bisect.bisect_left(self.bornes, duree)] += 1
+        self.total += duree
+        self.nombre += 1
+        self.maximum = max(self.maximum, duree)
+
+    def quantile(self, q):
+        # Estimation par interpolation linéaire dans le bucket contenant le quantile
+        if not self.nombre:
+            return 0.0
+        rang = q * self.nombre
+        cumul = 0
+        for i, compte in enumerate(self.comptes):
+            if cumul + compte >= rang and compte:
+                bas = self.bornes[i - 1] if i > 0 else 0.0
+                haut = self.bornes[i] if i < len(self.bornes) else self.maximum
+                return min(bas + (haut - bas) * (rang - cumul) / compte, self.maximum)
+            cumul += compte
+        return self.maximum
+
+
+class Registre:
+    def __init__(self):
+        self._histogrammes = {}
+        self._verrou = threading.Lock()
+
+    def observer(self, section, duree, actif=""):
+        with self._verrou:
+            cle = (section, actif or "")
+            if cle not in self._histogrammes:
+                self._histogrammes[cle] = Histogramme()
+            self._histogrammes[cle].observer(duree)
+
+    def resume(self):
+        # Une ligne par (section, actif) : nombre d'appels, moyenne, quantiles et maximum en secondes
+        with self._verrou:
+            return [
+                {
+                    "section": section,
+                    "actif": actif,
+                    "appels": h.nombre,
+                    "total": h.total,
+                    "moyenne": h.total / h.nombre,
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                    "max": h.maximum,
+                }
+                for (section, actif), h in sorted(self._histogrammes.items())
+            ]
+
+    def exporter_prometheus(self, nom="dashboard_duree_secondes"):
+        # Format texte d'exposition Prometheus (histogramme avec buckets cumulés)
+        lignes = [f"# HELP {nom} Durée des sections des pages Streamlit.", f"# TYPE {nom} histogram"]
+        with self._verrou:
+            for (section, actif), h in sorted(self._histogrammes.items()):
+                etiquettes = f'section="{_echapper(section)}",actif="{_echapper(actif)}"'
+                cumul = 0
+                for borne, compte in zip(list(h.bornes) + ["+Inf"], h.comptes):
+                    cumul += compte
+                    lignes.append(f'{nom}_bucket{{{etiquettes},le="{borne}"}} {cumul}')
+                lignes.append(f"{nom}_sum{{{etiquettes}}} {h.total}")
+                lignes.append(f"{nom}_count{{{etiquettes}}} {h.nombre}")
+        return "\n".join(lignes) + "\n"
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._histogrammes.clear()
+
+
+def _echapper(valeur):
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRE = Registre()
+
+
+class chrono(ContextDecorator):
+    # Utilisable en bloc `with chrono("chargement", actif):` ou en décorateur `@chrono("calcul")`
+    def __init__(self, section, actif="", registre=None):
+        self.section = section
+        self.actif = actif
+        self.registre = registre or REGISTRE
+
+    def _recreate_cm(self):
+        # Une instance par appel quand chrono sert de décorateur (sessions Streamlit concurrentes)
+        return chrono(self.section, self.actif, self.registre)
+
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.duree = time.perf_counter() - self.debut
+        self.registre.observer(self.section, self.duree, self.actif)
+        return False
@@ -0,0 +1,69 @@
+import csv
+import os
+import threading
+
+from referentiel import KPIS_IMPACT
+
+# Lecture et affichage des indicateurs d'impact sans pandas : la page ptfSG.py les montre sur chaque
+# projet dès le premier rendu, sans payer l'import de pandas (impact.py ne sert qu'au calcul d'allocation).
+#
+#   projet,indicateur,valeur,unite,annee
+#   La Varappe,Personnes accompagnées,9958,personnes,2023
+
+KPIS = "financial_data/impact.csv"
+COLONNES_KPIS = ["projet", "indicateur", "valeur", "unite", "annee"]
+
+
+def _annee(valeur):
+    # "2023", "2023.0", 2023 -> 2023 ; vide ou illisible -> None
+    try:
+        return int(float(valeur))
+    except (TypeError, ValueError):
+        return None
+
+
+def lire_lignes_kpis(chemin=KPIS):
+    # (projet, indicateur, valeur, unité, année ou None) du fichier, ou de referentiel.KPIS_IMPACT sans fichier
+    if not os.path.exists(chemin):
+        lignes = KPIS_IMPACT
+    else:
+        with open(chemin, newline="", encoding="utf-8") as f:
+            lecteur = csv.DictReader(f)
+            manquantes = set(COLONNES_KPIS) - set(lecteur.fieldnames or ())
+            if manquantes:
+                raise ValueError(f"Colonnes manquantes dans {chemin} : {', '.join(sorted(manquantes))}")
+            lignes = [tuple(ligne[c] for c in COLONNES_KPIS) for ligne in lecteur]
+    return [(projet, indicateur, float(valeur), unite, _annee(annee))
+            for projet, indicateur, valeur, unite, annee in lignes]
+
+
+def formater_kpi(valeur, unite):
+    # 90000000, "€" -> "90 M€" ; 9958, "personnes" -> "9 958 personnes"
+    if unite == "€":
+        for seuil, suffixe in ((1e9, "Md€"), (1e6, "M€"), (1e3, "k€")):
+            if abs(valeur) >= seuil:
+                return f"{valeur / seuil:,.1f}".replace(",", " ").replace(".", ",").replace(",0", "") + f" {suffixe}"
+        return f"{valeur:,.0f} €".replace(",", " ")
+    texte = f"{valeur:,.0f}" if abs(valeur) >= 10 or valeur == int(valeur) else f"{valeur:,.2f}"
+    return f"{texte.replace(',', ' ').replace('.', ',')} {unite}"
+
+
+def indicateurs_projet(nom, lignes):
+    # Indicateurs d'un projet (toutes années, sans année en dernier), nom comparé sans tenir compte de la casse
+    nom = nom.strip().upper()
+    retenues = [ligne for ligne in lignes if str(ligne[0]).upper() == nom]
+    return sorted(retenues, key=lambda l: (l[1], l[4] is None, l[4] or 0))
+
+
+# Lignes relues seulement quand le fichier change
+_cache = {}
+_verrou = threading.Lock()
+
+
+def charger_lignes_kpis(chemin=KPIS):
+    version = os.stat(chemin).st_mtime_ns if os.path.exists(chemin) else None
+    with _verrou:
+        entree = _cache.get(chemin)
+        if entree is None or entree[0] != version:
+            entree = _cache[chemin] = (version, lire_lignes_kpis(chemin))
+        return entree[1]
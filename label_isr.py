@@ -0,0 +1,177 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Suivi des listes successives du label ISR (250101_Liste_fonds_label_ISR-6.xlsx, -7.xlsx, ...).
+#
+# Chaque fonds est identifié par l'empreinte de (SGP, FONDS) normalisés (casse, accents, espaces), et son
+# contenu par l'empreinte de toutes les colonnes normalisées. La différence entre deux listes est une
+# jointure par table de hachage sur ces empreintes (temps linéaire) : fonds ajoutés, retirés, modifiés.
+#
+# L'historique ne garde que des périodes : une ligne par fonds et par suite de releases où il est labellisé
+# avec un contenu inchangé (release de début, release de fin, contenu). Une nouvelle release ne lit que
+# son propre fichier ; la différence entre deux releases quelconques se calcule sur l'historique.
+
+COLONNES_ISR = ["SGP", "FONDS", "CLASSE D'ACTIFS", "FOCUS GÉO", "ISIN"]
+CLE_ISR = ["SGP", "FONDS"]
+HISTORIQUE_ISR = "financial_data/historique_isr.json"
+
+
+def lire_liste_isr(chemin):
+    # Message d'accueil en A1, en-têtes en ligne 2
+    liste = pd.read_excel(chemin, header=1)
+    manquantes = set(COLONNES_ISR) - set(liste.columns)
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes dans {chemin} : {', '.join(sorted(manquantes))}")
+    return liste[COLONNES_ISR]
+
+
+def normaliser_liste(liste):
+    # Texte sans accents, en majuscules, espaces simplifiés ; cellules vides -> ""
+    normalisee = pd.DataFrame(index=liste.index)
+    for colonne in COLONNES_ISR:
+        texte = liste[colonne].astype("string").fillna("")
+        texte = texte.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+        normalisee[colonne] = texte.str.upper().str.replace(r"\s+", " ", regex=True).str.strip()
+    return normalisee
+
+
+def empreintes(liste):
+    # (clé du fonds, contenu) en uint64, une ligne par fonds ; les doublons de clé ne gardent que la première
+    normalisee = normaliser_liste(liste)
+    cles = pd.util.hash_pandas_object(normalisee[CLE_ISR], index=False).to_numpy()
+    contenus = pd.util.hash_pandas_object(normalisee, index=False).to_numpy()
+    uniques = ~pd.Index(cles).duplicated()
+    return pd.DataFrame({"cle": cles[uniques], "empreinte": contenus[uniques]},
+                        index=liste.index[uniques]), liste[uniques]
+
+
+def _comparer(cles_a, contenus_a, cles_b, contenus_b):
+    # Positions des fonds retirés (dans a), ajoutés et modifiés (dans b), par table de hachage
+    dans_a = pd.Index(cles_a).get_indexer(cles_b)
+    ajoutes = np.flatnonzero(dans_a < 0)
+    communs = np.flatnonzero(dans_a >= 0)
+    modifies = communs[contenus_b[communs] != contenus_a[dans_a[communs]]]
+    retires = np.flatnonzero(pd.Index(cles_b).get_indexer(cles_a) < 0)
+    return retires, ajoutes, modifies
+
+
+def differences(ancienne, nouvelle):
+    # Fonds ajoutés, retirés ou modifiés entre deux listes (DataFrames au format de lire_liste_isr).
+    # Pour un fonds modifié, la colonne « Colonnes modifiées » liste les champs qui ont changé.
+    empreintes_a, ancienne = empreintes(ancienne)
+    empreintes_b, nouvelle = empreintes(nouvelle)
+    retires, ajoutes, modifies = _comparer(empreintes_a["cle"].to_numpy(), empreintes_a["empreinte"].to_numpy(),
+                                           empreintes_b["cle"].to_numpy(), empreintes_b["empreinte"].to_numpy())
+    avant = ancienne.iloc[pd.Index(empreintes_a["cle"]).get_indexer(empreintes_b["cle"].iloc[modifies])]
+    apres = nouvelle.iloc[modifies]
+    changes = normaliser_liste(avant).to_numpy() != normaliser_liste(apres).to_numpy()
+    return pd.concat([
+        ancienne.iloc[retires].assign(Changement="retiré"),
+        nouvelle.iloc[ajoutes].assign(Changement="ajouté"),
+        apres.assign(Changement="modifié",
+                     **{"Colonnes modifiées": [", ".join(np.array(COLONNES_ISR)[c]) for c in changes]}),
+    ], ignore_index=True)
+
+
+class HistoriqueISR:
+    def __init__(self):
+        self.releases = []
+        # Une ligne par période : clé, contenu, index des releases de début et de fin (fin = -1 : en cours)
+        self.periodes = pd.DataFrame({"cle": pd.Series(dtype="uint64"), "empreinte": pd.Series(dtype="uint64"),
+                                      "debut": pd.Series(dtype="int64"), "fin": pd.Series(dtype="int64"),
+                                      **{c: pd.Series(dtype=object) for c in COLONNES_ISR}})
+
+    def _etat(self, position):
+        # Périodes actives à une release (par son index)
+        p = self.periodes
+        return p[(p["debut"] <= position) & ((p["fin"] < 0) | (p["fin"] >= position))]
+
+    def _position(self, release):
+        if release not in self.releases:
+            raise KeyError(f"Release inconnue : {release}")
+        return self.releases.index(release)
+
+    def ajouter_release(self, nom, liste):
+        # Ferme les périodes des fonds retirés ou modifiés et ouvre celles des fonds ajoutés ou modifiés
+        if nom in self.releases:
+            raise ValueError(f"Release déjà enregistrée : {nom}")
+        position = len(self.releases)
+        signatures, liste = empreintes(liste)
+        ouvertes = self.periodes.index[self.periodes["fin"] < 0]
+        en_cours = self.periodes.loc[ouvertes]
+        retires, ajoutes, modifies = _comparer(en_cours["cle"].to_numpy(), en_cours["empreinte"].to_numpy(),
+                                               signatures["cle"].to_numpy(), signatures["empreinte"].to_numpy())
+        # Fonds modifiés : la période en cours se termine à la release précédente
+        fermees = np.concatenate([retires, pd.Index(en_cours["cle"]).get_indexer(signatures["cle"].iloc[modifies])])
+        self.periodes.loc[ouvertes[fermees], "fin"] = position - 1
+        nouvelles = np.concatenate([ajoutes, modifies])
+        lignes = liste.iloc[nouvelles].reset_index(drop=True)
+        lignes.insert(0, "cle", signatures["cle"].to_numpy()[nouvelles])
+        lignes.insert(1, "empreinte", signatures["empreinte"].to_numpy()[nouvelles])
+        lignes.insert(2, "debut", position)
+        lignes.insert(3, "fin", -1)
+        self.periodes = pd.concat([self.periodes, lignes], ignore_index=True) if len(self.periodes) else lignes
+        self.releases.append(nom)
+        return {"ajoutés": len(ajoutes), "retirés": len(retires), "modifiés": len(modifies)}
+
+    def liste(self, release):
+        # Liste d'une release reconstituée depuis l'historique
+        return self._etat(self._position(release))[COLONNES_ISR].reset_index(drop=True)
+
+    def differences(self, release_a, release_b):
+        # Différences entre deux releases quelconques, sans relire leurs fichiers
+        a, b = self._etat(self._position(release_a)), self._etat(self._position(release_b))
+        retires, ajoutes, modifies = _comparer(a["cle"].to_numpy(), a["empreinte"].to_numpy(),
+                                               b["cle"].to_numpy(), b["empreinte"].to_numpy())
+        return pd.concat([
+            a.iloc[retires][COLONNES_ISR].assign(Changement="retiré"),
+            b.iloc[ajoutes][COLONNES_ISR].assign(Changement="ajouté"),
+            b.iloc[modifies][COLONNES_ISR].assign(Changement="modifié"),
+        ], ignore_index=True)
+
+    def statut(self, fonds=None, sgp=None):
+        # Périodes de label des fonds dont le nom (ou la SGP) contient le texte demandé, avec les noms de release
+        periodes = self.periodes
+        if fonds:
+            periodes = periodes[periodes["FONDS"].astype(str).str.contains(fonds, case=False, regex=False)]
+        if sgp:
+            periodes = periodes[periodes["SGP"].astype(str).str.contains(sgp, case=False, regex=False)]
+        noms = np.array(self.releases + [None], dtype=object)
+        return periodes[COLONNES_ISR].assign(Depuis=noms[periodes["debut"].to_numpy()],
+                                             Jusqu_a=noms[periodes["fin"].to_numpy()])
+
+    def sauvegarder(self, chemin=HISTORIQUE_ISR):
+        periodes = self.periodes.astype({"cle": str, "empreinte": str})
+        os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+        with open(chemin, "w", encoding="utf-8") as f:
+            json.dump({"releases": self.releases, "periodes": json.loads(periodes.to_json(orient="split", index=False))},
+                      f, ensure_ascii=False)
+
+    @classmethod
+    def charger(cls, chemin=HISTORIQUE_ISR):
+        historique = cls()
+        if not os.path.exists(chemin):
+            return historique
+        with open(chemin, encoding="utf-8") as f:
+            contenu = json.load(f)
+        historique.releases = contenu["releases"]
+        periodes = pd.DataFrame(contenu["periodes"]["data"], columns=contenu["periodes"]["columns"])
+        if len(periodes):
+            historique.periodes = periodes.astype({"cle": "uint64", "empreinte": "uint64", "debut": "int64", "fin": "int64"})
+        return historique
+
+
+def mettre_a_jour_historique(fichiers, chemin=HISTORIQUE_ISR):
+    # Ajoute à l'historique les fichiers de liste pas encore vus (dans l'ordre donné) ; seuls ceux-là sont lus
+    historique = HistoriqueISR.charger(chemin)
+    resume = {}
+    for fichier in fichiers:
+        nom = os.path.splitext(os.path.basename(fichier))[0]
+        if nom not in historique.releases:
+            resume[nom] = historique.ajouter_release(nom, lire_liste_isr(fichier))
+    if resume:
+        historique.sauvegarder(chemin)
+    return historique, resume
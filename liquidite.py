@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+# Indicateurs de liquidité calculés pour tous les actifs d'un stockage OHLCV (ingestion.lire_ohlcv) à la fois.
+# Chaque fonction reçoit le dictionnaire champ -> PanelCompact et renvoie une valeur par actif, sur les
+# dernières séances du panel.
+
+FENETRE_ADV = 20
+FENETRE_AMIHUD = 250
+FENETRE_SPREAD = 60
+# Part maximale du volume quotidien que l'on s'autorise à traiter pour sortir d'une position
+PARTICIPATION = 0.2
+
+
+def _matrice(ohlcv, champ, fenetre):
+    return ohlcv[champ].valeurs[-fenetre:].astype("float64")
+
+
+def _serie(valeurs, ohlcv, nom):
+    return pd.Series(valeurs, index=ohlcv["clot"].colonnes, name=nom)
+
+
+def _positions(positions, index):
+    # Montant unique pour tous les actifs, ou {actif: montant}
+    if np.isscalar(positions):
+        return pd.Series(positions, index=index, dtype=float)
+    return pd.Series(positions, dtype=float).reindex(index)
+
+
+def _moyenne(valeurs):
+    # Moyenne par colonne sans avertissement pour les colonnes vides
+    n = np.sum(~np.isnan(valeurs), axis=0)
+    return np.where(n > 0, np.nansum(valeurs, axis=0) / np.maximum(n, 1), np.nan)
+
+
+def calculer_adv(ohlcv, fenetre=FENETRE_ADV):
+    # Volume quotidien moyen (titres et montant échangé) ; les jours sans cotation sont ignorés
+    clot, vol = _matrice(ohlcv, "clot", fenetre), _matrice(ohlcv, "vol", fenetre)
+    return pd.DataFrame({"ADV (titres)": _moyenne(vol), "ADV (montant)": _moyenne(clot * vol)},
+                        index=ohlcv["clot"].colonnes)
+
+
+def calculer_amihud(ohlcv, fenetre=FENETRE_AMIHUD):
+    # Illiquidité d'Amihud : |rendement| / montant échangé, moyenne sur les jours avec volume, par million échangé
+    clot = pd.DataFrame(_matrice(ohlcv, "clot", fenetre + 1)).ffill().to_numpy()
+    vol = _matrice(ohlcv, "vol", len(clot) - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rendements = np.abs(clot[1:] / clot[:-1] - 1)
+        ratio = np.where(vol > 0, rendements / (clot[1:] * vol), np.nan)
+    return _serie(_moyenne(ratio) * 1e6, ohlcv, "Amihud")
+
+
+def calculer_spread_corwin_schultz(ohlcv, fenetre=FENETRE_SPREAD):
+    # Fourchette estimée à partir des plus hauts et plus bas de deux séances consécutives (Corwin et Schultz, 2012)
+    haut, bas = _matrice(ohlcv, "haut", fenetre + 1), _matrice(ohlcv, "bas", fenetre + 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = np.log(haut[1:] / bas[1:]) ** 2 + np.log(haut[:-1] / bas[:-1]) ** 2
+        gamma = np.log(np.fmax(haut[1:], haut[:-1]) / np.fmin(bas[1:], bas[:-1])) ** 2
+        k = 3 - 2 * np.sqrt(2)
+        alpha = (np.sqrt(2 * beta) - np.sqrt(beta)) / k - np.sqrt(gamma / k)
+        spread = 2 * (np.exp(alpha) - 1) / (1 + np.exp(alpha))
+    # Les estimations négatives (volatilité de nuit) sont ramenées à zéro
+    return _serie(_moyenne(np.where(np.isnan(spread), np.nan, np.maximum(spread, 0))), ohlcv, "Spread Corwin-Schultz")
+
+
+def calculer_spread_roll(ohlcv, fenetre=FENETRE_SPREAD):
+    # Fourchette relative de Roll : 2 * sqrt(-cov(r_t, r_t-1)), nulle si la covariance est positive
+    clot = pd.DataFrame(_matrice(ohlcv, "clot", fenetre + 2)).ffill().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.log(clot[1:] / clot[:-1])
+        r = np.where(np.isfinite(r), r, np.nan)
+        x, y = r[1:], r[:-1]
+        valides = ~(np.isnan(x) | np.isnan(y))
+        n = valides.sum(axis=0)
+        x, y = np.where(valides, x, 0), np.where(valides, y, 0)
+        cov = (x * y).sum(axis=0) / n - (x.sum(axis=0) / n) * (y.sum(axis=0) / n)
+    spread = np.where(n > 2, 2 * np.sqrt(np.maximum(-cov, 0)), np.nan)
+    return _serie(spread, ohlcv, "Spread Roll")
+
+
+def calculer_jours_pour_liquider(ohlcv, positions, participation=PARTICIPATION, fenetre=FENETRE_ADV):
+    # Séances nécessaires pour vendre une position (montant, scalaire ou {actif: montant}) en traitant
+    # au plus `participation` du montant quotidien moyen échangé
+    adv = calculer_adv(ohlcv, fenetre)["ADV (montant)"]
+    positions = _positions(positions, adv.index)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        jours = positions / (participation * adv.where(adv > 0))
+    return jours.rename("Jours pour liquider")
+
+
+def tableau_liquidite(ohlcv, positions=None, participation=PARTICIPATION):
+    # Tous les indicateurs, une ligne par actif
+    tableau = pd.concat([
+        calculer_adv(ohlcv),
+        calculer_amihud(ohlcv),
+        calculer_spread_corwin_schultz(ohlcv),
+        calculer_spread_roll(ohlcv),
+    ], axis=1)
+    if positions is not None:
+        tableau["Position"] = _positions(positions, tableau.index)
+        tableau["Jours pour liquider"] = calculer_jours_pour_liquider(ohlcv, tableau["Position"], participation)
+    return tableau
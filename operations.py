@@ -0,0 +1,221 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from panel_partage import DOSSIER, _nom, charger_calculs_partages, charger_panel_partage
+
+# Opérations sur titres (dividendes, divisions d'actions) et séries ajustées.
+#
+# Les opérations sont stockées dans financial_data/operations.csv :
+#   date,ticker,type,valeur
+#   2024-02-06,SW.PA,dividende,2.25      montant par action, dans la devise du cours
+#   2024-06-10,EL.PA,division,2          nombre d'actions nouvelles pour une ancienne (0.1 = regroupement 1 pour 10)
+#
+# Deux panels sont produits côte à côte à partir des cours bruts :
+#   - rendement prix : cours corrigé des divisions ;
+#   - rendement total : dividendes réinvestis à la date de détachement.
+# Les séries sont chaînées vers l'avant depuis le premier cours (niveau initial = premier cours brut) :
+# une nouvelle date ou une nouvelle opération ne recalcule que les lignes à partir de sa date
+# (AjusteurIncremental). Pour le dashboard et l'API, les deux panels sont mis à jour une fois par version des
+# fichiers par le worker qui publie, avec son AjusteurIncremental, et publiés en mémoire partagée
+# (charger_panels_ajustes) : les autres workers s'y attachent par mmap.
+
+OPERATIONS = "financial_data/operations.csv"
+COLONNES_OPERATIONS = ["date", "ticker", "type", "valeur"]
+TYPES_OPERATIONS = ("dividende", "division")
+
+
+def lire_operations(chemin=OPERATIONS):
+    if not os.path.exists(chemin):
+        return pd.DataFrame(columns=COLONNES_OPERATIONS).astype({"date": "datetime64[ns]", "valeur": float})
+    operations = pd.read_csv(chemin, parse_dates=["date"])
+    inconnus = set(operations["type"]) - set(TYPES_OPERATIONS)
+    if inconnus:
+        raise ValueError(f"Type d'opération inconnu dans {chemin} : {', '.join(sorted(inconnus))}")
+    return operations[COLONNES_OPERATIONS]
+
+
+def ajouter_operations(nouvelles, chemin=OPERATIONS):
+    # Ajoute des opérations au fichier (les doublons date/ticker/type sont remplacés par la dernière valeur)
+    nouvelles = pd.DataFrame(nouvelles, columns=COLONNES_OPERATIONS)
+    nouvelles["date"] = pd.to_datetime(nouvelles["date"])
+    operations = pd.concat([lire_operations(chemin), nouvelles], ignore_index=True)
+    operations = operations.drop_duplicates(["date", "ticker", "type"], keep="last").sort_values(["date", "ticker"])
+    os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+    operations.to_csv(chemin, index=False, date_format="%Y-%m-%d")
+    return operations
+
+
+def _matrices_operations(index, colonnes, operations):
+    # Ratios de division et dividendes par (date, ticker). Une opération datée d'un jour sans cotation
+    # s'applique au jour de cotation suivant.
+    divisions = np.ones((len(index), len(colonnes)))
+    dividendes = np.zeros((len(index), len(colonnes)))
+    positions = {c: i for i, c in enumerate(colonnes)}
+    operations = operations[operations["ticker"].isin(positions)]
+    lignes = index.searchsorted(operations["date"].to_numpy(), side="left")
+    dans_panel = lignes < len(index)
+    lignes = lignes[dans_panel]
+    operations = operations[dans_panel]
+    cols = operations["ticker"].map(positions).to_numpy(dtype=int)
+    est_division = (operations["type"] == "division").to_numpy()
+    valeurs = operations["valeur"].to_numpy(dtype="float64")
+    np.multiply.at(divisions, (lignes[est_division], cols[est_division]), valeurs[est_division])
+    np.add.at(dividendes, (lignes[~est_division], cols[~est_division]), valeurs[~est_division])
+    return divisions, dividendes
+
+
+def _chainer(prolonges, precedent, divisions, dividendes, niveaux_precedents):
+    # Niveaux prix et total des lignes d'un bloc, à partir de la dernière ligne déjà calculée.
+    # prolonges : cours du bloc prolongés par la dernière valeur connue ; precedent : ligne précédant le bloc.
+    veille = np.vstack([precedent[None, :], prolonges[:-1]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio_prix = prolonges * divisions / veille
+        ratio_total = (prolonges * divisions + dividendes) / veille
+    resultats = []
+    for ratio, niveau in zip((ratio_prix, ratio_total), niveaux_precedents):
+        # Avant le premier cours d'une série, le ratio vaut 1 et le niveau démarre au premier cours
+        ratio = np.where(np.isfinite(ratio), ratio, 1.0)
+        depart = np.where(np.isnan(niveau), _premiers_cours(prolonges), niveau)
+        resultats.append(np.cumprod(ratio, axis=0) * depart)
+    return resultats
+
+
+def _premiers_cours(valeurs):
+    valides = ~np.isnan(valeurs)
+    premiere = valides.argmax(axis=0)
+    return np.where(valides.any(axis=0), valeurs[premiere, np.arange(valeurs.shape[1])], np.nan)
+
+
+def ajuster_panel(panel, operations):
+    # Panels rendement prix et rendement total, recalculés en entier
+    return AjusteurIncremental().mettre_a_jour(panel, operations)
+
+
+class AjusteurIncremental:
+    # Garde les niveaux déjà chaînés : seules les lignes postérieures à la première modification
+    # (nouvelle date, cours corrigé, opération ajoutée ou retirée) sont recalculées.
+    # Les lignes ajoutées en fin de panel sont écrites dans la réserve des tableaux existants ; les panels
+    # déjà renvoyés (vues sur les premières lignes) ne sont donc jamais modifiés.
+    def __init__(self):
+        self.index = None
+        self.colonnes = None
+        self.n = 0
+        self.operations = None
+        self.empreintes = np.empty(0, dtype=np.uint64)
+        # brut, prolongés, niveaux prix et total, sorties prix et total (jours sans cours vides)
+        self._tableaux = None
+        self.lignes_recalculees = 0
+
+    def _premiere_ligne_modifiee(self, index, colonnes, brut, operations, empreintes):
+        if self.index is None or list(colonnes) != list(self.colonnes):
+            return 0
+        commun = min(self.n, len(index))
+        if not self.index[:commun].equals(index[:commun]):
+            return 0
+        debut = len(index)
+        # Cours modifiés sur la partie déjà calculée
+        ancien = self._tableaux[0][:commun]
+        differents = (brut[:commun] != ancien) & ~(np.isnan(brut[:commun]) & np.isnan(ancien))
+        lignes = np.flatnonzero(differents.any(axis=1))
+        if len(lignes):
+            debut = lignes[0]
+        # Opérations ajoutées ou retirées (comparées par empreinte de ligne)
+        if not np.array_equal(empreintes, self.empreintes):
+            dates = pd.concat([operations["date"][~np.isin(empreintes, self.empreintes)],
+                               self.operations["date"][~np.isin(self.empreintes, empreintes)]])
+            if len(dates):
+                debut = min(debut, int(index.searchsorted(dates.min(), side="left")))
+        return min(debut, commun)
+
+    def _reserver(self, debut, n, n_colonnes):
+        # Tableaux où écrire les lignes [debut, n) : ceux en place si c'est un ajout en fin et qu'il reste
+        # de la réserve, sinon une copie agrandie des lignes [0, debut)
+        if self._tableaux is not None and debut == self.n and n <= len(self._tableaux[0]):
+            return self._tableaux
+        capacite = n + max(n // 4, 16)
+        tableaux = [np.empty((capacite, n_colonnes)) for _ in range(6)]
+        if debut:
+            for nouveau, ancien in zip(tableaux, self._tableaux):
+                nouveau[:debut] = ancien[:debut]
+        return tableaux
+
+    def mettre_a_jour(self, panel, operations):
+        if not panel.index.is_monotonic_increasing:
+            panel = panel.sort_index()
+        index, colonnes = panel.index, panel.columns
+        brut = panel.to_numpy(dtype="float64")
+        operations = operations[COLONNES_OPERATIONS]
+        empreintes = pd.util.hash_pandas_object(operations, index=False).to_numpy()
+        debut = self._premiere_ligne_modifiee(index, colonnes, brut, operations, empreintes)
+
+        n, nan = len(index), np.full(len(colonnes), np.nan)
+        if debut < n or n < self.n:
+            tableaux = self._reserver(debut, n, len(colonnes))
+            if debut < n:
+                # Opérations du bloc recalculé : postérieures au dernier jour de cotation déjà chaîné
+                bloc = operations[operations["date"] > index[debut - 1]] if debut else operations
+                divisions, dividendes = _matrices_operations(index[debut:], colonnes, bloc)
+                precedent = tableaux[1][debut - 1] if debut else nan
+                prolonges = pd.DataFrame(np.vstack([precedent[None, :], brut[debut:]])).ffill().to_numpy()[1:]
+                niveaux_precedents = [tableaux[2][debut - 1], tableaux[3][debut - 1]] if debut else [nan, nan]
+                niveau_prix, niveau_total = _chainer(prolonges, precedent, divisions, dividendes, niveaux_precedents)
+                manquants = np.isnan(brut[debut:])
+                tableaux[0][debut:n] = brut[debut:]
+                tableaux[1][debut:n] = prolonges
+                tableaux[2][debut:n] = niveau_prix
+                tableaux[3][debut:n] = niveau_total
+                tableaux[4][debut:n] = np.where(manquants, np.nan, niveau_prix)
+                tableaux[5][debut:n] = np.where(manquants, np.nan, niveau_total)
+            self._tableaux = tableaux
+        self.lignes_recalculees = n - min(debut, n)
+        self.index, self.colonnes, self.n = index, colonnes, n
+        self.operations, self.empreintes = operations, empreintes
+
+        prix, total = (pd.DataFrame(sortie[:n], index=index, columns=colonnes, copy=False)
+                       for sortie in self._tableaux[4:])
+        return prix, total
+
+
+# Panels ajustés attachés par ce processus : (csv, dossier) -> (version des fichiers, (prix, total))
+_ajustes = {}
+# Ajusteur du worker qui a publié la dernière version : (csv, dossier) -> (version des fichiers, ajusteur).
+# La publication suivante, faite par ce même worker, ne recalcule que les lignes modifiées ou ajoutées ;
+# un worker qui s'attache à une version publiée par un autre libère le sien (un seul état par machine).
+_ajusteurs = {}
+_verrou = threading.Lock()
+
+
+def _version(chemin):
+    return os.stat(chemin).st_mtime_ns if os.path.exists(chemin) else None
+
+
+def _ajuster_et_garder(cle, version, csv_file, chemin_operations, dossier):
+    with _verrou:
+        ajusteur = _ajusteurs.get(cle, (None, None))[1] or AjusteurIncremental()
+    panels = ajusteur.mettre_a_jour(charger_panel_partage(csv_file, dossier), lire_operations(chemin_operations))
+    with _verrou:
+        _ajusteurs[cle] = (version, ajusteur)
+    return panels
+
+
+def charger_panels_ajustes(csv_file="financial_data/data_actifs.csv", chemin_operations=OPERATIONS, dossier=DOSSIER):
+    # (rendement prix, rendement total) du fichier de cours, en lecture seule. Calculés par le premier worker
+    # qui trouve le fichier de cours ou celui des opérations modifié, puis publiés en mémoire partagée : les
+    # autres workers s'y attachent sans garder de tableaux intermédiaires. Même tuple tant que rien ne change.
+    cle, version = (csv_file, dossier), [_version(csv_file), _version(chemin_operations)]
+    with _verrou:
+        entree = _ajustes.get(cle)
+        if entree is not None and entree[0] == version:
+            return entree[1]
+    nom = _nom(csv_file)
+    panels = charger_calculs_partages(
+        [f"{nom}.prix", f"{nom}.total"], version,
+        lambda: _ajuster_et_garder(cle, version, csv_file, chemin_operations, dossier), dossier)
+    with _verrou:
+        _ajustes[cle] = (version, panels)
+        if _ajusteurs.get(cle, (None,))[0] != version:
+            _ajusteurs.pop(cle, None)
+    return panels
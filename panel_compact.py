@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from panel_partage import DOSSIER, charger_panel_partage
+
+# Panel de prix compact : une matrice float32 (ou float64) dates x tickers en ordre colonne, les dates en
+# numéros de jour int32 (jours depuis le 1970-01-01) et un dictionnaire ticker -> colonne.
+# Les séries sont des vues sans copie ; la conversion en pandas n'a lieu qu'au moment de tracer ou
+# d'exporter (serie, vers_dataframe).
+
+
+def _jours(dates):
+    return pd.DatetimeIndex(dates).values.astype("datetime64[D]").astype(np.int32)
+
+
+class PanelCompact:
+    def __init__(self, valeurs, jours, colonnes):
+        if valeurs.shape != (len(jours), len(colonnes)):
+            raise ValueError(f"Matrice {valeurs.shape} incompatible avec {len(jours)} dates et {len(colonnes)} colonnes")
+        self.valeurs = valeurs
+        self.jours = np.asarray(jours, dtype=np.int32)
+        self.colonnes = list(colonnes)
+        self.positions = {c: i for i, c in enumerate(self.colonnes)}
+
+    @classmethod
+    def depuis_dataframe(cls, df, dtype=np.float32):
+        df = df.sort_index()
+        valeurs = np.asfortranarray(df.to_numpy(dtype=dtype))
+        return cls(valeurs, _jours(df.index), [str(c) for c in df.columns])
+
+    def __len__(self):
+        return len(self.jours)
+
+    def __contains__(self, ticker):
+        return ticker in self.positions
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(self.jours.astype("datetime64[D]"), name="date")
+
+    @property
+    def nbytes(self):
+        return self.valeurs.nbytes + self.jours.nbytes
+
+    def colonne(self, ticker):
+        # Vue sur la série (contiguë en ordre colonne), sans copie
+        try:
+            return self.valeurs[:, self.positions[ticker]]
+        except KeyError:
+            raise KeyError(f"Ticker absent du panel : {ticker}") from None
+
+    def lignes(self, debut=None, fin=None):
+        # Tranche de lignes [debut, fin] (dates incluses) par recherche dichotomique sur les numéros de jour
+        i = 0 if debut is None else int(np.searchsorted(self.jours, _jours([debut])[0], side="left"))
+        j = len(self.jours) if fin is None else int(np.searchsorted(self.jours, _jours([fin])[0], side="right"))
+        return slice(i, j)
+
+    def fenetre(self, debut=None, fin=None):
+        # Sous-panel sur une période : vues sur la matrice et les dates
+        tranche = self.lignes(debut, fin)
+        return PanelCompact(self.valeurs[tranche], self.jours[tranche], self.colonnes)
+
+    def selection(self, tickers):
+        # Sous-panel sur des tickers (copie des seules colonnes demandées)
+        positions = [self.positions[t] for t in tickers]
+        return PanelCompact(np.asfortranarray(self.valeurs[:, positions]), self.jours, tickers)
+
+    def serie(self, ticker, debut=None, fin=None, dropna=True):
+        tranche = self.lignes(debut, fin)
+        serie = pd.Series(self.colonne(ticker)[tranche], index=self.dates[tranche], name=ticker, copy=False)
+        return serie.dropna() if dropna else serie
+
+    def vers_dataframe(self, tickers=None):
+        if tickers is not None:
+            return self.selection(tickers).vers_dataframe()
+        return pd.DataFrame(self.valeurs, index=self.dates, columns=self.colonnes, copy=False)
+
+
+# Panels compacts déjà construits par ce processus : (csv, dossier, dtype) -> (version, PanelCompact)
+_compacts = {}
+_verrou = threading.Lock()
+
+
+def charger_panel_compact(csv_file="financial_data/data_actifs.csv", dtype=np.float32, dossier=DOSSIER):
+    # Panel publié en mémoire partagée dans la précision demandée : tous les workers lisent la même matrice
+    df = charger_panel_partage(csv_file, dossier, dtype)
+    cle = (csv_file, dossier, np.dtype(dtype).name)
+    with _verrou:
+        entree = _compacts.get(cle)
+        if entree is None or entree[0] != df.attrs["version"]:
+            entree = _compacts[cle] = (df.attrs["version"], PanelCompact(df.to_numpy(), _jours(df.index), df.columns))
+    return entree[1]
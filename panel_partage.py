@@ -0,0 +1,201 @@
+import glob
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from ingestion import charger_panel
+
+# Panel de prix partagé entre les processus Streamlit d'une même machine.
+# Le premier worker qui trouve le CSV plus récent que la publication le parse et publie la matrice
+# (colonne par colonne, float64 ou float32) et les dates dans des fichiers .npy ; les autres s'y attachent en
+# lecture seule par mmap, sans copie. Chaque publication a un numéro de version, et le fichier
+# « courant » qui désigne la version active est remplacé atomiquement. Les calculs tirés des panels (séries
+# ajustées d'operations.py, agrégats de pyramide.py) sont publiés de la même façon par le premier worker qui
+# les trouve périmés (charger_calculs_partages) : une copie par machine au lieu d'une par worker.
+#
+#   python panel_partage.py financial_data/data_actifs.csv financial_data/data_fonds.csv
+
+# /dev/shm est un tmpfs : les pages des fichiers publiés sont directement de la mémoire partagée
+DOSSIER = "/dev/shm/finance_durable" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "finance_durable")
+
+# Versions conservées sur disque après une publication (les workers encore attachés gardent leur mmap), et
+# délai de grâce : une version plus ancienne n'est supprimée que remplacée depuis DELAI_GRACE secondes, pour
+# qu'un worker qui vient de lire le pointeur « courant » ait le temps de la mapper
+VERSIONS_GARDEES = 2
+DELAI_GRACE = 60.0
+
+
+def _nom(csv_file, dtype="float64"):
+    # Une publication par fichier et par précision : data_actifs.3f2a91c0, data_actifs.3f2a91c0.float32, ...
+    # L'empreinte du chemin réel sépare les fichiers de même nom (plusieurs copies du dépôt sur la machine)
+    empreinte = hashlib.blake2b(os.path.realpath(csv_file).encode(), digest_size=4).hexdigest()
+    nom = f"{os.path.splitext(os.path.basename(csv_file))[0]}.{empreinte}"
+    dtype = np.dtype(dtype).name
+    return nom if dtype == "float64" else f"{nom}.{dtype}"
+
+
+def _chemins(nom, version, dossier):
+    base = os.path.join(dossier, f"{nom}.v{version}")
+    return base + ".valeurs.npy", base + ".dates.npy", base + ".json"
+
+
+def version_courante(nom, dossier=DOSSIER):
+    try:
+        with open(os.path.join(dossier, f"{nom}.courant")) as f:
+            return int(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def publier_panel(df, nom, dossier=DOSSIER, source_mtime_ns=None, dtype="float64"):
+    # Écrit une nouvelle version puis bascule le pointeur « courant » dessus
+    os.makedirs(dossier, exist_ok=True)
+    version = (version_courante(nom, dossier) or 0) + 1
+    valeurs, dates, meta = _chemins(nom, version, dossier)
+
+    # Ordre colonne (Fortran) : chaque série est contiguë, une colonne = une vue sans copie
+    np.save(valeurs, np.asfortranarray(df.to_numpy(dtype=dtype)))
+    np.save(dates, df.index.values.astype("datetime64[ns]").view("int64"))
+    with open(meta, "w") as f:
+        json.dump({"colonnes": [str(c) for c in df.columns], "index": df.index.name,
+                   "source_mtime_ns": source_mtime_ns}, f)
+
+    pointeur = os.path.join(dossier, f"{nom}.courant")
+    temporaire = f"{pointeur}.{os.getpid()}"
+    with open(temporaire, "w") as f:
+        f.write(str(version))
+    os.replace(temporaire, pointeur)
+
+    _nettoyer(nom, version, dossier)
+    return version
+
+
+def _remplacee_depuis(nom, ancienne, dossier):
+    # Date de publication de la version suivante (None si elle a déjà été supprimée : remplacée depuis longtemps)
+    try:
+        return os.stat(_chemins(nom, ancienne + 1, dossier)[2]).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _nettoyer(nom, version, dossier):
+    # Les fichiers supprimés restent lisibles par les processus qui les ont déjà mappés
+    limite = time.time() - DELAI_GRACE
+    for chemin in glob.glob(os.path.join(dossier, f"{nom}.v*.*")):
+        ancienne = int(os.path.basename(chemin)[len(nom) + 2:].split(".")[0])
+        if ancienne > version - VERSIONS_GARDEES:
+            continue
+        remplacee = _remplacee_depuis(nom, ancienne, dossier)
+        if remplacee is None or remplacee <= limite:
+            try:
+                os.remove(chemin)
+            except FileNotFoundError:
+                pass
+
+
+def attacher_panel(nom, version=None, dossier=DOSSIER):
+    # DataFrame adossé au mmap en lecture seule : aucune copie des valeurs dans le processus
+    version = version or version_courante(nom, dossier)
+    if version is None:
+        raise FileNotFoundError(f"Aucun panel publié pour : {nom}")
+    valeurs, dates, meta = _chemins(nom, version, dossier)
+    with open(meta) as f:
+        meta = json.load(f)
+    matrice = np.load(valeurs, mmap_mode="r")
+    index = pd.DatetimeIndex(np.load(dates).view("datetime64[ns]"), name=meta["index"])
+    df = pd.DataFrame(matrice, index=index, columns=meta["colonnes"], copy=False)
+    df.attrs["version"] = version
+    df.attrs["source_mtime_ns"] = meta["source_mtime_ns"]
+    return df
+
+
+class _Verrou:
+    # Verrou inter-processus sur fichier : un seul worker parse et publie
+    def __init__(self, chemin):
+        self.chemin = chemin
+
+    def __enter__(self):
+        import fcntl
+        self.fichier = open(self.chemin, "w")
+        fcntl.flock(self.fichier, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        import fcntl
+        fcntl.flock(self.fichier, fcntl.LOCK_UN)
+        self.fichier.close()
+        return False
+
+
+def _version_a_jour(nom, source, dossier):
+    # Version courante si elle a été publiée à partir de `source` (dates de modification des fichiers d'origine)
+    version = version_courante(nom, dossier)
+    if version is None:
+        return None
+    try:
+        with open(_chemins(nom, version, dossier)[2]) as f:
+            return version if json.load(f)["source_mtime_ns"] == source else None
+    except FileNotFoundError:
+        return None
+
+
+def publier_calculs(noms, source, calculer, dossier=DOSSIER, dtype="float64"):
+    # Publie les DataFrames renvoyés par calculer() sous `noms`, sauf si les publications courantes viennent
+    # déjà de `source` (valeur JSON : date de modification d'un fichier, ou liste de dates). Un seul worker
+    # calcule ; ses tableaux intermédiaires sont libérés une fois la publication écrite.
+    versions = [_version_a_jour(nom, source, dossier) for nom in noms]
+    if None not in versions:
+        return versions
+
+    # Publication à refaire : les autres workers attendent le verrou puis trouvent la version à jour
+    os.makedirs(dossier, exist_ok=True)
+    with _Verrou(os.path.join(dossier, f"{noms[0]}.verrou")):
+        versions = [_version_a_jour(nom, source, dossier) for nom in noms]
+        if None in versions:
+            versions = [publier_panel(df, nom, dossier, source_mtime_ns=source, dtype=dtype)
+                        for nom, df in zip(noms, calculer())]
+    return versions
+
+
+def publier_si_perime(csv_file, dossier=DOSSIER, dtype="float64"):
+    return publier_calculs([_nom(csv_file, dtype)], os.stat(csv_file).st_mtime_ns, lambda: [charger_panel(csv_file)],
+                           dossier, dtype)[0]
+
+
+# Panels attachés par ce processus : (nom, dossier) -> DataFrame de la dernière version vue
+_attaches = {}
+_verrou_attaches = threading.Lock()
+
+
+def _attacher_en_cache(nom, version, dossier):
+    with _verrou_attaches:
+        df = _attaches.get((nom, dossier))
+        if df is None or df.attrs["version"] != version:
+            df = _attaches[(nom, dossier)] = attacher_panel(nom, version, dossier)
+    return df
+
+
+def charger_panel_partage(csv_file="financial_data/data_actifs.csv", dossier=DOSSIER, dtype="float64"):
+    # À appeler à chaque rerun : lecture d'un petit fichier pointeur, ré-attachement seulement si la version change
+    return _attacher_en_cache(_nom(csv_file, dtype), publier_si_perime(csv_file, dossier, dtype), dossier)
+
+
+def charger_calculs_partages(noms, source, calculer, dossier=DOSSIER, dtype="float64"):
+    # Résultats d'un calcul fait une fois par machine et par version des fichiers d'origine (séries ajustées,
+    # agrégats) : DataFrames en lecture seule adossés au mmap, sans copie dans le processus
+    versions = publier_calculs(noms, source, calculer, dossier, dtype)
+    return tuple(_attacher_en_cache(nom, version, dossier) for nom, version in zip(noms, versions))
+
+
+if __name__ == "__main__":
+    for csv_file in sys.argv[1:]:
+        nom = _nom(csv_file)
+        version = publier_panel(charger_panel(csv_file), nom, source_mtime_ns=os.stat(csv_file).st_mtime_ns)
+        print(f"{csv_file} -> {os.path.join(DOSSIER, nom)} (version {version})")
@@ -0,0 +1,464 @@
+import argparse
+import ast
+import fnmatch
+import glob
+import hashlib
+import inspect
+import json
+import os
+import sys
+import textwrap
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+
+import pandas as pd
+
+from base_sql import BASE
+from label_isr import HISTORIQUE_ISR
+from operations import OPERATIONS
+from rapprochement import DECISIONS
+from referentiel import OHLCV, PANELS
+
+# Chaîne de traitement des données, des listes ISR aux fiches, déclarée comme un graphe d'étapes :
+#
+#   ecran, historique_isr      listes ISR (.xlsx) -> fonds repérés par mots-clés, historique du label
+#   ingestion                  exports .txt -> financial_data/data_fonds.csv (+ OHLCV, rapport qualité)
+#   controles                  panels de cours -> rapport qualité de toutes les séries
+#   performances, stress       panels hors séries en quarantaine -> tableaux CSV
+#   factsheets                 panels -> fiches actifs et poches
+#   base_sql                   panels et OHLCV -> base SQL des cours (base_sql.py)
+#
+# Chaque étape déclare ses fichiers d'entrée et de sortie ; une étape dépend de celles qui produisent ses
+# entrées. Une étape n'est refaite que si l'empreinte de ses entrées (contenu des fichiers, paramètres, code
+# de l'étape et des modules du dépôt qu'elle importe, de proche en proche) a changé ou si ses sorties ont
+# disparu ou été modifiées : un passage de nuit ne refait que ce qui a changé. Les étapes indépendantes
+# tournent en parallèle. L'état est écrit après chaque étape : après
+# un échec, le passage suivant reprend à l'étape en échec (les étapes réussies sont à jour). Une étape
+# facultative (l'ingestion) en échec ne bloque pas les suivantes : elles repartent des fichiers existants.
+#
+#   python pipeline.py                        # toutes les étapes, seulement celles à refaire
+#   python pipeline.py --liste                # graphe et étapes à refaire, sans rien exécuter
+#   python pipeline.py performances           # une étape et celles dont elle dépend
+#   python pipeline.py --forcer controles     # refaire une étape même à jour
+
+ETAT_PIPELINE = "financial_data/pipeline.json"
+LISTES_ISR = "*Liste_fonds_label_ISR*.xlsx"
+EXPORTS = "*_????-??-??.txt"
+FONDS_ISR = "financial_data/fonds_isr.csv"
+QUALITE = "financial_data/qualite_panels.csv"
+PERFORMANCES = "financial_data/performances.csv"
+STRESS = "financial_data/stress.csv"
+MANIFESTE_FACTSHEETS = "factsheets/manifeste.json"
+REPERTOIRE = os.path.dirname(os.path.abspath(__file__))
+REFERENTIEL = os.path.join(REPERTOIRE, "referentiel.py")
+TAILLE_LECTURE = 1 << 20
+
+
+class Etape:
+    def __init__(self, nom, fonction, entrees=None, sorties=None, apres=(), parametres=None, facultative=False):
+        # entrees, sorties : {clé: chemin}. Une entrée est un chemin (obligatoire), un motif glob (au moins un
+        # fichier) ou une liste de chemins (ceux qui existent, éventuellement aucun). La fonction reçoit les
+        # entrées résolues, les sorties et les paramètres : fonction(entrees, sorties, **parametres).
+        # facultative : l'échec de l'étape ne bloque pas les suivantes, qui travaillent sur les fichiers
+        # existants (ceux du passage précédent)
+        self.nom = nom
+        self.fonction = fonction
+        self.entrees = entrees or {}
+        self.sorties = sorties or {}
+        self.apres = tuple(apres)
+        self.parametres = parametres or {}
+        self.facultative = facultative
+
+    def motifs(self):
+        return [m for valeur in self.entrees.values() for m in ([valeur] if isinstance(valeur, str) else valeur)]
+
+
+def _est_motif(chemin):
+    return any(c in chemin for c in "*?[")
+
+
+def _ecrire_csv(df, chemin, **options):
+    # Écriture dans un fichier voisin puis remplacement : une étape interrompue ne laisse pas de sortie tronquée
+    os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    df.to_csv(temporaire, **options)
+    os.replace(temporaire, chemin)
+
+
+# Étapes (exécutées dans un processus à part : imports faits dans la fonction)
+
+def ecran_isr(entrees, sorties, mots_cles=None):
+    from ingestion import MOTS_CLES_ISR, filtrer_fonds_isr
+    _ecrire_csv(filtrer_fonds_isr(entrees["listes"], mots_cles or MOTS_CLES_ISR), sorties["fonds"], index=False)
+
+
+def historiser_listes_isr(entrees, sorties):
+    from label_isr import mettre_a_jour_historique
+    _, resume = mettre_a_jour_historique(entrees["listes"], sorties["historique"])
+    return f"{len(resume)} liste(s) ajoutée(s)"
+
+
+def ingerer_exports(entrees, sorties):
+    from ingestion import merge_fichiers_avec_isin
+    panel = merge_fichiers_avec_isin(entrees["exports"], dossier_output=os.path.dirname(sorties["panel"]),
+                                     nom_fichier=os.path.basename(sorties["panel"]), listes_isr=entrees["listes"])
+    message = f"{panel.shape[1] - 1} séries, {len(panel)} dates"
+    if panel.attrs["non_rapproches"]:
+        message += (f", {len(panel.attrs['non_rapproches'])} export(s) non rapproché(s) (voir rapprochement_"
+                    f"{os.path.basename(sorties['panel'])})")
+    return message
+
+
+def controler_panels(entrees, sorties):
+    from ingestion import charger_panel
+    from validation import controler_panel
+
+    if not entrees["panels"]:
+        raise FileNotFoundError("Aucun fichier de cours à contrôler")
+    rapport = pd.concat([controler_panel(charger_panel(p)).assign(panel=p) for p in entrees["panels"]])
+    _ecrire_csv(rapport, sorties["rapport"], index_label="serie")
+    return f"{int(rapport['quarantaine'].sum())} série(s) en quarantaine sur {len(rapport)}"
+
+
+def _panels_valides(panels, chemin_qualite, rendement="prix", chemin_operations=None):
+    # Panels réunis, sans les séries mises en quarantaine par l'étape de contrôle
+    from ingestion import charger_panel
+
+    panels = [charger_panel(p) for p in panels]
+    if rendement == "total":
+        from operations import ajuster_panel, lire_operations
+        operations = lire_operations(chemin_operations) if chemin_operations else lire_operations()
+        panels = [ajuster_panel(p, operations)[1] for p in panels]
+    panel = pd.concat(panels, axis=1).sort_index()
+    qualite = pd.read_csv(chemin_qualite, index_col=0)
+    return panel.drop(columns=[c for c in qualite.index[qualite["quarantaine"]] if c in panel.columns])
+
+
+def tableau_performances(entrees, sorties):
+    from analyses import calculer_performances
+    panel = _panels_valides(entrees["panels"], entrees["qualite"])
+    _ecrire_csv(calculer_performances(panel), sorties["performances"], index_label="Ticker")
+
+
+def tableau_stress(entrees, sorties):
+    from stress import stresser
+    operations = entrees["operations"][0] if entrees["operations"] else None
+    pnl, _ = stresser(_panels_valides(entrees["panels"], entrees["qualite"], "total", operations))
+    _ecrire_csv(pnl, sorties["stress"], index_label="Scénario")
+
+
+def generer_fiches(entrees, sorties, pdf=False):
+    from factsheets import generer_factsheets
+    generees, inchangees = generer_factsheets(os.path.dirname(sorties["manifeste"]), panels=entrees["panels"], pdf=pdf)
+    return f"{len(generees)} fiches générées, {inchangees} inchangées"
+
+
+def remplir_base_sql(entrees, sorties):
+    from base_sql import BaseCours
+    base = BaseCours(sorties["base"])
+    try:
+        chargees = base.charger_fichiers(entrees["panels"], entrees["ohlcv"])
+    finally:
+        base.fermer()
+    return f"{sum(chargees.values())} lignes écrites"
+
+
+def etapes_par_defaut(panels=PANELS):
+    panels = list(panels)
+    return [
+        Etape("ecran", ecran_isr, {"listes": LISTES_ISR}, {"fonds": FONDS_ISR}),
+        Etape("historique_isr", historiser_listes_isr, {"listes": LISTES_ISR}, {"historique": HISTORIQUE_ISR}),
+        # Exports non rapprochés : les étapes suivantes repartent des panels existants
+        Etape("ingestion", ingerer_exports, {"exports": EXPORTS, "listes": [LISTES_ISR], "decisions": [DECISIONS]},
+              {"panel": "financial_data/data_fonds.csv", "ohlcv": "financial_data/ohlcv_data_fonds.npz"},
+              facultative=True),
+        Etape("controles", controler_panels, {"panels": panels}, {"rapport": QUALITE}),
+        Etape("performances", tableau_performances, {"panels": panels, "qualite": QUALITE}, {"performances": PERFORMANCES}),
+        # Composition et scores ESG du référentiel : le modifier refait le stress et les fiches
+        Etape("stress", tableau_stress, {"panels": panels, "qualite": QUALITE, "operations": [OPERATIONS],
+                                 "referentiel": [REFERENTIEL]}, {"stress": STRESS}),
+        Etape("factsheets", generer_fiches, {"panels": panels, "referentiel": [REFERENTIEL]},
+              {"manifeste": MANIFESTE_FACTSHEETS}),
+        Etape("base_sql", remplir_base_sql, {"panels": panels, "ohlcv": list(OHLCV)}, {"base": BASE}),
+    ]
+
+
+def dependances(etapes):
+    # {étape: étapes dont elle dépend} : producteurs de ses entrées et dépendances déclarées (apres)
+    noms = {e.nom for e in etapes}
+    graphe = {}
+    for etape in etapes:
+        inconnues = set(etape.apres) - noms
+        if inconnues:
+            raise ValueError(f"Étape inconnue dans les dépendances de {etape.nom} : {', '.join(sorted(inconnues))}")
+        graphe[etape.nom] = set(etape.apres) | {
+            autre.nom for autre in etapes if autre is not etape
+            for sortie in autre.sorties.values() for motif in etape.motifs()
+            if sortie == motif or fnmatch.fnmatch(sortie, motif)}
+    return graphe
+
+
+def ordre_topologique(graphe):
+    ordre, restants = [], {nom: set(amont) for nom, amont in graphe.items()}
+    while restants:
+        prets = sorted(nom for nom, amont in restants.items() if not amont - set(ordre))
+        if not prets:
+            raise ValueError(f"Dépendances circulaires entre : {', '.join(sorted(restants))}")
+        ordre += prets
+        for nom in prets:
+            del restants[nom]
+    return ordre
+
+
+def _ascendants(graphe, noms):
+    vus, pile = set(), list(noms)
+    while pile:
+        nom = pile.pop()
+        if nom not in vus:
+            vus.add(nom)
+            pile.extend(graphe[nom])
+    return vus
+
+
+class EtatPipeline:
+    # Empreintes des fichiers (recalculées seulement si la taille ou la date de modification change) et
+    # dernier passage de chaque étape
+    def __init__(self, chemin=ETAT_PIPELINE):
+        self.chemin = chemin
+        self.fichiers, self.etapes = {}, {}
+        if os.path.exists(chemin):
+            with open(chemin) as f:
+                contenu = json.load(f)
+            self.fichiers, self.etapes = contenu["fichiers"], contenu["etapes"]
+
+    def empreinte(self, chemin):
+        if not os.path.exists(chemin):
+            return None
+        stat = os.stat(chemin)
+        connue = self.fichiers.get(chemin)
+        if connue and connue[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return connue[2]
+        h = hashlib.blake2b(digest_size=16)
+        with open(chemin, "rb") as f:
+            for bloc in iter(lambda: f.read(TAILLE_LECTURE), b""):
+                h.update(bloc)
+        self.fichiers[chemin] = [stat.st_mtime_ns, stat.st_size, h.hexdigest()]
+        return h.hexdigest()
+
+    def sauvegarder(self):
+        # Les fichiers disparus (exports renommés, listes retirées) ne sont plus suivis
+        self.fichiers = {c: e for c, e in self.fichiers.items() if os.path.exists(c)}
+        os.makedirs(os.path.dirname(self.chemin) or ".", exist_ok=True)
+        temporaire = f"{self.chemin}.{os.getpid()}.tmp"
+        with open(temporaire, "w") as f:
+            json.dump({"fichiers": self.fichiers, "etapes": self.etapes}, f, indent=1)
+        os.replace(temporaire, self.chemin)
+
+
+def entrees_manquantes(etape):
+    # Entrées obligatoires (chemin ou motif) sans fichier correspondant
+    return [v for v in etape.entrees.values() if isinstance(v, str) and not (glob.glob(v) if _est_motif(v) else
+                                                                              os.path.exists(v))]
+
+
+def resoudre_entrees(etape):
+    # Chemins effectifs des entrées ; None si une entrée obligatoire manque
+    resolues = {}
+    for cle, valeur in etape.entrees.items():
+        if isinstance(valeur, str) and _est_motif(valeur):
+            resolues[cle] = sorted(glob.glob(valeur))
+            if not resolues[cle]:
+                return None
+        elif isinstance(valeur, str):
+            if not os.path.exists(valeur):
+                return None
+            resolues[cle] = valeur
+        else:
+            resolues[cle] = sorted({c for motif in valeur for c in (glob.glob(motif) if _est_motif(motif) else
+                                                                     [motif] if os.path.exists(motif) else [])})
+    return resolues
+
+
+def _modules_importes(source):
+    # Modules du dépôt (fichiers .py du répertoire de pipeline.py) importés dans un code source
+    noms = set()
+    for noeud in ast.walk(ast.parse(source)):
+        if isinstance(noeud, ast.Import):
+            noms.update(alias.name.split(".")[0] for alias in noeud.names)
+        elif isinstance(noeud, ast.ImportFrom) and not noeud.level and noeud.module:
+            noms.add(noeud.module.split(".")[0])
+    chemins = (os.path.join(REPERTOIRE, f"{nom}.py") for nom in noms)
+    return {c for c in chemins if os.path.exists(c)}
+
+
+@lru_cache(maxsize=256)
+def _imports_fichier(chemin, version):
+    # Un seul parsing par version du fichier
+    with open(chemin, encoding="utf-8") as f:
+        return frozenset(_modules_importes(f.read()))
+
+
+def code_etape(fonction):
+    # Sources de l'étape (la fonction et les fonctions de son module qu'elle appelle, comme _panels_valides)
+    # et fichiers des modules du dépôt qu'elles importent, avec leurs propres imports de proche en proche :
+    # modifier analyses.py ou validation.py refait les étapes qui s'en servent
+    codes, modules, a_lire, vues = [], set(), [fonction], set()
+    while a_lire:
+        f = a_lire.pop()
+        if f in vues:
+            continue
+        vues.add(f)
+        try:
+            source = inspect.getsource(f)
+        except (OSError, TypeError):
+            codes.append(getattr(f, "__qualname__", repr(f)))
+            continue
+        codes.append(source)
+        modules |= _modules_importes(textwrap.dedent(source))
+        appelees = (f.__globals__.get(nom) for nom in f.__code__.co_names)
+        a_lire += [g for g in appelees if inspect.isfunction(g) and g.__module__ == f.__module__]
+    a_lire, modules = list(modules), set()
+    while a_lire:
+        chemin = a_lire.pop()
+        if chemin not in modules:
+            modules.add(chemin)
+            a_lire += _imports_fichier(chemin, os.stat(chemin).st_mtime_ns)
+    return codes, sorted(modules)
+
+
+def cle_etape(etape, entrees, etat):
+    # Empreinte de tout ce dont dépend le résultat : contenu des entrées, paramètres, code de l'étape et des
+    # modules qu'elle utilise
+    codes, modules = code_etape(etape.fonction)
+    fichiers = {c: etat.empreinte(c) for valeur in entrees.values() for c in ([valeur] if isinstance(valeur, str) else valeur)}
+    contenu = json.dumps({"entrees": fichiers, "parametres": etape.parametres, "code": codes,
+                          "modules": {os.path.basename(c): etat.empreinte(c) for c in modules}},
+                         sort_keys=True, default=str)
+    return hashlib.blake2b(contenu.encode(), digest_size=16).hexdigest()
+
+
+def a_jour(etape, cle, etat):
+    # Même empreinte d'entrée qu'au dernier succès, et sorties telles qu'elles avaient été écrites
+    dernier = etat.etapes.get(etape.nom)
+    if not dernier or dernier.get("statut") != "ok" or dernier.get("cle") != cle:
+        return False
+    return all(etat.empreinte(c) == e for c, e in dernier["sorties"].items())
+
+
+def _executer(fonction, entrees, sorties, parametres):
+    # Dans le processus de travail : le message d'erreur complet remonte avec la trace
+    debut = time.perf_counter()
+    try:
+        return "ok", fonction(entrees, sorties, **parametres), time.perf_counter() - debut
+    except Exception:
+        return "echec", traceback.format_exc(), time.perf_counter() - debut
+
+
+def executer_pipeline(etapes=None, cibles=None, forcer=(), processus=None, chemin_etat=ETAT_PIPELINE):
+    # Exécute les étapes à refaire (et seulement celles menant aux cibles si elles sont données). Statuts :
+    # ok, à jour, échec, bloquée (une étape amont non facultative a échoué), sans entrée (entrée obligatoire
+    # absente).
+    etapes = {e.nom: e for e in (etapes or etapes_par_defaut())}
+    graphe = dependances(etapes.values())
+    ordre = ordre_topologique(graphe)
+    inconnues = set(cibles or ()) - set(etapes)
+    if inconnues:
+        raise ValueError(f"Étape inconnue : {', '.join(sorted(inconnues))}")
+    retenues = _ascendants(graphe, cibles) if cibles else set(ordre)
+    forcer = retenues if forcer is True else set(forcer)
+    etat = EtatPipeline(chemin_etat)
+    resultats = {}
+
+    def terminer(nom, statut, message="", duree=0.0, cle=None):
+        resultats[nom] = {"etape": nom, "statut": statut, "duree": round(duree, 3), "message": message}
+        if statut in ("ok", "echec"):
+            etape = etapes[nom]
+            etat.etapes[nom] = {"statut": statut, "cle": cle, "fin": pd.Timestamp.now(tz="UTC").isoformat(),
+                                "duree": round(duree, 3), "message": message,
+                                "sorties": {c: etat.empreinte(c) for c in etape.sorties.values()}}
+            etat.sauvegarder()
+
+    with ProcessPoolExecutor(max_workers=processus) as pool:
+        en_cours = {}
+        while len(resultats) < len(retenues):
+            lancees = {nom for nom, _ in en_cours.values()}
+            for nom in ordre:
+                if nom not in retenues or nom in resultats or nom in lancees:
+                    continue
+                amont = graphe[nom] & retenues
+                if any(resultats.get(a, {}).get("statut") in ("echec", "bloquée") and not etapes[a].facultative
+                       for a in amont):
+                    terminer(nom, "bloquée", "étape amont en échec")
+                    continue
+                if not all(a in resultats for a in amont):
+                    continue
+                etape = etapes[nom]
+                entrees = resoudre_entrees(etape)
+                if entrees is None:
+                    terminer(nom, "sans entrée", ", ".join(entrees_manquantes(etape)))
+                    continue
+                cle = cle_etape(etape, entrees, etat)
+                if nom not in forcer and a_jour(etape, cle, etat):
+                    terminer(nom, "à jour")
+                    continue
+                en_cours[pool.submit(_executer, etape.fonction, entrees, etape.sorties, etape.parametres)] = (nom, cle)
+            if not en_cours:
+                continue
+            finis, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+            for futur in finis:
+                nom, cle = en_cours.pop(futur)
+                statut, message, duree = futur.result()
+                terminer(nom, statut, "" if message is None else str(message), duree, cle)
+    return pd.DataFrame([resultats[nom] for nom in ordre if nom in resultats],
+                        columns=["etape", "statut", "duree", "message"])
+
+
+def plan(etapes=None, chemin_etat=ETAT_PIPELINE):
+    # Étapes à refaire sans rien exécuter : une étape est à refaire si ses entrées ont changé ou si une
+    # étape amont est à refaire. Comme à l'exécution, une étape facultative déjà en échec sur les mêmes
+    # entrées ne change pas les fichiers des suivantes : elles sont jugées sur leurs propres entrées.
+    etapes = {e.nom: e for e in (etapes or etapes_par_defaut())}
+    graphe = dependances(etapes.values())
+    etat = EtatPipeline(chemin_etat)
+    lignes, a_refaire = [], set()
+    for nom in ordre_topologique(graphe):
+        etape = etapes[nom]
+        entrees = resoudre_entrees(etape)
+        cle = cle_etape(etape, entrees, etat) if entrees is not None else None
+        dernier = etat.etapes.get(nom, {})
+        if graphe[nom] & a_refaire:
+            statut = "à refaire (amont)"
+        elif entrees is None:
+            statut = "sans entrée"
+        elif a_jour(etape, cle, etat):
+            statut = "à jour"
+        elif etape.facultative and dernier.get("statut") == "echec" and dernier.get("cle") == cle:
+            statut = "à refaire (échec, facultative)"
+        else:
+            statut = "à refaire"
+        if statut in ("à refaire", "à refaire (amont)"):
+            a_refaire.add(nom)
+        lignes.append({"etape": nom, "depend de": ", ".join(sorted(graphe[nom])), "statut": statut,
+                       "dernier passage": dernier.get("fin", ""), "dernier statut": dernier.get("statut", "")})
+    return pd.DataFrame(lignes, columns=["etape", "depend de", "statut", "dernier passage", "dernier statut"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chaîne de traitement : listes ISR, ingestion, contrôles, analyses, fiches")
+    parser.add_argument("cibles", nargs="*", help="étapes à produire (avec leurs dépendances) ; toutes par défaut")
+    parser.add_argument("--liste", action="store_true", help="afficher le graphe et les étapes à refaire")
+    parser.add_argument("--forcer", nargs="*", help="refaire ces étapes (toutes si aucune n'est donnée)")
+    parser.add_argument("--processus", type=int, default=None)
+    parser.add_argument("--etat", default=ETAT_PIPELINE)
+    args = parser.parse_args()
+    if args.liste:
+        print(plan(chemin_etat=args.etat).to_string(index=False))
+        sys.exit(0)
+    forcer = () if args.forcer is None else (args.forcer or True)
+    rapport = executer_pipeline(cibles=args.cibles or None, forcer=forcer, processus=args.processus,
+                                chemin_etat=args.etat)
+    for ligne in rapport.itertuples():
+        print(f"{ligne.etape:<16} {ligne.statut:<12} {ligne.duree:>8.2f} s  {ligne.message.strip().splitlines()[-1] if ligne.message.strip() else ''}")
+    sys.exit(1 if (rapport["statut"] == "echec").any() else 0)
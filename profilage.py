@@ -0,0 +1,29 @@
+import streamlit as st
+import pandas as pd
+
+from instrumentation import REGISTRE
+
+st.set_page_config(page_title="Profilage", layout="wide")
+st.title("Profilage des pages")
+st.caption("Durées mesurées dans ce processus serveur depuis son démarrage (en secondes).")
+
+resume = pd.DataFrame(REGISTRE.resume())
+if resume.empty:
+    st.info("Aucune mesure pour l'instant : naviguez dans les pages du dashboard puis revenez ici.")
+else:
+    # Sections les plus coûteuses en premier
+    resume = resume.sort_values("total", ascending=False)
+    st.subheader("Par section")
+    par_section = resume.groupby("section")[["appels", "total"]].sum().sort_values("total", ascending=False)
+    st.dataframe(par_section)
+    st.subheader("Par section et par actif")
+    st.dataframe(resume, hide_index=True)
+
+texte = REGISTRE.exporter_prometheus()
+with st.expander("Export Prometheus"):
+    st.code(texte, language="text")
+st.download_button("Télécharger les métriques", texte, file_name="metrics.txt")
+
+if st.button("Réinitialiser les mesures"):
+    REGISTRE.reinitialiser()
+    st.rerun()
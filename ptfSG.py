@@ -1,5 +1,8 @@
 import streamlit as st
 
+from instrumentation import chrono
+from kpis_impact import charger_lignes_kpis, formater_kpi, indicateurs_projet
+
 st.set_page_config(layout="wide")
 st.title("Investissement Socialement Responsable : Inclusion et Équité")
 st.subheader("Portefeuille SG")
@@ -22,9 +25,6 @@ projets = [
         "Nom": "La Varappe",
         "Description": "Chantiers écologiques & BTP pour publics très éloignés de l’emploi",
         "Type": "Insertion sociale",
-        "CA 2021": "66,5M€",
-        "CA 2022": "87,4M€",
-        "CA 2023": "90M€",
     },
     {
         "Nom": "OREADIS PRODUCTIONS",
@@ -38,19 +38,49 @@ projets = [
     },
 ]
 
+# Indicateurs lus sans pandas : la page reste légère au démarrage (budget de demarrage.py)
+kpis = charger_lignes_kpis()
+
 st.subheader("Les projets")
-for i in range(0, len(projets), 3):
-    cols = st.columns(3)
-    for col, projet in zip(cols, projets[i:i+3]):
-        with col.container():
-            st.markdown(f"### {projet['Nom']}")
-            st.caption(projet["Type"])
-            with st.expander("Voir plus"):
-                st.write(projet["Description"])
-                if "CA 2021" in projet:
-                    st.write(f"**CA 2021** : {projet['CA 2021']}")
-                    st.write(f"**CA 2022** : {projet['CA 2022']}")
-                    st.write(f"**CA 2023** : {projet['CA 2023']}")
+with chrono("rendu", "projets"):
+    for i in range(0, len(projets), 3):
+        cols = st.columns(3)
+        for col, projet in zip(cols, projets[i:i+3]):
+            with col.container():
+                st.markdown(f"### {projet['Nom']}")
+                st.caption(projet["Type"])
+                with st.expander("Voir plus"):
+                    st.write(projet["Description"])
+                    for _, indicateur, valeur, unite, annee in indicateurs_projet(projet["Nom"], kpis):
+                        annee = "" if annee is None else f" {annee}"
+                        st.write(f"**{indicateur}{annee}** : {formater_kpi(valeur, unite)}")
+
+# ------------------ IMPACT DE L'ALLOCATION ------------------
+st.subheader("Impact de votre allocation")
+st.caption("Impact attribuable aux montants investis : indicateurs du projet rapportés à son chiffre d'affaires "
+           "(ou aux montants mobilisés), valeurs les plus récentes.")
+
+# Calcul à la demande : impact.py (pandas, numpy) n'est importé qu'une fois la section ouverte
+if st.toggle("Calculer l'impact d'une allocation", key="impact_allocation"):
+    with chrono("calcul", "impact"):
+        from impact import MoteurImpact, charger_kpis
+
+        cols = st.columns(len(projets))
+        montants = {projet["Nom"]: col.number_input(projet["Nom"], min_value=0, value=100_000, step=10_000,
+                                                    key=f"montant_{projet['Nom']}")
+                    for col, projet in zip(cols, projets)}
+        # Moteur gardé par session : seuls les montants ou indicateurs modifiés sont recalculés
+        if "moteur_impact" not in st.session_state:
+            st.session_state["moteur_impact"] = MoteurImpact(charger_kpis(), montants)
+        moteur = st.session_state["moteur_impact"]
+        moteur.mettre_a_jour_kpis(charger_kpis()).modifier_allocation(montants)
+        impact = moteur.impact().iloc[0]
+        impact = impact[impact > 0]
+        for col, (indicateur, valeur) in zip(st.columns(max(len(impact), 1)), impact.items()):
+            col.metric(indicateur, formater_kpi(valeur, moteur.unites[indicateur]))
+        non_attribue = moteur.montants_non_attribues().iloc[0]
+        if non_attribue:
+            st.caption(f"{formater_kpi(non_attribue, '€')} investis dans des projets sans base d'attribution.")
 
 # ------------------ LES FONDS À IMPACT ------------------
 st.header("💼 Les Fonds à Impact")
@@ -73,14 +103,15 @@ fonds_impact = [
     },
 ]
 
-for i in range(0, len(fonds_impact), 3):
-    cols = st.columns(3)
-    for col, fonds in zip(cols, fonds_impact[i:i+3]):
-        with col.container():
-            st.markdown(f"### {fonds['Nom']}")
-            st.caption(fonds["Type"])
-            with st.expander("Voir plus"):
-                st.markdown(f"[Lien vers le fonds]({fonds['Lien']})")
+with chrono("rendu", "fonds"):
+    for i in range(0, len(fonds_impact), 3):
+        cols = st.columns(3)
+        for col, fonds in zip(cols, fonds_impact[i:i+3]):
+            with col.container():
+                st.markdown(f"### {fonds['Nom']}")
+                st.caption(fonds["Type"])
+                with st.expander("Voir plus"):
+                    st.markdown(f"[Lien vers le fonds]({fonds['Lien']})")
 
 # ------------------ LES OBLIGATIONS ------------------
 st.header("🧾 Les Obligations")
@@ -93,13 +124,14 @@ obligations = [
     },
 ]
 
-cols = st.columns(3)
-for col, oblig in zip(cols, obligations):
-    with col.container():
-        st.markdown(f"### {oblig['Nom']}")
-        st.caption(oblig["Type"])
-        with st.expander("Voir plus"):
-            st.write(oblig["Description"])
+with chrono("rendu", "obligations"):
+    cols = st.columns(3)
+    for col, oblig in zip(cols, obligations):
+        with col.container():
+            st.markdown(f"### {oblig['Nom']}")
+            st.caption(oblig["Type"])
+            with st.expander("Voir plus"):
+                st.write(oblig["Description"])
 
 # ------------------ LES ACTIONS ------------------
 # ------------------ LES ACTIONS ------------------
@@ -171,12 +203,13 @@ Investir dans cette entreprise, c’est conjuguer performance économique et imp
     },
 ]
 
-for i in range(0, len(actions), 3):
-    cols = st.columns(3)
-    for col, action in zip(cols, actions[i:i+3]):
-        with col.container():
-            st.markdown(f"### {action['Nom']}")
-            st.caption(action["Type"])
-            with st.expander("Voir plus"):
-                st.markdown(action["Description"])
+with chrono("rendu", "actions"):
+    for i in range(0, len(actions), 3):
+        cols = st.columns(3)
+        for col, action in zip(cols, actions[i:i+3]):
+            with col.container():
+                st.markdown(f"### {action['Nom']}")
+                st.caption(action["Type"])
+                with st.expander("Voir plus"):
+                    st.markdown(action["Description"])
 
@@ -0,0 +1,213 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from operations import charger_panels_ajustes
+from panel_compact import PanelCompact, _jours
+from panel_partage import DOSSIER, _nom, charger_calculs_partages
+
+# Pyramide multi-résolution des séries de prix : agrégats hebdomadaires, mensuels et trimestriels
+# (ouverture, plus haut, plus bas, dernier cours) calculés à côté des données journalières.
+# Un graphique lit le niveau le plus fin qui ne dépasse pas un point par pixel : une vue « Max » sur
+# 20 ans lit quelques centaines de points par série au lieu de plusieurs milliers.
+# Quand des dates sont ajoutées, seules les périodes à partir de la première ligne modifiée sont refaites.
+# Les pyramides des panels ajustés du dashboard sont mises à jour une fois par version des fichiers par le
+# worker qui publie, puis publiées en mémoire partagée (float32) ; chaque worker s'y attache par mmap
+# (charger_pyramides_ajustees).
+
+NIVEAUX = ["jour", "semaine", "mois", "trimestre"]
+CHAMPS = ["ouv", "haut", "bas", "clot"]
+
+# Largeur de tracé par défaut (pixels) et périodes proposées par le dashboard (jours calendaires)
+LARGEUR = 900
+PERIODES = {"1 an": 365, "3 ans": 3 * 365, "5 ans": 5 * 365, "10 ans": 10 * 365, "Max": None}
+
+
+def _cles_periodes(jours, niveau):
+    # Numéro de période de chaque date (jours = numéros de jour int32 depuis le 1970-01-01, un jeudi)
+    if niveau == "jour":
+        return jours
+    if niveau == "semaine":
+        return (jours + 3) // 7
+    mois = jours.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return mois if niveau == "mois" else mois // 3
+
+
+def _agreger(valeurs, jours, niveau):
+    # OHLC par période, toutes les séries à la fois (les périodes sont des suites de lignes consécutives)
+    cles = _cles_periodes(jours, niveau)
+    debuts = np.flatnonzero(np.r_[True, cles[1:] != cles[:-1]])
+    fins = np.r_[debuts[1:], len(jours)] - 1
+    valides = np.add.reduceat(~np.isnan(valeurs), debuts, axis=0) > 0
+    prolonges = pd.DataFrame(valeurs)
+    with np.errstate(invalid="ignore"):
+        champs = {
+            "ouv": prolonges.bfill().to_numpy()[debuts],
+            "haut": np.fmax.reduceat(valeurs, debuts, axis=0),
+            "bas": np.fmin.reduceat(valeurs, debuts, axis=0),
+            "clot": prolonges.ffill().to_numpy()[fins],
+        }
+    # Date d'une période : sa dernière date de cotation
+    return {c: np.asfortranarray(np.where(valides, v, np.nan).astype(valeurs.dtype)) for c, v in champs.items()}, jours[fins]
+
+
+class Pyramide:
+    def __init__(self):
+        self.colonnes = None
+        self.jours = np.empty(0, dtype=np.int32)
+        self.valeurs = None
+        # niveau -> (jours de fin de période, {champ: matrice périodes x tickers})
+        self.niveaux = {}
+        self.lignes_recalculees = 0
+
+    @classmethod
+    def depuis_panel(cls, panel):
+        pyramide = cls()
+        pyramide.mettre_a_jour(panel)
+        return pyramide
+
+    @classmethod
+    def depuis_niveaux(cls, jour, niveaux):
+        # Pyramide sur des tableaux existants (mmap) : jour = DataFrame journalier, niveaux = {niveau: DataFrame
+        # des champs CHAMPS côte à côte} (vers_dataframes) ; aucune copie des valeurs
+        pyramide = cls()
+        pyramide.colonnes = [str(c) for c in jour.columns]
+        pyramide.jours, pyramide.valeurs = _jours(jour.index), jour.to_numpy()
+        pyramide.positions = {c: i for i, c in enumerate(pyramide.colonnes)}
+        pyramide.niveaux["jour"] = (pyramide.jours, {c: pyramide.valeurs for c in CHAMPS})
+        n = len(pyramide.colonnes)
+        for niveau, df in niveaux.items():
+            valeurs = df.to_numpy()
+            pyramide.niveaux[niveau] = (_jours(df.index), {c: valeurs[:, i * n:(i + 1) * n] for i, c in enumerate(CHAMPS)})
+        return pyramide
+
+    def vers_dataframes(self):
+        # {niveau: DataFrame des champs CHAMPS côte à côte} des niveaux agrégés, pour les publier
+        return {niveau: pd.DataFrame(np.hstack([champs[c] for c in CHAMPS]),
+                                     index=pd.DatetimeIndex(jours.astype("datetime64[D]"), name="date"),
+                                     columns=self.colonnes * len(CHAMPS))
+                for niveau, (jours, champs) in self.niveaux.items() if niveau != "jour"}
+
+    def _premiere_ligne_modifiee(self, panel):
+        if self.valeurs is None or list(panel.colonnes) != list(self.colonnes):
+            return 0
+        commun = min(len(self.jours), len(panel.jours))
+        if not np.array_equal(self.jours[:commun], panel.jours[:commun]):
+            return 0
+        ancien, nouveau = self.valeurs[:commun], panel.valeurs[:commun]
+        differents = (ancien != nouveau) & ~(np.isnan(ancien) & np.isnan(nouveau))
+        lignes = np.flatnonzero(differents.any(axis=1))
+        return int(lignes[0]) if len(lignes) else commun
+
+    def mettre_a_jour(self, panel):
+        # panel : PanelCompact (ou DataFrame) complet ; seules les périodes touchées sont recalculées
+        if isinstance(panel, pd.DataFrame):
+            panel = PanelCompact.depuis_dataframe(panel)
+        debut = self._premiere_ligne_modifiee(panel)
+        n = len(panel.jours)
+        if debut == n and n == len(self.jours):
+            self.lignes_recalculees = 0
+            return self
+        for niveau in NIVEAUX[1:]:
+            # Recalcul depuis le début de la période qui contient la première ligne modifiée
+            cles = _cles_periodes(panel.jours, niveau)
+            depart = 0 if debut == 0 else int(np.searchsorted(cles, cles[min(debut, n - 1)], side="left"))
+            champs, jours = _agreger(panel.valeurs[depart:], panel.jours[depart:], niveau)
+            if depart and niveau in self.niveaux:
+                anciens_jours, anciens_champs = self.niveaux[niveau]
+                garder = int(np.searchsorted(anciens_jours, panel.jours[depart], side="left"))
+                jours = np.r_[anciens_jours[:garder], jours]
+                champs = {c: np.asfortranarray(np.vstack([anciens_champs[c][:garder], champs[c]])) for c in CHAMPS}
+            self.niveaux[niveau] = (jours, champs)
+        self.niveaux["jour"] = (panel.jours, {c: panel.valeurs for c in CHAMPS})
+        self.lignes_recalculees = n - debut
+        self.colonnes, self.jours, self.valeurs = panel.colonnes, panel.jours, panel.valeurs
+        self.positions = {c: i for i, c in enumerate(self.colonnes)}
+        return self
+
+    def niveau_pour(self, debut=None, fin=None, largeur=LARGEUR):
+        # Niveau le plus fin qui ne dépasse pas un point par pixel sur la période demandée
+        for niveau in NIVEAUX:
+            tranche = self._tranche(self.niveaux[niveau][0], debut, fin)
+            if tranche.stop - tranche.start <= largeur:
+                return niveau
+        return NIVEAUX[-1]
+
+    @staticmethod
+    def _tranche(jours, debut, fin):
+        i = 0 if debut is None else int(np.searchsorted(jours, _jours([debut])[0], side="left"))
+        j = len(jours) if fin is None else int(np.searchsorted(jours, _jours([fin])[0], side="right"))
+        return slice(i, j)
+
+    def vue(self, tickers, debut=None, fin=None, largeur=LARGEUR, champ="clot", niveau=None):
+        # DataFrame (conversion pandas au moment de tracer) du niveau adapté à la période et à la largeur
+        niveau = niveau or self.niveau_pour(debut, fin, largeur)
+        jours, champs = self.niveaux[niveau]
+        tranche = self._tranche(jours, debut, fin)
+        positions = [self.positions[t] for t in tickers]
+        index = pd.DatetimeIndex(jours[tranche].astype("datetime64[D]"), name="date")
+        df = pd.DataFrame(champs[champ][tranche][:, positions], index=index, columns=tickers)
+        df.attrs["niveau"] = niveau
+        return df
+
+    def ohlc(self, ticker, debut=None, fin=None, largeur=LARGEUR, niveau=None):
+        niveau = niveau or self.niveau_pour(debut, fin, largeur)
+        return pd.concat({c: self.vue([ticker], debut, fin, champ=c, niveau=niveau)[ticker] for c in CHAMPS}, axis=1)
+
+
+# Pyramides des panels ajustés attachées par ce processus : (csv, dossier) -> (panels ajustés, pyramides)
+_pyramides = {}
+# Pyramides du worker qui a publié la dernière version : (csv, dossier) -> (source, pyramides). La
+# publication suivante, faite par ce même worker, ne refait que les dernières périodes ; un worker qui
+# s'attache à une version publiée par un autre libère les siennes (un seul état par machine).
+_publiees = {}
+_verrou = threading.Lock()
+
+
+def _niveaux_ajustes(cle, source, panels):
+    # Niveaux agrégés des deux panels ajustés, mis à jour sur leurs tableaux partagés (sans copie float32)
+    with _verrou:
+        pyramides = _publiees.get(cle, (None, None))[1] or tuple(Pyramide() for _ in panels)
+    niveaux = []
+    for pyramide, panel in zip(pyramides, panels):
+        pyramide.mettre_a_jour(PanelCompact(panel.to_numpy(), _jours(panel.index), panel.columns))
+        niveaux += pyramide.vers_dataframes().values()
+    with _verrou:
+        _publiees[cle] = (source, pyramides)
+    return niveaux
+
+
+def charger_pyramides_ajustees(csv_file="financial_data/data_actifs.csv", dossier=DOSSIER):
+    # (pyramide rendement prix, pyramide rendement total) : niveau jour = panels ajustés partagés, niveaux
+    # agrégés publiés une fois par version des fichiers pour tous les workers
+    cle = (csv_file, dossier)
+    panels = charger_panels_ajustes(csv_file, dossier=dossier)
+    with _verrou:
+        entree = _pyramides.get(cle)
+        # charger_panels_ajustes renvoie le même tuple tant que les fichiers n'ont pas changé
+        if entree is not None and entree[0] is panels:
+            return entree[1]
+    nom = _nom(csv_file)
+    noms = [f"{nom}.{rendement}.{niveau}" for rendement in ("prix", "total") for niveau in NIVEAUX[1:]]
+    source = panels[0].attrs["source_mtime_ns"]
+    niveaux = charger_calculs_partages(noms, source, lambda: _niveaux_ajustes(cle, source, panels),
+                                       dossier, dtype="float32")
+    n = len(NIVEAUX) - 1
+    pyramides = tuple(Pyramide.depuis_niveaux(panel, dict(zip(NIVEAUX[1:], niveaux[i * n:(i + 1) * n])))
+                      for i, panel in enumerate(panels))
+    with _verrou:
+        _pyramides[cle] = (panels, pyramides)
+        if _publiees.get(cle, (None,))[0] != source:
+            _publiees.pop(cle, None)
+    return pyramides
+
+
+def vues_periode(pyramides, symbole, periode="Max", largeur=LARGEUR):
+    # Séries à tracer pour un actif sur une des PERIODES du dashboard (rendement prix, rendement total)
+    fin = pd.Timestamp(pyramides[0].jours[-1].astype("datetime64[D]")) if len(pyramides[0].jours) else None
+    jours = PERIODES[periode]
+    debut = None if jours is None or fin is None else fin - pd.Timedelta(days=jours)
+    niveau = pyramides[0].niveau_pour(debut, fin, largeur)
+    return tuple(p.vue([symbole], debut, fin, niveau=niveau) for p in pyramides)
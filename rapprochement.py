@@ -0,0 +1,300 @@
+import argparse
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from referentiel import ACTIFS_COTES, IDENTIFIANTS_COTATIONS
+
+# Rapprochement des noms de fonds (exports de cotations, listes du label ISR, actifs du référentiel) avec
+# leurs identifiants et leurs séries de cours, sans dictionnaire saisi à la main.
+#
+# Les noms sont normalisés (accents, casse, ponctuation) puis compactés sans espaces : les exports
+# s'appellent « INSERTIONEMPLOISDYNAMIQUERC_2025-04-09.txt », les listes « Insertion Emplois Dynamique ».
+# La similarité est le coefficient de Dice sur les trigrammes de caractères, calculé en tableaux numpy :
+#   - blocage : chaque source n'est comparée qu'aux références partageant un de ses trigrammes les plus
+#     rares (CLES_BLOC, dans la limite de POSTINGS_MAX références) ; les CANDIDATS références les plus
+#     fréquentes dans ces blocs sont retenues ;
+#   - score exact des seuls couples candidats.
+# Une correspondance est automatique au-dessus de SEUIL_AUTO avec une avance de MARGE sur le meilleur autre
+# identifiant, à vérifier au-dessus de SEUIL_MIN. Les décisions validées ou rejetées sont conservées dans
+# financial_data/rapprochements.csv et priment sur les scores aux passages suivants.
+#
+#   python rapprochement.py *.txt --isr 250101_Liste_fonds_label_ISR-7.xlsx
+
+DECISIONS = "financial_data/rapprochements.csv"
+COLONNES_DECISIONS = ["source", "identifiant", "decision"]
+CLES_BLOC = 6
+CANDIDATS = 10
+# Références parcourues au plus par source pour le blocage, et couples traités par paquet
+POSTINGS_MAX = 2000
+TAILLE_BLOC = 2 ** 22
+SEUIL_AUTO = 0.8
+SEUIL_MIN = 0.5
+MARGE = 0.1
+
+# Caractères des noms compactés : A-Z, 0-9 et un marqueur de début/fin de nom
+_ALPHABET = "#ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+_BASE = len(_ALPHABET)
+_CODES = np.full(256, -1, dtype=np.int64)
+_CODES[np.frombuffer(_ALPHABET.encode("ascii"), dtype=np.uint8)] = np.arange(_BASE)
+
+
+def normaliser_noms(noms):
+    # « Candriam Sustainable Bond – Euro Corp. » -> « CANDRIAM SUSTAINABLE BOND EURO CORP »
+    texte = pd.Series(noms, dtype="string").fillna("")
+    texte = texte.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii").str.upper()
+    return texte.str.replace(r"[^A-Z0-9]+", " ", regex=True).str.strip()
+
+
+def nom_export(fichier):
+    # « dossier/INSERTIONEMPLOISDYNAMIQUERC_2025-04-09.txt » -> « INSERTIONEMPLOISDYNAMIQUERC »
+    nom = os.path.splitext(os.path.basename(fichier))[0]
+    return re.sub(r"_\d{4}-\d{2}-\d{2}$", "", nom)
+
+
+def _compacts(noms):
+    return normaliser_noms(noms).str.replace(" ", "", regex=False).tolist()
+
+
+def _trigrammes(compacts):
+    # Couples (document, trigramme) uniques, triés, et nombre de trigrammes par document
+    texte = "\0".join(f"#{c}#" for c in compacts).encode("ascii")
+    codes = _CODES[np.frombuffer(texte, dtype=np.uint8)]
+    documents = np.cumsum(codes < 0)
+    valides = (codes[:-2] >= 0) & (codes[1:-1] >= 0) & (codes[2:] >= 0)
+    ids = (codes[:-2] * _BASE + codes[1:-1]) * _BASE + codes[2:]
+    cles = np.unique(documents[:-2][valides] * _BASE ** 3 + ids[valides])
+    documents, ids = np.divmod(cles, _BASE ** 3)
+    return documents, ids, np.bincount(documents, minlength=len(compacts))
+
+
+def _deplier(debuts, longueurs):
+    # Positions debut..debut+longueur de chaque intervalle, bout à bout
+    total = longueurs.sum()
+    decalages = np.repeat(np.cumsum(longueurs) - longueurs, longueurs)
+    return np.repeat(debuts, longueurs) + np.arange(total) - decalages
+
+
+def apparier(sources, references, cles_bloc=CLES_BLOC, candidats=CANDIDATS, postings_max=POSTINGS_MAX):
+    # Couples candidats (position de la source, position de la référence, score de Dice), meilleurs d'abord
+    docs_s, tri_s, n_s = _trigrammes(_compacts(sources))
+    docs_r, tri_r, n_r = _trigrammes(_compacts(references))
+    frequences = np.bincount(tri_r, minlength=_BASE ** 3)
+
+    # Blocage : les trigrammes les plus rares de chaque source (absents des références exclus), tant que le
+    # nombre de références à parcourir reste sous POSTINGS_MAX (le plus rare est toujours gardé)
+    presents = frequences[tri_s] > 0
+    docs_b, tri_b = docs_s[presents], tri_s[presents]
+    ordre = np.lexsort((frequences[tri_b], docs_b))
+    docs_b, tri_b = docs_b[ordre], tri_b[ordre]
+    longueurs = frequences[tri_b]
+    premiers = np.searchsorted(docs_b, docs_b)
+    cumul = np.cumsum(longueurs)
+    cumul -= (cumul - longueurs)[premiers]
+    rangs = np.arange(len(docs_b)) - premiers
+    garder = (rangs < cles_bloc) & ((cumul <= postings_max) | (rangs == 0))
+    docs_b, tri_b, longueurs = docs_b[garder], tri_b[garder], longueurs[garder]
+
+    # Index inversé des références ; les sources sont traitées par paquets d'au plus TAILLE_BLOC couples
+    ordre_r = np.argsort(tri_r, kind="stable")
+    tri_tries, refs_tries = tri_r[ordre_r], docs_r[ordre_r]
+    par_source = np.bincount(docs_b, weights=longueurs, minlength=len(n_s))
+    paquets = ((np.cumsum(par_source) - par_source) // TAILLE_BLOC).astype(np.int64)[docs_b]
+    src, ref = [], []
+    for paquet in np.unique(paquets):
+        dans = paquets == paquet
+        d, t, n = docs_b[dans], tri_b[dans], longueurs[dans]
+        refs = refs_tries[_deplier(np.searchsorted(tri_tries, t), n)]
+        couples, communs = np.unique(np.repeat(d, n) * len(n_r) + refs, return_counts=True)
+        sp, rp = np.divmod(couples, len(n_r))
+        # CANDIDATS références par source, par nombre de trigrammes de bloc partagés
+        ordre = np.lexsort((-communs, sp))
+        sp, rp = sp[ordre], rp[ordre]
+        garder = np.arange(len(sp)) - np.searchsorted(sp, sp) < candidats
+        src.append(sp[garder])
+        ref.append(rp[garder])
+    src = np.concatenate(src) if src else np.empty(0, dtype=np.int64)
+    ref = np.concatenate(ref) if ref else np.empty(0, dtype=np.int64)
+
+    # Score exact : trigrammes de la source présents dans la référence
+    cles_r = docs_r * _BASE ** 3 + tri_r
+    debuts_s = np.searchsorted(docs_s, src)
+    positions = _deplier(debuts_s, n_s[src])
+    cles = np.repeat(ref, n_s[src]) * _BASE ** 3 + tri_s[positions]
+    trouves = np.searchsorted(cles_r, cles)
+    trouves = cles_r[np.minimum(trouves, len(cles_r) - 1)] == cles
+    intersections = np.bincount(np.repeat(np.arange(len(src)), n_s[src]), weights=trouves, minlength=len(src))
+    scores = 2 * intersections / (n_s[src] + n_r[ref])
+    ordre = np.lexsort((-scores, src))
+    return pd.DataFrame({"source": src[ordre], "reference": ref[ordre], "score": scores[ordre]})
+
+
+def references(listes_isr=(), actifs_cotes=ACTIFS_COTES):
+    # Noms connus et leur identifiant : actifs du référentiel, puis fonds des listes ISR ayant un ISIN.
+    # Un nom déjà présent dans le référentiel n'est pas repris des listes.
+    from label_isr import lire_liste_isr
+
+    lignes = [{"nom": nom, "identifiant": ident, "origine": "référentiel", "SGP": None}
+              for actifs_poche in actifs_cotes.values() for nom, ident in actifs_poche.items()]
+    for liste in listes_isr:
+        liste = liste if isinstance(liste, pd.DataFrame) else lire_liste_isr(liste)
+        isin = liste["ISIN"].astype("string").str.strip()
+        valides = isin.str.fullmatch(r"[A-Z]{2}[A-Z0-9]{9}\d").fillna(False)
+        lignes += [{"nom": f, "identifiant": i, "origine": "label ISR", "SGP": s}
+                   for f, i, s in zip(liste["FONDS"][valides], isin[valides], liste["SGP"][valides])]
+    table = pd.DataFrame(lignes, columns=["nom", "identifiant", "origine", "SGP"])
+    table = table[~pd.Series(_compacts(table["nom"])).duplicated().to_numpy()].reset_index(drop=True)
+    table["serie"] = table["identifiant"].map(lambda i: IDENTIFIANTS_COTATIONS.get(i, i))
+    return table
+
+
+def lire_decisions(chemin=DECISIONS):
+    if not os.path.exists(chemin):
+        return pd.DataFrame(columns=COLONNES_DECISIONS)
+    return pd.read_csv(chemin, dtype=str)[COLONNES_DECISIONS]
+
+
+def enregistrer_decisions(decisions, chemin=DECISIONS):
+    # decisions : [(source, identifiant, "validé" | "rejeté")] ; la dernière décision d'un couple l'emporte
+    nouvelles = pd.DataFrame(decisions, columns=COLONNES_DECISIONS)
+    inconnues = set(nouvelles["decision"]) - {"validé", "rejeté"}
+    if inconnues:
+        raise ValueError(f"Décision inconnue : {', '.join(sorted(inconnues))}")
+    nouvelles["source"] = _compacts(nouvelles["source"])
+    toutes = pd.concat([lire_decisions(chemin), nouvelles], ignore_index=True)
+    toutes = toutes.drop_duplicates(["source", "identifiant"], keep="last")
+    os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+    toutes.to_csv(chemin, index=False)
+    return toutes
+
+
+def rapprocher(sources, table_references, decisions=None, seuil_auto=SEUIL_AUTO, seuil_min=SEUIL_MIN, marge=MARGE):
+    # Meilleure référence de chaque source : une ligne par source avec nom, identifiant, série, score,
+    # score du meilleur autre identifiant et statut (décision, automatique, à vérifier, aucun)
+    sources = list(sources)
+    candidats = apparier(sources, table_references["nom"])
+    candidats["identifiant"] = table_references["identifiant"].to_numpy()[candidats["reference"]]
+    candidats["cle"] = np.array(_compacts(sources), dtype=object)[candidats["source"]]
+    decisions = lire_decisions() if decisions is None else decisions
+    if len(decisions):
+        candidats = candidats.merge(decisions, left_on=["cle", "identifiant"], right_on=["source", "identifiant"],
+                                    how="left", suffixes=("", "_decision")).drop(columns="source_decision")
+        candidats = candidats[candidats["decision"] != "rejeté"]
+    else:
+        candidats["decision"] = None
+    meilleurs = candidats.drop_duplicates("source").set_index("source")
+    autres = candidats[candidats["identifiant"] != candidats["source"].map(meilleurs["identifiant"])]
+    second = autres.drop_duplicates("source").set_index("source")["score"]
+
+    resultat = pd.DataFrame({"source": sources})
+    resultat = resultat.join(meilleurs[["reference", "score"]])
+    resultat["second"] = second.reindex(resultat.index).fillna(0.0)
+    resultat["score"] = resultat["score"].fillna(0.0)
+    positions = resultat["reference"].fillna(-1).astype(int).to_numpy()
+    for colonne in ["nom", "SGP", "identifiant", "serie", "origine"]:
+        valeurs = table_references[colonne].to_numpy(dtype=object)
+        resultat[colonne] = np.where(positions >= 0, valeurs[positions], None)
+
+    # Décisions validées : la référence validée, même si un autre nom est plus proche
+    if len(decisions):
+        valides = decisions[decisions["decision"] == "validé"].drop_duplicates("source", keep="last")
+        valides = valides.set_index("source")["identifiant"]
+        forces = pd.Series(_compacts(sources)).map(valides)
+        par_identifiant = table_references.drop_duplicates("identifiant").set_index("identifiant")
+        for i in np.flatnonzero(forces.notna().to_numpy()):
+            identifiant = forces.iloc[i]
+            resultat.loc[i, "identifiant"] = identifiant
+            resultat.loc[i, "serie"] = IDENTIFIANTS_COTATIONS.get(identifiant, identifiant)
+            for colonne in ["nom", "SGP", "origine"]:
+                resultat.loc[i, colonne] = par_identifiant[colonne].get(identifiant)
+        decides = forces.notna().to_numpy()
+    else:
+        decides = np.zeros(len(sources), dtype=bool)
+
+    statut = np.select([decides,
+                        (resultat["score"] >= seuil_auto) & (resultat["score"] - resultat["second"] >= marge),
+                        resultat["score"] >= seuil_min],
+                       ["décision", "automatique", "à vérifier"], "aucun")
+    resultat["statut"] = statut
+    return resultat.drop(columns="reference")
+
+
+# Références relues seulement quand une liste ISR change
+_cache = {}
+_verrou = threading.Lock()
+
+
+def charger_references(listes_isr=()):
+    version = tuple((f, os.stat(f).st_mtime_ns) for f in listes_isr)
+    with _verrou:
+        entree = _cache.get(version)
+        if entree is None:
+            entree = _cache[version] = references(listes_isr)
+        return entree
+
+
+def mapping_exports(fichiers, listes_isr=(), chemin_decisions=DECISIONS):
+    # Dictionnaire fichier -> série pour merge_fichiers_avec_isin (correspondances automatiques ou validées),
+    # et la table complète pour vérifier les autres
+    table = rapprocher([nom_export(f) for f in fichiers], charger_references(tuple(listes_isr)),
+                       lire_decisions(chemin_decisions))
+    table.insert(0, "fichier", list(fichiers))
+    retenus = table["statut"].isin(["automatique", "décision"])
+    return dict(zip(table["fichier"][retenus], table["serie"][retenus])), table
+
+
+def exports_a_verifier(table, fichiers):
+    # Message listant les exports sans correspondance retenue, leur meilleur candidat et l'appel qui le valide
+    lignes = [f"{len(fichiers)} export(s) sans correspondance automatique ou validée :"]
+    for _, ligne in table[table["fichier"].isin(fichiers)].iterrows():
+        source = nom_export(ligne["fichier"])
+        if pd.isna(ligne["identifiant"]):
+            candidat = "aucun candidat"
+        else:
+            candidat = f"{ligne['statut']} : {ligne['nom']} ({ligne['identifiant']}, score {ligne['score']:.2f})"
+        identifiant = ligne["identifiant"] if ligne["statut"] == "à vérifier" else "<ISIN>"
+        lignes.append(f"  {ligne['fichier']} : {candidat} -> enregistrer_decisions([({source!r}, "
+                      f"{identifiant!r}, 'validé')])")
+    return "\n".join(lignes)
+
+
+def lier_series(liste_isr, colonnes, actifs_cotes=ACTIFS_COTES):
+    # Série de cours de chaque fonds d'une liste ISR parmi les colonnes d'un panel : par ISIN (ou son
+    # identifiant de cotation), sinon par le nom d'un actif du référentiel coté dans le panel. Les fonds de la
+    # liste restent parmi les références : un nom voisin d'un actif coté ne lui est pas attribué s'il est
+    # plus proche d'un autre fonds de la liste.
+    colonnes = set(colonnes)
+    isin = liste_isr["ISIN"].astype("string").str.strip()
+    serie = isin.map(lambda i: IDENTIFIANTS_COTATIONS.get(i, i) if isinstance(i, str) else None)
+    resultat = liste_isr[["SGP", "FONDS"]].assign(ISIN=isin, serie=serie.where(serie.isin(colonnes)), score=np.nan)
+    resultat["methode"] = np.where(resultat["serie"].notna(), "identifiant", None)
+    cotes = {poche: {nom: ident for nom, ident in actifs_poche.items()
+                     if IDENTIFIANTS_COTATIONS.get(ident, ident) in colonnes}
+             for poche, actifs_poche in actifs_cotes.items()}
+    table = references([liste_isr], actifs_cotes=cotes)
+    restants = np.flatnonzero(resultat["serie"].isna().to_numpy())
+    if table["serie"].isin(colonnes).any() and len(restants):
+        noms = rapprocher(liste_isr["FONDS"].iloc[restants], table, decisions=lire_decisions())
+        trouves = (noms["statut"].isin(["automatique", "décision"]) & noms["serie"].isin(colonnes)).to_numpy()
+        lignes = resultat.index[restants[trouves]]
+        resultat.loc[lignes, "serie"] = noms["serie"].to_numpy()[trouves]
+        resultat.loc[lignes, "score"] = noms["score"].to_numpy()[trouves]
+        resultat.loc[lignes, "methode"] = "nom"
+    return resultat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rapproche des exports de cotations des fonds connus")
+    parser.add_argument("fichiers", nargs="+")
+    parser.add_argument("--isr", action="append", default=[], help="liste du label ISR (.xlsx), répétable")
+    parser.add_argument("--decisions", default=DECISIONS)
+    parser.add_argument("--csv", help="fichier où écrire la table des correspondances")
+    args = parser.parse_args()
+    mapping, table = mapping_exports(args.fichiers, args.isr, args.decisions)
+    with pd.option_context("display.width", 200, "display.max_colwidth", 50):
+        print(table[["fichier", "nom", "identifiant", "serie", "score", "second", "statut"]].to_string())
+    if args.csv:
+        table.to_csv(args.csv, index=False)
@@ -0,0 +1,93 @@
+# Données de référence du portefeuille « Inclusion et Équité », partagées par le dashboard et les outils hors Streamlit
+
+# Fichiers de cours (une colonne par ticker/ISIN)
+PANELS = ["financial_data/data_actifs.csv", "financial_data/data_fonds.csv"]
+
+# OHLCV complets écrits par merge_fichiers_avec_isin à côté des fichiers de cours
+OHLCV = ["financial_data/ohlcv_data_actifs.npz", "financial_data/ohlcv_data_fonds.npz"]
+
+# Poids des poches de la partie spécifique, en % du portefeuille total
+COMPOSITION_SPE = {
+    "Actifs Projet": 25,
+    "Obligations Corporate": 10,
+    "Actions Durables Inclusion": 20
+}
+
+# Actifs cotés de chaque poche : nom -> identifiant dans les panels
+ACTIFS_COTES = {
+    "Obligations Corporate": {
+        "Candriam Sustainable Bond Euro Corporate": "LU1313770536",
+        "Agence Française de Développement": "AFD.PA",
+    },
+    "Actions Durables Inclusion": {
+        "Sodexo": "SW.PA",
+        "Capgemini": "CAP.PA",
+        "EssilorLuxottica": "EL.PA",
+        "Acer": "2353.TW",
+        "Yamaha": "7951.T",
+    },
+}
+
+# Identifiant de la série de cours quand la source de cotations n'utilise pas l'ISIN (ISIN -> identifiant)
+IDENTIFIANTS_COTATIONS = {
+    "FR0013314580": "0P0000KU3M.F",  # Mirova Insertion Emplois Dynamique
+}
+
+# Devise de cotation attendue des lignes (identifiant -> devise) : un export dans une autre devise est une erreur
+DEVISES = {
+    "LU1313770536": "EUR",
+    "AFD.PA": "EUR",
+    "SW.PA": "EUR",
+    "CAP.PA": "EUR",
+    "EL.PA": "EUR",
+    "2353.TW": "TWD",
+    "7951.T": "JPY",
+    "FR0013314580": "EUR",
+    "0P0000KU3M.F": "EUR",
+}
+
+# Indicateurs d'impact des actifs projet, repris des fiches du dashboard (valeurs par défaut tant que
+# financial_data/impact.csv n'existe pas) : (projet, indicateur, valeur, unité, année)
+KPIS_IMPACT = [
+    ("I Was A Sari", "Femmes formées et employées", 247, "personnes", 2022),
+    ("Simplon.co", "Personnes formées", 25000, "personnes", None),
+    ("Simplon.co", "Femmes formées (formations Apple)", 1257, "personnes", None),
+    ("La Varappe", "Chiffre d'affaires", 66.5e6, "€", 2021),
+    ("La Varappe", "Chiffre d'affaires", 87.4e6, "€", 2022),
+    ("La Varappe", "Chiffre d'affaires", 90e6, "€", 2023),
+    ("La Varappe", "Personnes accompagnées", 9958, "personnes", 2023),
+    ("La Varappe", "Déchets évités, réemployés ou recyclés", 524586, "tonnes", 2023),
+    ("La Varappe", "CO₂ évité", 10, "tCO₂", 2023),
+    ("Axsol", "Chiffre d'affaires", 2e6, "€", 2023),
+    ("France Active", "Montants mobilisés", 491e6, "€", 2023),
+    ("France Active", "Entreprises soutenues", 37000, "entreprises", 2023),
+]
+
+# Duration modifiée approximative des lignes obligataires (années), pour les chocs de taux : à mettre à jour
+# depuis les reportings des fonds et les caractéristiques des titres
+DURATIONS = {
+    "LU1313770536": 4.5,
+    "AFD.PA": 6.0,
+}
+
+SCORES_ESG = {
+    "Sodexo": 59,
+    "Capgemini": 80,
+    "EssilorLuxottica": 64,
+    "Acer": 88,
+    "Yamaha": 59,
+}
+
+
+def actifs():
+    # Une ligne par actif coté : nom, identifiant, poche et score ESG s'il est connu
+    return [
+        {"Nom": nom, "Ticker": ticker, "Poche": poche, "Score ESG": SCORES_ESG.get(nom)}
+        for poche, actifs_poche in ACTIFS_COTES.items()
+        for nom, ticker in actifs_poche.items()
+    ]
+
+
+def donnees_scores_esg():
+    # Format attendu par graphiques.figure_scores_esg
+    return {"Entreprise": list(SCORES_ESG.keys()), "Score ESG": list(SCORES_ESG.values())}
@@ -0,0 +1,192 @@
+import copy
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from referentiel import ACTIFS_COTES, COMPOSITION_SPE, PANELS, SCORES_ESG
+
+# Simulation d'allocation : variance, contributions au risque, rendement attendu et score ESG d'un
+# portefeuille, tenus à jour quand un poids change au lieu d'être recalculés.
+#
+# L'état garde la covariance S, les poids w et le vecteur m = S w. Changer le poids d'une ligne de d,
+# ou celui d'une poche de d (direction u = poids internes de la poche, S u précalculé) revient à
+#   w += d u,   variance += 2 d u'm + d² u'S u,   m += d S u,
+# soit O(n) par changement pour n lignes (au lieu de O(n²) pour w'S w). Les indicateurs sont ceux du
+# portefeuille renormalisé (poids divisés par leur somme), comme pour la VL du portefeuille.
+
+FREQUENCE = "W-FRI"
+PERIODES_PAR_AN = 52
+OBSERVATIONS_MIN = 26
+# Recalcul complet de m = S w après ce nombre de changements (erreurs d'arrondi cumulées)
+RECALAGE = 10000
+
+
+def estimer_parametres(panel, frequence=FREQUENCE, periodes_par_an=PERIODES_PAR_AN, observations_min=OBSERVATIONS_MIN):
+    # Rendements attendus et covariance annualisés, sur des rendements hebdomadaires (évite le décalage de
+    # clôture entre places) ; chaque couple de séries utilise ses semaines communes. Les séries trop courtes
+    # ont une covariance nulle.
+    rendements = panel.sort_index().ffill().resample(frequence).last().pct_change(fill_method=None).iloc[1:]
+    esperances = (rendements.mean() * periodes_par_an).fillna(0.0)
+    covariance = (rendements.cov(min_periods=observations_min) * periodes_par_an).fillna(0.0)
+    return esperances, covariance
+
+
+def poches_par_defaut(tickers, actifs_cotes=ACTIFS_COTES):
+    # Poids internes de chaque poche cotée : lignes présentes dans le panel, équipondérées
+    tickers = set(tickers)
+    poches = {}
+    for poche, actifs_poche in actifs_cotes.items():
+        presents = [t for t in actifs_poche.values() if t in tickers]
+        if presents:
+            poches[poche] = {t: 1.0 / len(presents) for t in presents}
+    return poches
+
+
+def scores_par_ticker(scores=SCORES_ESG, actifs_cotes=ACTIFS_COTES):
+    # SCORES_ESG est indexé par nom d'actif
+    return {ticker: scores[nom] for actifs_poche in actifs_cotes.values()
+            for nom, ticker in actifs_poche.items() if nom in scores}
+
+
+class SimulateurAllocation:
+    def __init__(self, covariance, esperances, scores=None, poids=None, poches=None, composition=None):
+        # covariance : DataFrame lignes x lignes ; esperances, scores : par ligne ; poids : {ligne: poids} ;
+        # poches : {poche: {ligne: poids interne}} et composition : {poche: poids de la poche}
+        self.lignes = pd.Index(covariance.index)
+        self.covariance = covariance.reindex(index=self.lignes, columns=self.lignes).to_numpy(dtype=float)
+        self.esperances = pd.Series(esperances, dtype=float).reindex(self.lignes).fillna(0.0).to_numpy()
+        scores = pd.Series(scores if scores is not None else {}, dtype=float).reindex(self.lignes)
+        self.notees = scores.notna().to_numpy()
+        self.scores = scores.fillna(0.0).to_numpy()
+        # Directions des poches (poids internes normalisés) et S u de chacune
+        self.poches = {}
+        for poche, internes in (poches or {}).items():
+            u = pd.Series(internes, dtype=float).reindex(self.lignes).fillna(0.0).to_numpy()
+            if u.sum() > 0:
+                u = u / u.sum()
+                self.poches[poche] = (u, self.covariance @ u, float(u @ self.covariance @ u))
+        self.composition = {p: 0.0 for p in self.poches}
+        self.changements = 0
+        w = pd.Series(poids if poids is not None else {}, dtype=float).reindex(self.lignes).fillna(0.0).to_numpy()
+        for poche, valeur in (composition or {}).items():
+            if poche in self.poches:
+                w = w + valeur * self.poches[poche][0]
+                self.composition[poche] = float(valeur)
+        self.poids = w
+        self.recalculer()
+
+    def recalculer(self):
+        # État complet en O(n²) : à l'initialisation et tous les RECALAGE changements
+        self.m = self.covariance @ self.poids
+        self.variance = float(self.poids @ self.m)
+        self.rendement = float(self.esperances @ self.poids)
+        self.somme_esg = float(self.scores @ self.poids)
+        self.poids_notes = float(self.poids[self.notees].sum())
+        self.total = float(self.poids.sum())
+        self.changements = 0
+        return self
+
+    def _deplacer(self, u, su, usu, delta):
+        # w += delta u : mise à jour de rang 1 de tous les agrégats
+        self.variance += 2 * delta * float(u @ self.m) + delta * delta * usu
+        self.m += delta * su
+        self.poids += delta * u
+        self.rendement += delta * float(self.esperances @ u)
+        self.somme_esg += delta * float(self.scores @ u)
+        self.poids_notes += delta * float(u[self.notees].sum())
+        self.total += delta * float(u.sum())
+        self.changements += 1
+        if self.changements >= RECALAGE:
+            self.recalculer()
+
+    def modifier_poids(self, ligne, valeur):
+        # Poids d'une ligne (hors poches) : colonne i de la covariance, O(n)
+        i = self.lignes.get_loc(ligne)
+        delta = float(valeur) - self.poids[i]
+        if delta:
+            self.variance += 2 * delta * self.m[i] + delta * delta * self.covariance[i, i]
+            self.m += delta * self.covariance[:, i]
+            self.poids[i] += delta
+            self.rendement += delta * self.esperances[i]
+            self.somme_esg += delta * self.scores[i]
+            self.poids_notes += delta * self.notees[i]
+            self.total += delta
+            self.changements += 1
+            if self.changements >= RECALAGE:
+                self.recalculer()
+        return self
+
+    def modifier_poche(self, poche, valeur):
+        # Poids d'une poche (ex. « Obligations Corporate » de 10 à 15) réparti selon ses poids internes
+        if poche not in self.poches:
+            raise KeyError(f"Poche inconnue ou sans ligne cotée : {poche}")
+        delta = float(valeur) - self.composition[poche]
+        if delta:
+            self._deplacer(*self.poches[poche], delta)
+            self.composition[poche] = float(valeur)
+        return self
+
+    def modifier_composition(self, composition):
+        # Seules les poches dont le poids change sont mises à jour
+        for poche, valeur in composition.items():
+            if poche in self.poches:
+                self.modifier_poche(poche, valeur)
+        return self
+
+    def indicateurs(self):
+        # Portefeuille renormalisé : volatilité et rendement attendu annualisés, score ESG moyen pondéré
+        # (lignes notées seulement)
+        total = self.total if self.total else np.nan
+        variance = max(self.variance, 0.0) / total ** 2
+        return {
+            "Volatilité": float(np.sqrt(variance)),
+            "Variance": float(variance),
+            "Rendement attendu": self.rendement / total,
+            "Score ESG": self.somme_esg / self.poids_notes if self.poids_notes else np.nan,
+            "Poids total": self.total,
+        }
+
+    def contributions_risque(self):
+        # Part de chaque ligne dans la variance (somme = 1), O(n) à partir de m
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return pd.Series(self.poids * self.m / self.variance, index=self.lignes, name="Contribution au risque")
+
+    def contributions_poches(self):
+        contributions = self.contributions_risque().to_numpy()
+        return pd.Series({poche: float(contributions[u > 0].sum()) for poche, (u, _, _) in self.poches.items()},
+                         name="Contribution au risque")
+
+
+def simulateur_par_defaut(panel, composition=COMPOSITION_SPE, actifs_cotes=ACTIFS_COTES, scores=SCORES_ESG):
+    # Lignes cotées du portefeuille, poches équipondérées selon la composition (en % du portefeuille)
+    poches = poches_par_defaut(panel.columns, actifs_cotes)
+    tickers = [t for internes in poches.values() for t in internes]
+    esperances, covariance = estimer_parametres(panel[tickers])
+    return SimulateurAllocation(covariance, esperances, scores_par_ticker(scores, actifs_cotes), poches=poches,
+                                composition={p: v for p, v in composition.items() if p in poches})
+
+
+# Simulateur de référence par version des fichiers de cours et d'opérations : panels -> (versions, simulateur)
+_references = {}
+_verrou = threading.Lock()
+
+
+def charger_simulateur(panels=PANELS):
+    # Simulateur pour une session (il garde ses poids) : copie d'une référence construite une fois par version
+    # des panels ajustés pour tout le processus (covariance estimée une seule fois) ; None sans fichier de cours
+    from operations import OPERATIONS, charger_panels_ajustes
+
+    chemins = tuple(p for p in panels if os.path.exists(p))
+    if not chemins:
+        return None
+    version = [os.stat(p).st_mtime_ns for p in chemins + (OPERATIONS,) if os.path.exists(p)]
+    with _verrou:
+        entree = _references.get(chemins)
+    if entree is None or entree[0] != version:
+        panel = pd.concat([charger_panels_ajustes(p)[1] for p in chemins], axis=1).sort_index()
+        entree = (version, simulateur_par_defaut(panel))
+        with _verrou:
+            _references[chemins] = entree
+    return copy.deepcopy(entree[1])
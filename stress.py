@@ -0,0 +1,178 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from referentiel import ACTIFS_COTES, COMPOSITION_SPE, DURATIONS
+
+# Tests de résistance : chaque scénario donne un choc (variation de valeur) pour chaque actif du panel,
+# et tous les scénarios sont appliqués à tous les portefeuilles en un seul produit
+#   P&L (scénarios x portefeuilles) = chocs (scénarios x actifs) @ poids (actifs x portefeuilles).
+#
+# Deux familles de scénarios :
+#   - historiques {"debut": date, "fin": date} : variation de chaque série entre les deux dates. Un actif qui
+#     ne cotait pas encore (data_fonds.csv commence en avril 2020, après le krach du COVID) reçoit le choc
+#     des facteurs sur la fenêtre multiplié par ses bêtas ;
+#   - hypothétiques {facteur: choc, "taux": variation} : chocs de facteurs transmis par les bêtas, et
+#     variation des taux transmise par la duration (-duration x variation) aux lignes obligataires.
+# Les facteurs sont des paniers équipondérés de tickers du panel (par défaut les actions de la poche
+# « Actions Durables Inclusion »).
+
+SCENARIOS_HISTORIQUES = {
+    "Crise financière (2008-2009)": {"debut": "2008-09-12", "fin": "2009-03-09"},
+    "Dette souveraine européenne (2011)": {"debut": "2011-07-01", "fin": "2011-09-22"},
+    "Brexit (juin 2016)": {"debut": "2016-06-23", "fin": "2016-06-27"},
+    "Krach COVID (2020)": {"debut": "2020-02-19", "fin": "2020-03-23"},
+    "Hausse des taux (2022)": {"debut": "2022-01-03", "fin": "2022-10-12"},
+}
+SCENARIOS_HYPOTHETIQUES = {
+    "Actions -20 %": {"Actions": -0.20},
+    "Actions -35 %": {"Actions": -0.35},
+    "Taux +100 pb": {"taux": 0.01},
+    "Taux -50 pb": {"taux": -0.005},
+    "Stagflation (actions -15 %, taux +150 pb)": {"Actions": -0.15, "taux": 0.015},
+}
+SCENARIOS = {**SCENARIOS_HISTORIQUES, **SCENARIOS_HYPOTHETIQUES}
+
+FACTEURS = {"Actions": list(ACTIFS_COTES["Actions Durables Inclusion"].values())}
+# Rendements hebdomadaires pour les bêtas (évite le décalage de clôture entre places) et nombre minimal
+# de semaines communes avec les facteurs
+FREQUENCE_BETAS = "W-FRI"
+OBSERVATIONS_MIN = 26
+
+
+def _prolonges(panel):
+    return panel.sort_index().ffill()
+
+
+def series_facteurs(panel, facteurs=FACTEURS):
+    # Indice de chaque facteur : rendements journaliers moyens des membres qui cotent, chaînés en base 1
+    # depuis le premier cours d'un des membres (vide avant)
+    prolonges = _prolonges(panel)
+    series = {}
+    for nom, tickers in facteurs.items():
+        tickers = [t for t in tickers if t in prolonges.columns]
+        if not tickers:
+            raise ValueError(f"Aucun membre du facteur {nom} dans le panel")
+        rendements = prolonges[tickers].pct_change(fill_method=None).mean(axis=1).fillna(0.0)
+        niveau = np.cumprod(1 + rendements.to_numpy())
+        niveau[:prolonges[tickers].notna().any(axis=1).to_numpy().argmax()] = np.nan
+        series[nom] = niveau
+    return pd.DataFrame(series, index=prolonges.index)
+
+
+def estimer_betas(panel, facteurs, frequence=FREQUENCE_BETAS, observations_min=OBSERVATIONS_MIN):
+    # Bêtas de tous les actifs sur tous les facteurs en une résolution par lots : pour chaque actif, les
+    # moindres carrés (avec constante) ne portent que sur les semaines où il cote
+    y = _prolonges(panel).resample(frequence).last().pct_change(fill_method=None).to_numpy()[1:]
+    x = facteurs.resample(frequence).last().pct_change(fill_method=None).to_numpy()[1:]
+    x = np.hstack([np.ones((len(x), 1)), x])
+    valides = ~np.isnan(y) & ~np.isnan(x).any(axis=1)[:, None]
+    x = np.nan_to_num(x)
+    masque = valides.astype(float)
+    xtx = np.einsum("ta,tf,tg->afg", masque, x, x)
+    xty = np.einsum("ta,tf->af", masque * np.nan_to_num(y), x)
+    n = valides.sum(axis=0)
+    # Régularisation minime pour les actifs sans observation (bêtas ignorés ensuite)
+    xtx += 1e-12 * np.eye(x.shape[1])
+    betas = np.linalg.solve(xtx, xty[..., None])[..., 0][:, 1:]
+    betas[n < observations_min] = np.nan
+    return pd.DataFrame(betas, index=panel.columns, columns=facteurs.columns)
+
+
+def _positions_fenetres(index, scenarios):
+    # Dernière date connue au début et à la fin de chaque fenêtre (-1 si la fenêtre précède le panel)
+    debuts = index.searchsorted(pd.to_datetime([s["debut"] for s in scenarios]), side="right") - 1
+    fins = index.searchsorted(pd.to_datetime([s["fin"] for s in scenarios]), side="right") - 1
+    return debuts, fins
+
+
+def matrice_chocs(panel, scenarios=SCENARIOS, facteurs=FACTEURS, durations=DURATIONS):
+    # Chocs scénarios x actifs, et indicateur des chocs estimés par les bêtas plutôt qu'observés
+    prolonges = _prolonges(panel)
+    indices = series_facteurs(prolonges, facteurs)
+    betas = estimer_betas(prolonges, indices).to_numpy()
+    noms = list(scenarios)
+    historiques = np.array(["debut" in scenarios[s] for s in noms], dtype=bool)
+    chocs = np.full((len(noms), prolonges.shape[1]), np.nan)
+    estimes = np.zeros(chocs.shape, dtype=bool)
+
+    if historiques.any():
+        debuts, fins = _positions_fenetres(prolonges.index, [scenarios[s] for s in np.array(noms)[historiques]])
+        couverts = (debuts >= 0)[:, None]
+        valeurs, niveaux = prolonges.to_numpy(), indices.to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            observes = np.where(couverts, valeurs[fins] / valeurs[np.maximum(debuts, 0)] - 1, np.nan)
+            facteurs_fenetres = np.where(couverts, niveaux[fins] / niveaux[np.maximum(debuts, 0)] - 1, np.nan)
+        # Actif sans bêta, ou facteur sans historique sur la fenêtre : pas d'estimation
+        proxy = np.nan_to_num(facteurs_fenetres) @ np.nan_to_num(betas).T
+        proxy[:, np.isnan(betas).any(axis=1)] = np.nan
+        proxy[np.isnan(facteurs_fenetres).any(axis=1)] = np.nan
+        manquants = ~np.isfinite(observes)
+        chocs[historiques] = np.where(manquants, proxy, observes)
+        estimes[historiques] = manquants & ~np.isnan(proxy)
+
+    if (~historiques).any():
+        hypothetiques = [scenarios[s] for s in np.array(noms)[~historiques]]
+        inconnus = {k for s in hypothetiques for k in s} - set(indices.columns) - {"taux"}
+        if inconnus:
+            raise ValueError(f"Facteur inconnu dans les scénarios : {', '.join(sorted(inconnus))}")
+        chocs_facteurs = np.array([[s.get(f, 0.0) for f in indices.columns] for s in hypothetiques])
+        variations_taux = np.array([s.get("taux", 0.0) for s in hypothetiques])
+        sensibilites = -pd.Series(durations, dtype=float).reindex(prolonges.columns).fillna(0.0).to_numpy()
+        chocs[~historiques] = chocs_facteurs @ np.nan_to_num(betas).T + variations_taux[:, None] * sensibilites
+        estimes[~historiques] = True
+
+    return (pd.DataFrame(chocs, index=noms, columns=prolonges.columns),
+            pd.DataFrame(estimes, index=noms, columns=prolonges.columns))
+
+
+def fenetres_glissantes(index, duree=20, pas=5, prefixe="Historique"):
+    # Toutes les fenêtres de `duree` séances du panel, tous les `pas` séances : plusieurs centaines de
+    # scénarios historiques sur quelques années
+    index = pd.DatetimeIndex(index).sort_values()
+    return {f"{prefixe} {index[i]:%Y-%m-%d} ({duree} j)": {"debut": index[i], "fin": index[i + duree]}
+            for i in range(0, len(index) - duree, pas)}
+
+
+def grille_chocs(**chocs):
+    # Produit cartésien de chocs : grille_chocs(Actions=[-0.3, -0.1], taux=[0, 0.01]) -> 4 scénarios
+    noms = list(chocs)
+    return {", ".join(f"{n} {v:+.1%}" if n != "taux" else f"taux {v * 1e4:+.0f} pb" for n, v in zip(noms, valeurs)):
+            dict(zip(noms, valeurs)) for valeurs in itertools.product(*chocs.values())}
+
+
+def portefeuilles_par_defaut(tickers, composition=COMPOSITION_SPE, actifs_cotes=ACTIFS_COTES):
+    # Poids (portefeuilles x tickers) : chaque ligne seule, chaque poche équipondérée, et le portefeuille
+    # (poches cotées selon COMPOSITION_SPE, renormalisées comme pour la VL du portefeuille)
+    tickers = list(tickers)
+    lignes, poches = {}, {}
+    for poche, actifs_poche in actifs_cotes.items():
+        presents = {nom: t for nom, t in actifs_poche.items() if t in tickers}
+        for nom, ticker in presents.items():
+            lignes[nom] = {ticker: 1.0}
+        if presents:
+            poches[poche] = {t: 1.0 / len(presents) for t in presents.values()}
+    total = sum(composition[p] for p in poches)
+    portefeuille = {}
+    for poche, poids in poches.items():
+        for ticker, p in poids.items():
+            portefeuille[ticker] = portefeuille.get(ticker, 0.0) + p * composition[poche] / total
+    tous = {**lignes, **poches, "Portefeuille": portefeuille} if poches else {}
+    return pd.DataFrame.from_dict(tous, orient="index").reindex(index=list(tous), columns=tickers).fillna(0.0)
+
+
+def stresser(panel, portefeuilles=None, scenarios=SCENARIOS, facteurs=FACTEURS, durations=DURATIONS):
+    # P&L (en fraction de la valeur) de chaque portefeuille sous chaque scénario. Un choc inconnu (actif sans
+    # historique ni bêta) compte pour 0 ; la part des poids concernés est donnée par `couverture`.
+    chocs, _ = matrice_chocs(panel, scenarios, facteurs, durations)
+    if portefeuilles is None:
+        portefeuilles = portefeuilles_par_defaut(chocs.columns)
+    poids = portefeuilles.reindex(columns=chocs.columns, fill_value=0.0).to_numpy()
+    valeurs = chocs.to_numpy()
+    connus = np.isfinite(valeurs)
+    pnl = np.where(connus, valeurs, 0.0) @ poids.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        couverture = connus.astype(float) @ np.abs(poids).T / np.abs(poids).sum(axis=1)
+    return (pd.DataFrame(pnl, index=chocs.index, columns=portefeuilles.index),
+            pd.DataFrame(couverture, index=chocs.index, columns=portefeuilles.index))
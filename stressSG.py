@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from graphiques import figure_stress
+from instrumentation import chrono
+from operations import charger_panels_ajustes
+from referentiel import PANELS
+from stress import SCENARIOS, fenetres_glissantes, grille_chocs, stresser
+
+st.set_page_config(layout="wide")
+st.title("Scénarios de stress")
+st.caption("P&L de chaque ligne, de chaque poche cotée et du portefeuille (poches cotées selon leur poids) "
+           "sous des scénarios historiques rejoués sur les cours (rendement total) et des chocs hypothétiques "
+           "d'actions et de taux.")
+
+panels = [charger_panels_ajustes(p)[1] for p in PANELS if os.path.exists(p)]
+if not panels:
+    st.warning("Aucun fichier de cours disponible.")
+    st.stop()
+panel = pd.concat(panels, axis=1).sort_index()
+
+scenarios = dict(SCENARIOS)
+with st.expander("Scénarios supplémentaires"):
+    if st.checkbox("Toutes les fenêtres historiques de 20 séances"):
+        scenarios.update(fenetres_glissantes(panel.index))
+    if st.checkbox("Grille de chocs actions x taux"):
+        scenarios.update(grille_chocs(Actions=np.linspace(-0.4, 0.1, 11), taux=np.linspace(-0.01, 0.03, 9)))
+
+with chrono("calcul", "stress"):
+    pnl, couverture = stresser(panel, scenarios=scenarios)
+
+st.plotly_chart(figure_stress(pnl.loc[list(SCENARIOS)]), use_container_width=True)
+if (couverture < 1).any().any():
+    st.caption("Les scénarios antérieurs au premier cours d'une ligne sans bêta estimable comptent cette "
+               "ligne pour 0 : voir la couverture ci-dessous.")
+st.subheader(f"{len(pnl)} scénarios")
+st.dataframe(pnl.style.format("{:.1%}"))
+with st.expander("Couverture (part des poids avec un choc connu)"):
+    st.dataframe(couverture.style.format("{:.0%}"))
@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+from referentiel import ACTIFS_COTES, PANELS
+
+# Mise à jour des cours par téléchargement concurrent (asyncio) sur l'API de cotations de Yahoo Finance :
+#   - seules les dates absentes du panel sont demandées (avant la première date connue, après la dernière) ;
+#   - les plages d'un même ticker qui se touchent ou se chevauchent sont regroupées en une requête ;
+#   - toutes les requêtes partagent une limite de débit (seau à jetons) et un nombre maximal de requêtes
+#     en vol ;
+#   - les erreurs temporaires (429, 5xx, coupures) sont retentées avec un délai exponentiel et aléatoire ;
+#   - les clôtures téléchargées sont écrites directement dans le CSV du panel (remplacement atomique),
+#     republié ensuite en mémoire partagée par panel_partage.
+#
+#   python telechargement.py                                   # tickers de referentiel.ACTIFS_COTES, chacun
+#                                                              # dans le panel qui le contient déjà
+#   python telechargement.py --mapping mapping_isin.json       # plus les identifiants des exports fusionnés
+#   python telechargement.py --panel financial_data/data_fonds.csv 0P0000KU3M.F LU1313770536
+#   python telechargement.py --url http://127.0.0.1:8765/v8/finance/chart/{ticker}   # serveur local
+
+URL_COTATIONS = "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+REQUETES_PAR_SECONDE = 5.0
+RAFALE = 10
+CONCURRENCE = 16
+TENTATIVES = 5
+DELAI_INITIAL = 0.5
+DELAI_MAXIMAL = 30.0
+TIMEOUT = 30
+# Écart maximal (jours calendaires) entre deux plages d'un ticker pour les demander ensemble (week-end, férié)
+ECART_FUSION = 4
+DEBUT_PAR_DEFAUT = "2015-01-01"
+STATUTS_TEMPORAIRES = {408, 425, 429, 500, 502, 503, 504}
+# Les fonds (identifiés par ISIN ou par les identifiants des exports fusionnés) vivent dans le panel des fonds,
+# où merge_fichiers_avec_isin écrit aussi
+FORMAT_ISIN = re.compile(r"^[A-Z]{2}[A-Z0-9]{9}[0-9]$")
+
+
+class ErreurTelechargement(Exception):
+    def __init__(self, ticker, message, temporaire=False, attente=None):
+        super().__init__(f"{ticker} : {message}")
+        self.temporaire = temporaire
+        self.attente = attente
+
+
+class LimiteurDebit:
+    # Seau à jetons partagé par toutes les requêtes : `debit` requêtes par seconde en moyenne, `rafale` d'avance
+    def __init__(self, debit=REQUETES_PAR_SECONDE, rafale=RAFALE):
+        self.debit, self.rafale = debit, rafale
+        self.jetons = float(rafale)
+        self.dernier = time.monotonic()
+        self._verrou = asyncio.Lock()
+
+    async def attendre(self):
+        async with self._verrou:
+            while True:
+                maintenant = time.monotonic()
+                self.jetons = min(self.rafale, self.jetons + (maintenant - self.dernier) * self.debit)
+                self.dernier = maintenant
+                if self.jetons >= 1:
+                    self.jetons -= 1
+                    return
+                await asyncio.sleep((1 - self.jetons) / self.debit)
+
+
+def tickers_par_defaut(actifs_cotes=ACTIFS_COTES, mapping_isin=None):
+    # Tickers des poches cotées (le dictionnaire des actions du dashboard) et identifiants des exports fusionnés
+    tickers = [t for actifs_poche in actifs_cotes.values() for t in actifs_poche.values()]
+    tickers += list((mapping_isin or {}).values())
+    return list(dict.fromkeys(tickers))
+
+
+def _colonnes_panel(csv_file):
+    # Noms des colonnes seulement (la ligne d'en-tête)
+    if not os.path.exists(csv_file):
+        return []
+    return list(pd.read_csv(csv_file, nrows=0, index_col=0).columns)
+
+
+def repartir_tickers(tickers, panels=PANELS, fonds=()):
+    # {panel: tickers} : chaque ticker va dans le panel qui le contient déjà (un fonds de data_fonds.csv
+    # n'est pas recopié dans data_actifs.csv) ; les nouveaux dans le dernier panel (fonds) pour un ISIN ou
+    # un identifiant de `fonds`, dans le premier (actifs) sinon
+    colonnes = {p: set(_colonnes_panel(p)) for p in panels}
+    repartition = {p: [] for p in panels}
+    for ticker in tickers:
+        defaut = panels[-1] if ticker in fonds or FORMAT_ISIN.match(ticker) else panels[0]
+        panel = next((p for p in panels if ticker in colonnes[p]), defaut)
+        repartition[panel].append(ticker)
+    return repartition
+
+
+def plages_manquantes(panel, tickers, debut=DEBUT_PAR_DEFAUT, fin=None):
+    # (ticker, début, fin) des dates à demander : tout pour un ticker absent, sinon avant son premier cours
+    # et après son dernier
+    debut = pd.Timestamp(debut)
+    fin = pd.Timestamp(fin) if fin is not None else pd.Timestamp.today().normalize()
+    plages = []
+    for ticker in tickers:
+        serie = panel[ticker].dropna() if panel is not None and ticker in panel else pd.Series(dtype=float)
+        if serie.empty:
+            plages.append((ticker, debut, fin))
+            continue
+        if serie.index[0] > debut:
+            plages.append((ticker, debut, serie.index[0] - pd.Timedelta(days=1)))
+        if serie.index[-1] < fin:
+            plages.append((ticker, serie.index[-1] + pd.Timedelta(days=1), fin))
+    return plages
+
+
+def fusionner_plages(plages, ecart=ECART_FUSION):
+    # Une requête par suite de plages contiguës (à `ecart` jours près) d'un même ticker
+    fusionnees = []
+    for ticker, debut, fin in sorted(plages, key=lambda p: (p[0], p[1])):
+        precedente = fusionnees[-1] if fusionnees else None
+        if precedente and precedente[0] == ticker and debut <= precedente[2] + pd.Timedelta(days=ecart):
+            fusionnees[-1] = (ticker, precedente[1], max(precedente[2], fin))
+        else:
+            fusionnees.append((ticker, debut, fin))
+    return fusionnees
+
+
+def _url(modele, ticker, debut, fin):
+    # period2 est exclusif : fin + 1 jour
+    periode1 = int(pd.Timestamp(debut).timestamp())
+    periode2 = int((pd.Timestamp(fin) + pd.Timedelta(days=1)).timestamp())
+    return f"{modele.format(ticker=ticker)}?period1={periode1}&period2={periode2}&interval=1d&events=div%2Csplit"
+
+
+def _lire(url, timeout=TIMEOUT):
+    # Requête bloquante, exécutée dans un thread : (statut, en-tête Retry-After, corps)
+    requete = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0", "Accept": "application/json"})
+    try:
+        with urllib.request.urlopen(requete, timeout=timeout) as reponse:
+            return reponse.status, None, reponse.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("Retry-After"), e.read()
+
+
+def parser_cotations(contenu):
+    # Réponse JSON de l'API chart -> DataFrame (ouv, haut, bas, clot, vol) indexé par date de séance
+    resultat = json.loads(contenu)["chart"]
+    if resultat.get("error"):
+        raise ValueError(resultat["error"].get("description", "réponse en erreur"))
+    donnees = resultat["result"][0]
+    horodatages = donnees.get("timestamp") or []
+    cotations = donnees["indicators"]["quote"][0] if horodatages else {}
+    decalage = donnees.get("meta", {}).get("gmtoffset", 0)
+    index = pd.to_datetime(pd.Series(horodatages, dtype="int64") + decalage, unit="s").dt.normalize()
+    df = pd.DataFrame({
+        "ouv": cotations.get("open", []), "haut": cotations.get("high", []), "bas": cotations.get("low", []),
+        "clot": cotations.get("close", []), "vol": cotations.get("volume", []),
+    }, index=pd.DatetimeIndex(index, name="date"), dtype=float)
+    return df[~df.index.duplicated(keep="last")]
+
+
+class Telechargeur:
+    def __init__(self, url=URL_COTATIONS, debit=REQUETES_PAR_SECONDE, rafale=RAFALE, concurrence=CONCURRENCE,
+                 tentatives=TENTATIVES, delai_initial=DELAI_INITIAL, timeout=TIMEOUT):
+        self.url, self.debit, self.rafale, self.concurrence = url, debit, rafale, concurrence
+        self.tentatives, self.delai_initial, self.timeout = tentatives, delai_initial, timeout
+        self.requetes = 0
+
+    async def _plage(self, limiteur, semaphore, ticker, debut, fin):
+        url = _url(self.url, ticker, debut, fin)
+        for tentative in range(self.tentatives):
+            try:
+                await limiteur.attendre()
+                async with semaphore:
+                    self.requetes += 1
+                    statut, retry_after, corps = await asyncio.to_thread(_lire, url, self.timeout)
+                if statut == 200:
+                    return parser_cotations(corps)
+                if statut == 404:
+                    raise ErreurTelechargement(ticker, "ticker inconnu")
+                raise ErreurTelechargement(ticker, f"HTTP {statut}", statut in STATUTS_TEMPORAIRES,
+                                           float(retry_after) if retry_after and retry_after.isdigit() else None)
+            except (OSError, asyncio.TimeoutError) as e:
+                erreur = ErreurTelechargement(ticker, f"{type(e).__name__}: {e}", temporaire=True)
+            except ErreurTelechargement as e:
+                erreur = e
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                raise ErreurTelechargement(ticker, f"réponse illisible ({e})") from e
+            if not erreur.temporaire or tentative == self.tentatives - 1:
+                raise erreur
+            # Délai exponentiel avec gigue (ou celui demandé par le serveur)
+            delai = min(DELAI_MAXIMAL, self.delai_initial * 2 ** tentative)
+            await asyncio.sleep(erreur.attente if erreur.attente is not None else random.uniform(delai / 2, delai))
+
+    async def _telecharger(self, plages):
+        limiteur, semaphore = LimiteurDebit(self.debit, self.rafale), asyncio.Semaphore(self.concurrence)
+        taches = [self._plage(limiteur, semaphore, *plage) for plage in plages]
+        return await asyncio.gather(*taches, return_exceptions=True)
+
+    def telecharger(self, plages):
+        # {ticker: DataFrame OHLCV} des plages téléchargées, et {ticker: message} des échecs
+        resultats, erreurs = {}, {}
+        for (ticker, _, _), resultat in zip(plages, asyncio.run(self._telecharger(plages))):
+            if isinstance(resultat, Exception):
+                erreurs[ticker] = str(resultat)
+            elif not resultat.empty:
+                resultats[ticker] = pd.concat([resultats[ticker], resultat]) if ticker in resultats else resultat
+        return resultats, erreurs
+
+
+def ecrire_dans_panel(csv_file, cotations, versionner=True):
+    # Clôtures téléchargées reportées dans le panel (elles remplacent les valeurs existantes aux mêmes dates).
+    # versionner : le nouvel état est aussi enregistré dans l'historique des panels (versions.py)
+    clotures = pd.DataFrame({t: df["clot"] for t, df in cotations.items()})
+    if clotures.empty:
+        return None
+    if os.path.exists(csv_file):
+        panel = pd.read_csv(csv_file, parse_dates=[0], index_col=0)
+        clotures = clotures.combine_first(panel)[list(panel.columns) + [t for t in clotures if t not in panel]]
+    clotures = clotures.sort_index().rename_axis("date")
+    # Écriture dans un fichier voisin puis remplacement : les lecteurs voient l'ancien ou le nouveau panel
+    os.makedirs(os.path.dirname(csv_file) or ".", exist_ok=True)
+    temporaire = f"{csv_file}.{os.getpid()}.tmp"
+    clotures.to_csv(temporaire)
+    os.replace(temporaire, csv_file)
+    if versionner:
+        from versions import enregistrer_panel
+        enregistrer_panel(csv_file, clotures)
+    return clotures
+
+
+def rafraichir_panel(csv_file=PANELS[0], tickers=None, debut=DEBUT_PAR_DEFAUT, fin=None, mapping_isin=None,
+                     **options):
+    # Télécharge les dates manquantes des tickers et les écrit dans le panel ; renvoie un rapport par ticker.
+    # Sans tickers : ceux de tickers_par_defaut qui reviennent à ce panel (repartir_tickers) s'il fait partie
+    # de PANELS, tous sinon
+    if not tickers:
+        tickers = tickers_par_defaut(mapping_isin=mapping_isin)
+        repartition = repartir_tickers(tickers, PANELS, (mapping_isin or {}).values())
+        tickers = next((t for p, t in repartition.items() if os.path.abspath(p) == os.path.abspath(csv_file)),
+                       tickers)
+    panel = pd.read_csv(csv_file, parse_dates=[0], index_col=0) if os.path.exists(csv_file) else None
+    plages = fusionner_plages(plages_manquantes(panel, tickers, debut, fin))
+    telechargeur = Telechargeur(**options)
+    cotations, erreurs = telechargeur.telecharger(plages)
+    ecrire_dans_panel(csv_file, cotations)
+    rapport = pd.DataFrame({
+        "plages": pd.Series([p[0] for p in plages], dtype=object).value_counts(),
+        "dates": pd.Series({t: len(df) for t, df in cotations.items()}, dtype="int64"),
+        "erreur": pd.Series(erreurs, dtype=object),
+    }).reindex(tickers)
+    rapport["dates"] = rapport["dates"].fillna(0).astype(int)
+    rapport.attrs["requetes"] = telechargeur.requetes
+    return rapport
+
+
+def rafraichir_panels(tickers=None, panels=PANELS, debut=DEBUT_PAR_DEFAUT, fin=None, mapping_isin=None, **options):
+    # Chaque ticker est rafraîchi dans le panel qui le contient déjà ; rapports réunis
+    tickers = tickers or tickers_par_defaut(mapping_isin=mapping_isin)
+    rapports = [rafraichir_panel(p, t, debut, fin, **options).assign(panel=p)
+                for p, t in repartir_tickers(tickers, panels, (mapping_isin or {}).values()).items() if t]
+    rapport = pd.concat(rapports) if rapports else pd.DataFrame(columns=["plages", "dates", "erreur", "panel"])
+    rapport.attrs["requetes"] = sum(r.attrs["requetes"] for r in rapports)
+    return rapport
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Télécharge les cours manquants dans un panel")
+    parser.add_argument("tickers", nargs="*")
+    parser.add_argument("--panel", help="panel à compléter ; par défaut chaque ticker va dans le panel qui le contient")
+    parser.add_argument("--mapping", help="JSON {fichier d'export: identifiant} (mapping_isin) à ajouter aux tickers")
+    parser.add_argument("--debut", default=DEBUT_PAR_DEFAUT)
+    parser.add_argument("--fin")
+    parser.add_argument("--url", default=URL_COTATIONS, help="modèle d'URL avec {ticker}")
+    parser.add_argument("--debit", type=float, default=REQUETES_PAR_SECONDE, help="requêtes par seconde")
+    parser.add_argument("--concurrence", type=int, default=CONCURRENCE)
+    args = parser.parse_args()
+    mapping_isin = None
+    if args.mapping:
+        with open(args.mapping) as f:
+            mapping_isin = json.load(f)
+    debut = time.perf_counter()
+    options = dict(url=args.url, debit=args.debit, concurrence=args.concurrence)
+    if args.panel:
+        rapport = rafraichir_panel(args.panel, args.tickers or None, args.debut, args.fin, mapping_isin, **options)
+    else:
+        rapport = rafraichir_panels(args.tickers or None, PANELS, args.debut, args.fin, mapping_isin, **options)
+    print(rapport.to_string())
+    print(f"{rapport.attrs['requetes']} requêtes en {time.perf_counter() - debut:.1f} s, "
+          f"{rapport['erreur'].notna().sum()} échecs")
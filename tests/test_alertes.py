@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from alertes import MoteurAlertes
+
+
+def _actives(moteur):
+    return set(moteur.alertes_actives()["id"])
+
+
+def test_serie_publiee_en_retard():
+    # La VL du fonds arrive à J+1 : ses lignes ne doivent pas être écartées par la date des actions
+    moteur = MoteurAlertes(["inactivite FONDS > 3", "drawdown FONDS > 10%"])
+    dates = pd.bdate_range("2024-01-01", periods=10)
+    panel = pd.DataFrame({"ACTION": np.linspace(100, 110, 10), "FONDS": np.nan}, index=dates)
+    panel.loc[dates[:9], "FONDS"] = 100.0
+    for jour in range(len(dates)):
+        # À chaque passage : les actions jusqu'au jour, le fonds jusqu'à la veille
+        vue = panel.iloc[:jour + 1].copy()
+        vue.iloc[-1, 1] = np.nan
+        moteur.mettre_a_jour(vue)
+    assert moteur.date[moteur.series.get_loc("FONDS")] == np.datetime64(dates[8].date())
+    assert _actives(moteur) == set()
+
+    # Baisse de 20 % du fonds publiée le lendemain, quand les actions ont déjà avancé
+    lendemain = dates[-1] + pd.offsets.BDay()
+    suite = pd.DataFrame({"ACTION": [111.0, 112.0], "FONDS": [80.0, np.nan]}, index=[dates[-1], lendemain])
+    moteur.mettre_a_jour(pd.concat([panel.iloc[:-1], suite]))
+    assert _actives(moteur) == {"drawdown FONDS > 10%"}
+    assert moteur.evaluer_tout() == []
+
+
+def test_panel_entier_repasse_sans_effet():
+    moteur = MoteurAlertes(["cours A < 50"])
+    panel = pd.DataFrame({"A": [100.0, 40.0]}, index=pd.bdate_range("2024-01-01", periods=2))
+    assert len(moteur.mettre_a_jour(panel)) == 1
+    assert moteur.mettre_a_jour(panel) == []
+    assert moteur.evaluations == 1
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from calendrier import ANNEES_TABLES, NOUVEL_AN_LUNAIRE, aligner, jours_ouvres
+
+
+def test_anciennete_en_seances_de_la_place():
+    # Vendredi saint et lundi de Pâques 2024 fermés à Paris : le 2 avril est à 5 séances du 22 mars
+    panel = pd.DataFrame({"A": [1.0, np.nan]}, index=pd.DatetimeIndex(["2024-03-22", "2024-04-03"]))
+    alignee = aligner(panel, "XPAR", limite=5)["A"]
+    assert alignee["2024-04-02"] == 1.0
+    assert np.isnan(alignee["2024-04-03"])
+
+
+def test_tables_couvrent_les_annees_annoncees():
+    assert set(ANNEES_TABLES) <= set(NOUVEL_AN_LUNAIRE)
+    # Taïwan : la semaine du Nouvel An lunaire est fermée chaque année des tables
+    for annee in (ANNEES_TABLES[0], ANNEES_TABLES[-1]):
+        nouvel_an = pd.Timestamp(annee, *NOUVEL_AN_LUNAIRE[annee])
+        assert not jours_ouvres("XTAI", nouvel_an, nouvel_an + pd.Timedelta(days=1)).size
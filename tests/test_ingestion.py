@@ -0,0 +1,20 @@
+import os
+
+import pandas as pd
+
+from generateur import ecrire_export_txt, generer_panel
+from ingestion import merge_fichiers_avec_isin
+
+
+def test_devise_differente_du_referentiel(tmp_path):
+    # Export en USD d'une ligne attendue en EUR (referentiel.DEVISES) : série en quarantaine
+    panel = generer_panel(2, places=("FONDS",), debut="2024-01-01", fin="2024-06-28")
+    usd, eur = str(tmp_path / "CANDRIAM.txt"), str(tmp_path / "AUTRE.txt")
+    ecrire_export_txt(panel.iloc[:, 0], usd, devise="USD")
+    ecrire_export_txt(panel.iloc[:, 1], eur)
+    fusion = merge_fichiers_avec_isin([usd, eur], {usd: "LU1313770536", eur: "FR0000000001"},
+                                      dossier_output=str(tmp_path), versionner=False)
+    rapport = pd.read_csv(os.path.join(tmp_path, "qualite_data_fonds.csv"), index_col=0)
+    assert rapport.loc["LU1313770536", "devise_attendue"] == "EUR"
+    assert "devise (erreur)" in rapport.loc["LU1313770536", "anomalies"]
+    assert list(fusion.columns) == ["date", "FR0000000001"]
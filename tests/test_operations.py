@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import operations
+from generateur import generer_panel
+from operations import ajouter_operations, ajuster_panel, charger_panels_ajustes, lire_operations
+
+
+def _ecrire(panel, chemin, mtime_ns):
+    panel.to_csv(chemin, date_format="%Y-%m-%d")
+    os.utime(chemin, ns=(mtime_ns, mtime_ns))
+
+
+def test_publication_incrementale(tmp_path):
+    panel = generer_panel(5, places=("XPAR",), debut="2023-01-02", fin="2024-12-31")
+    csv_file, chemin_operations, dossier = (str(tmp_path / "data_actifs.csv"), str(tmp_path / "operations.csv"),
+                                            str(tmp_path / "shm"))
+    ajouter_operations(pd.DataFrame({"date": [panel.index[100]], "ticker": [panel.columns[0]],
+                                     "type": ["dividende"], "valeur": [1.0]}), chemin_operations)
+    _ecrire(panel.iloc[:-1], csv_file, 10**18)
+    charger_panels_ajustes(csv_file, chemin_operations, dossier)
+
+    # Une date ajoutée : seule la dernière ligne est recalculée par le worker qui a publié
+    _ecrire(panel, csv_file, 10**18 + 1)
+    prix, total = charger_panels_ajustes(csv_file, chemin_operations, dossier)
+    ajusteur = operations._ajusteurs[(csv_file, dossier)][1]
+    assert ajusteur.lignes_recalculees == 1
+    attendu = ajuster_panel(operations.charger_panel_partage(csv_file, dossier), lire_operations(chemin_operations))
+    np.testing.assert_allclose(total.to_numpy(), attendu[1].to_numpy())
+    np.testing.assert_allclose(prix.to_numpy(), attendu[0].to_numpy())
+
+    # Version publiée par un autre worker : l'ajusteur de ce processus est libéré
+    operations._ajustes.clear()
+    operations._ajusteurs[(csv_file, dossier)] = ([0, 0], ajusteur)
+    charger_panels_ajustes(csv_file, chemin_operations, dossier)
+    assert (csv_file, dossier) not in operations._ajusteurs
@@ -0,0 +1,21 @@
+import os
+
+import pandas as pd
+
+from panel_partage import charger_panel_partage
+
+
+def test_fichiers_de_meme_nom(tmp_path):
+    # Deux copies du dépôt : même nom de fichier, même date de modification, colonnes différentes
+    dossier = str(tmp_path / "shm")
+    index = pd.bdate_range("2024-01-01", periods=3, name="date")
+    chemins = []
+    for sous_dossier, colonne in (("a", "X"), ("b", "Y")):
+        os.makedirs(tmp_path / sous_dossier)
+        chemin = str(tmp_path / sous_dossier / "data_actifs.csv")
+        pd.DataFrame({colonne: [1.0, 2.0, 3.0]}, index=index).to_csv(chemin, date_format="%Y-%m-%d")
+        os.utime(chemin, ns=(10**18, 10**18))
+        chemins.append(chemin)
+    assert [list(charger_panel_partage(c, dossier).columns) for c in chemins] == [["X"], ["Y"]]
+    # Pas de republication croisée : chaque fichier garde sa première version
+    assert [charger_panel_partage(c, dossier).attrs["version"] for c in chemins] == [1, 1]
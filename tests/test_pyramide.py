@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import pyramide
+from generateur import generer_panel
+from pyramide import NIVEAUX, Pyramide, charger_pyramides_ajustees
+
+
+def _ecrire(panel, chemin, mtime_ns):
+    panel.to_csv(chemin, date_format="%Y-%m-%d")
+    os.utime(chemin, ns=(mtime_ns, mtime_ns))
+
+
+def test_publication_incrementale(tmp_path, monkeypatch):
+    # Sans financial_data/operations.csv dans le répertoire courant : panels ajustés = cours bruts
+    monkeypatch.chdir(tmp_path)
+    panel = generer_panel(4, places=("XPAR",), debut="2022-01-03", fin="2024-12-31")
+    csv_file, dossier = str(tmp_path / "data_actifs.csv"), str(tmp_path / "shm")
+    _ecrire(panel.iloc[:-3], csv_file, 10**18)
+    charger_pyramides_ajustees(csv_file, dossier)
+
+    # Trois dates ajoutées : le worker qui publie ne refait que les dernières périodes
+    _ecrire(panel, csv_file, 10**18 + 1)
+    publiees = charger_pyramides_ajustees(csv_file, dossier)
+    assert [p.lignes_recalculees for p in pyramide._publiees[(csv_file, dossier)][1]] == [3, 3]
+    for publiee in publiees:
+        jour = pd.DataFrame(publiee.valeurs, index=pd.DatetimeIndex(publiee.jours.astype("datetime64[D]")),
+                            columns=publiee.colonnes)
+        attendue = Pyramide.depuis_panel(jour)
+        for niveau in NIVEAUX[1:]:
+            np.testing.assert_array_equal(publiee.niveaux[niveau][0], attendue.niveaux[niveau][0])
+            for champ, valeurs in attendue.niveaux[niveau][1].items():
+                np.testing.assert_allclose(publiee.niveaux[niveau][1][champ], valeurs, rtol=1e-6)
@@ -0,0 +1,120 @@
+import time
+
+import pandas as pd
+import pytest
+
+from generateur import ServeurCotations
+from telechargement import Telechargeur, ecrire_dans_panel, fusionner_plages, rafraichir_panel, repartir_tickers
+
+DEBUT, FIN = pd.Timestamp("2024-01-01"), pd.Timestamp("2024-03-29")
+
+
+@pytest.fixture
+def serveur():
+    with ServeurCotations() as serveur:
+        yield serveur
+
+
+def test_reprise_429_503_avec_retry_after():
+    # 429 (Retry-After: 1) puis 503 (délai exponentiel) puis succès
+    with ServeurCotations(premieres_erreurs=2, retry_after="1") as serveur:
+        telechargeur = Telechargeur(serveur.url, delai_initial=0.01, tentatives=3)
+        debut = time.perf_counter()
+        resultats, erreurs = telechargeur.telecharger([("AAA", DEBUT, FIN)])
+        duree = time.perf_counter() - debut
+    assert erreurs == {}
+    assert not resultats["AAA"].empty
+    assert telechargeur.requetes == serveur.requetes == 3
+    assert duree >= 1.0
+
+
+def test_erreurs_temporaires_epuisent_les_tentatives():
+    with ServeurCotations(premieres_erreurs=10) as serveur:
+        telechargeur = Telechargeur(serveur.url, delai_initial=0.01, tentatives=3)
+        resultats, erreurs = telechargeur.telecharger([("AAA", DEBUT, FIN)])
+    assert resultats == {}
+    assert "HTTP" in erreurs["AAA"]
+    assert serveur.requetes == 3
+
+
+def test_404_en_erreur_sans_reprise(serveur):
+    telechargeur = Telechargeur(serveur.url, delai_initial=0.01)
+    resultats, erreurs = telechargeur.telecharger([("INCONNU1", DEBUT, FIN), ("AAA", DEBUT, FIN)])
+    assert "ticker inconnu" in erreurs["INCONNU1"]
+    assert list(resultats) == ["AAA"]
+    assert serveur.requetes == 2
+
+
+def test_limite_de_debit_globale(serveur):
+    # 10 requêtes à 20/s sans rafale : au moins 9 intervalles de 50 ms, quelle que soit la concurrence
+    telechargeur = Telechargeur(serveur.url, debit=20, rafale=1, concurrence=10)
+    debut = time.perf_counter()
+    resultats, erreurs = telechargeur.telecharger([(f"T{i}", DEBUT, FIN) for i in range(10)])
+    assert time.perf_counter() - debut >= 9 / 20 * 0.95
+    assert erreurs == {} and len(resultats) == 10
+
+
+def test_fusion_des_plages():
+    jour = pd.Timedelta(days=1)
+    plages = [
+        ("AAA", DEBUT, DEBUT + 4 * jour),
+        ("BBB", DEBUT, FIN),
+        ("AAA", DEBUT + 7 * jour, DEBUT + 10 * jour),   # vendredi -> lundi : regroupée
+        ("AAA", DEBUT + 2 * jour, DEBUT + 3 * jour),    # incluse
+        ("AAA", DEBUT + 30 * jour, FIN),                # trop loin
+    ]
+    assert fusionner_plages(plages) == [
+        ("AAA", DEBUT, DEBUT + 10 * jour),
+        ("AAA", DEBUT + 30 * jour, FIN),
+        ("BBB", DEBUT, FIN),
+    ]
+
+
+def test_rafraichir_panel_une_requete_par_trou(serveur, tmp_path):
+    # Dates manquantes avant et après les cours connus : deux requêtes pour AAA, une pour le nouveau BBB
+    csv_file = tmp_path / "panel.csv"
+    index = pd.bdate_range("2024-02-01", "2024-02-29", name="date")
+    pd.DataFrame({"AAA": 100.0}, index=index).to_csv(csv_file)
+    rapport = rafraichir_panel(str(csv_file), ["AAA", "BBB"], DEBUT, FIN, url=serveur.url)
+    assert serveur.requetes == rapport.attrs["requetes"] == 3
+    assert rapport.loc["AAA", "plages"] == 2 and rapport.loc["BBB", "plages"] == 1
+    panel = pd.read_csv(csv_file, parse_dates=[0], index_col=0)
+    assert panel.index.min() < index[0] and panel.index.max() > index[-1]
+    assert (panel.loc[index, "AAA"] == 100.0).all()
+
+
+def test_ecrire_dans_panel_remplace_les_dates_existantes(tmp_path):
+    csv_file = str(tmp_path / "panel.csv")
+    index = pd.bdate_range("2024-01-01", periods=5, name="date")
+    pd.DataFrame({"AAA": [1.0] * 5, "BBB": [2.0] * 5}, index=index).to_csv(csv_file)
+    nouvelles = pd.DataFrame({"clot": [9.0, 9.5]}, index=[index[-1], index[-1] + pd.offsets.BDay()])
+    panel = ecrire_dans_panel(csv_file, {"AAA": nouvelles, "CCC": nouvelles}, versionner=False)
+    relu = pd.read_csv(csv_file, parse_dates=[0], index_col=0)
+    pd.testing.assert_frame_equal(relu, panel, check_freq=False)
+    assert list(relu.columns) == ["AAA", "BBB", "CCC"]
+    assert relu.loc[index[-1], "AAA"] == 9.0
+    assert relu.loc[index[-1] + pd.offsets.BDay(), "AAA"] == 9.5
+    assert (relu.loc[index[:-1], "AAA"] == 1.0).all()
+    assert (relu.loc[index, "BBB"] == 2.0).all()
+    assert relu["CCC"].notna().sum() == 2
+
+
+def test_rafraichir_panel_sans_tickers_prend_ceux_du_panel(serveur, tmp_path, monkeypatch):
+    # Le fonds des tickers par défaut n'est pas écrit dans le panel des actifs
+    import telechargement
+    actifs, fonds = str(tmp_path / "actifs.csv"), str(tmp_path / "fonds.csv")
+    monkeypatch.setattr(telechargement, "PANELS", [actifs, fonds])
+    rapport = rafraichir_panel(actifs, debut=DEBUT, fin=FIN, url=serveur.url)
+    assert "LU1313770536" not in rapport.index and "SW.PA" in rapport.index
+    assert "LU1313770536" not in pd.read_csv(actifs, nrows=0, index_col=0).columns
+
+
+def test_repartition_dans_le_panel_qui_contient_le_ticker(tmp_path):
+    actifs, fonds = str(tmp_path / "actifs.csv"), str(tmp_path / "fonds.csv")
+    index = pd.bdate_range("2024-01-01", periods=3, name="date")
+    pd.DataFrame({"AAA": 1.0, "FR0000000001": 1.0}, index=index).to_csv(actifs)
+    pd.DataFrame({"LU1313770536": 1.0}, index=index).to_csv(fonds)
+    repartition = repartir_tickers(["AAA", "LU1313770536", "FR0000000001", "NOUVEAU", "FR0013314580", "0P0000KU3M.F"],
+                                   [actifs, fonds], fonds=["0P0000KU3M.F"])
+    assert repartition == {actifs: ["AAA", "FR0000000001", "NOUVEAU"],
+                           fonds: ["LU1313770536", "FR0013314580", "0P0000KU3M.F"]}
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from versions import enregistrer_panel, lire_panel, versions
+
+
+def _panel(colonnes, graine=0):
+    index = pd.bdate_range("2023-01-02", "2025-01-31", name="date").as_unit("ns")
+    valeurs = 100 * np.cumprod(1 + np.random.default_rng(graine).normal(0, 0.01, (len(index), len(colonnes))), axis=0)
+    return pd.DataFrame(valeurs, index=index, columns=colonnes)
+
+
+def test_nouvelle_serie_n_ecrit_que_ses_morceaux(tmp_path):
+    csv_file, dossier = str(tmp_path / "data_fonds.csv"), str(tmp_path / "versions")
+    panel = _panel(["A", "B", "C"])
+    enregistrer_panel(csv_file, panel, dossier)
+    n_mois = len(panel.index.to_period("M").unique())
+
+    # Un fonds ajouté au milieu des colonnes : ses morceaux seulement, pas une copie du panel
+    avec_fonds = panel.assign(FONDS=_panel(["FONDS"], graine=1)["FONDS"])[["A", "FONDS", "B", "C"]]
+    enregistrer_panel(csv_file, avec_fonds, dossier)
+    historique = versions(csv_file, dossier)
+    assert historique["nouveaux"].tolist() == [n_mois, n_mois]
+    # Les morceaux de la première version sont repris tels quels, à côté de ceux du fonds
+    assert historique["morceaux"].tolist() == [n_mois, 2 * n_mois]
+
+    # Une date ajoutée : le dernier mois de chaque groupe
+    jour = avec_fonds.index[-1] + pd.offsets.BDay()
+    avec_fonds.loc[jour] = avec_fonds.iloc[-1] * 1.01
+    enregistrer_panel(csv_file, avec_fonds, dossier)
+    assert versions(csv_file, dossier)["nouveaux"].iloc[-1] == 2
+
+    pd.testing.assert_frame_equal(lire_panel(csv_file, version=1, dossier=dossier), panel, check_freq=False)
+    pd.testing.assert_frame_equal(lire_panel(csv_file, dossier=dossier), avec_fonds, check_freq=False)
+    pd.testing.assert_frame_equal(lire_panel(csv_file, dossier=dossier, colonnes=["C", "FONDS"]),
+                                  avec_fonds[["C", "FONDS"]], check_freq=False)
@@ -0,0 +1,161 @@
+import glob
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from referentiel import ACTIFS_COTES, COMPOSITION_SPE
+
+# Transparisation des fonds : les inventaires (positions des fonds) sont rangés dans une matrice creuse
+# lignes du portefeuille x émetteurs, et l'exposition du portefeuille par émetteur est un seul produit
+# poids x matrice. Secteurs et pays sont ensuite des sommes par groupe d'émetteurs.
+#
+# Inventaires : un fichier CSV par fonds dans financial_data/inventaires/<fonds>.csv, colonnes
+#   emetteur,secteur,pays,poids
+# (poids en fraction ou en %). Les lignes directes (actions détenues en direct) sont des « fonds »
+# détenant 100 % d'un seul émetteur. Une ligne sans inventaire est comptée en « Non transparisé ».
+
+DOSSIER_INVENTAIRES = "financial_data/inventaires"
+NON_TRANSPARISE = "Non transparisé"
+COLONNES_INVENTAIRE = ["fonds", "emetteur", "secteur", "pays", "poids"]
+# Taille maximale (lignes x émetteurs) d'un bloc déplié pendant le produit
+TAILLE_BLOC = 2 ** 22
+
+
+def lire_inventaires(dossier=DOSSIER_INVENTAIRES):
+    # Tous les inventaires d'un dossier en une table longue (une ligne par position)
+    tables = []
+    for chemin in sorted(glob.glob(os.path.join(dossier, "*.csv"))):
+        table = pd.read_csv(chemin)
+        table["fonds"] = os.path.splitext(os.path.basename(chemin))[0]
+        tables.append(table)
+    if not tables:
+        return pd.DataFrame(columns=COLONNES_INVENTAIRE)
+    inventaires = pd.concat(tables, ignore_index=True)
+    manquantes = set(COLONNES_INVENTAIRE) - set(inventaires.columns)
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes dans les inventaires : {', '.join(sorted(manquantes))}")
+    return inventaires[COLONNES_INVENTAIRE]
+
+
+class MatriceTransparence:
+    # Matrice creuse au format coordonnées, triée par émetteur : (ligne, émetteur, poids) pour chaque position
+    def __init__(self, inventaires, lignes_directes=None):
+        # lignes_directes : {ligne du portefeuille: émetteur} pour les titres détenus en direct
+        inventaires = inventaires[COLONNES_INVENTAIRE].copy()
+        if lignes_directes:
+            directes = pd.DataFrame({"fonds": list(lignes_directes), "emetteur": list(lignes_directes.values()),
+                                     "poids": 1.0})
+            inventaires = pd.concat([inventaires, directes], ignore_index=True)
+        inventaires["emetteur"] = inventaires["emetteur"].astype(str).str.strip()
+        inventaires["poids"] = pd.to_numeric(inventaires["poids"], errors="coerce").fillna(0.0)
+
+        # Poids en % ramenés en fraction, fonds par fonds
+        totaux = inventaires.groupby("fonds")["poids"].transform("sum")
+        inventaires.loc[totaux > 1.5, "poids"] /= 100
+
+        lignes, self.lignes = pd.factorize(inventaires["fonds"], sort=True)
+        colonnes, self.emetteurs = pd.factorize(inventaires["emetteur"].str.upper(), sort=True)
+        ordre = np.argsort(colonnes, kind="stable")
+        self.i = lignes[ordre].astype(np.int32)
+        self.j = colonnes[ordre].astype(np.int32)
+        self.valeurs = inventaires["poids"].to_numpy(dtype="float64")[ordre]
+        self.positions = {ligne: k for k, ligne in enumerate(self.lignes)}
+
+        # Nom affiché, secteur et pays : première valeur renseignée pour chaque émetteur
+        premiers = inventaires.iloc[ordre].assign(_j=self.j).groupby("_j").first()
+        self.noms = premiers["emetteur"].to_numpy()
+        self.secteurs = premiers["secteur"].fillna("Inconnu").to_numpy()
+        self.pays = premiers["pays"].fillna("Inconnu").to_numpy()
+
+    @property
+    def forme(self):
+        return len(self.lignes), len(self.emetteurs)
+
+    @property
+    def nnz(self):
+        return len(self.valeurs)
+
+    def _matrice_poids(self, poids):
+        # Poids du ou des portefeuilles sur les lignes de la matrice, et part non transparisée
+        if isinstance(poids, pd.DataFrame):
+            poids = poids.astype(float)
+        else:
+            poids = pd.DataFrame([pd.Series(poids, dtype=float)], index=["Portefeuille"])
+        connus = poids.reindex(columns=self.lignes, fill_value=0.0).fillna(0.0)
+        non_transparise = poids.drop(columns=list(self.lignes), errors="ignore").sum(axis=1)
+        return connus.to_numpy(), poids.index, non_transparise
+
+    def _produit(self, matrice):
+        # poids (portefeuilles x lignes) @ matrice creuse (lignes x émetteurs). Les positions étant triées par
+        # émetteur, chaque bloc d'émetteurs est une tranche contiguë des positions : elle est dépliée en
+        # matrice dense lignes x bloc (mémoire bornée) puis multipliée par BLAS.
+        resultat = np.zeros((len(matrice), len(self.emetteurs)))
+        bloc = max(1, TAILLE_BLOC // max(len(self.lignes), 1))
+        bornes = np.searchsorted(self.j, np.arange(0, len(self.emetteurs) + bloc, bloc))
+        for k, (debut, fin) in enumerate(zip(bornes[:-1], bornes[1:])):
+            if debut == fin:
+                continue
+            premier = k * bloc
+            dense = np.zeros((len(self.lignes), min(bloc, len(self.emetteurs) - premier)))
+            dense[self.i[debut:fin], self.j[debut:fin] - premier] = self.valeurs[debut:fin]
+            resultat[:, premier:premier + dense.shape[1]] = matrice @ dense
+        return resultat
+
+    def exposition(self, poids):
+        # poids : {ligne: poids} ou DataFrame portefeuilles x lignes. Résultat : portefeuilles x émetteurs
+        matrice, portefeuilles, non_transparise = self._matrice_poids(poids)
+        expositions = self._produit(matrice)
+        resultat = pd.DataFrame(expositions, index=portefeuilles, columns=self.noms)
+        if non_transparise.any():
+            resultat[NON_TRANSPARISE] = non_transparise.to_numpy()
+        return resultat
+
+    def exposition_par(self, poids, critere="secteur"):
+        # Somme des expositions par secteur ou par pays des émetteurs
+        expositions = self.exposition(poids)
+        groupes = {"secteur": self.secteurs, "pays": self.pays}[critere]
+        codes, noms = pd.factorize(groupes, sort=True)
+        ordre = np.argsort(codes, kind="stable")
+        debuts = np.flatnonzero(np.r_[True, codes[ordre][1:] != codes[ordre][:-1]])
+        valeurs = expositions.to_numpy()[:, ordre]
+        resultat = pd.DataFrame(np.add.reduceat(valeurs, debuts, axis=1) if len(ordre) else
+                                np.zeros((len(expositions), 0)), index=expositions.index, columns=noms)
+        if NON_TRANSPARISE in expositions:
+            resultat[NON_TRANSPARISE] = expositions[NON_TRANSPARISE]
+        return resultat
+
+
+def poids_portefeuille(composition=COMPOSITION_SPE, actifs_cotes=ACTIFS_COTES):
+    # Poids (fraction du portefeuille) de chaque ligne cotée : poids de la poche réparti également
+    poids = {}
+    for poche, actifs_poche in actifs_cotes.items():
+        for nom in actifs_poche:
+            poids[nom] = composition[poche] / 100 / len(actifs_poche)
+    return poids
+
+
+def lignes_directes_par_defaut(actifs_cotes=ACTIFS_COTES):
+    # Actions détenues en direct : la ligne est l'émetteur lui-même
+    return {nom: nom for nom in actifs_cotes.get("Actions Durables Inclusion", {})}
+
+
+# Matrice construite une fois par version du dossier d'inventaires
+_cache = {}
+_verrou = threading.Lock()
+
+
+def version_inventaires(dossier=DOSSIER_INVENTAIRES):
+    return tuple((os.path.basename(c), os.stat(c).st_mtime_ns) for c in sorted(glob.glob(os.path.join(dossier, "*.csv"))))
+
+
+def charger_transparence(dossier=DOSSIER_INVENTAIRES, lignes_directes=None):
+    lignes_directes = lignes_directes_par_defaut() if lignes_directes is None else lignes_directes
+    cle = (dossier, tuple(sorted(lignes_directes.items())))
+    version = version_inventaires(dossier)
+    with _verrou:
+        entree = _cache.get(cle)
+        if entree is None or entree[0] != version:
+            entree = _cache[cle] = (version, MatriceTransparence(lire_inventaires(dossier), lignes_directes))
+        return entree[1]
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+from calendrier import jours_feries, place_de
+
+# Contrôles de qualité des panels de cours, calculés pour toutes les séries en une passe sur la matrice.
+# Chaque anomalie a une gravité : les "erreurs" envoient la série en quarantaine (retirée du panel
+# écrit), les "avertissements" sont seulement signalés dans le rapport.
+
+SEUILS = {
+    # Jours de cotation manquants entre la première et la dernière valeur d'une série
+    "trou_avertissement": 3,
+    "trou_erreur": 20,
+    # Jours de cotation sans valeur à la fin du panel (série arrêtée ou export incomplet)
+    "fin_avertissement": 1,
+    "fin_erreur": 10,
+    # Cours identiques d'un jour sur l'autre
+    "plat_avertissement": 5,
+    "plat_erreur": 60,
+    # Variation journalière au-delà de N écarts-types robustes
+    "sigma_saut": 8,
+    "sauts_erreur": 5,
+}
+
+
+def _longueur_max_series(masque):
+    # Plus longue suite de True par colonne (matrice dates x séries), sans boucle Python
+    cumul = np.cumsum(masque, axis=0)
+    remise = np.maximum.accumulate(np.where(masque, 0, cumul), axis=0)
+    return (cumul - remise).max(axis=0) if len(masque) else np.zeros(masque.shape[1], dtype=int)
+
+
+def _jours_ouverts(index, places):
+    # Matrice dates x séries : la place de chaque série cote-t-elle ce jour-là ?
+    uniques = sorted(set(places))
+    annees = range(index[0].year, index[-1].year + 1)
+    ouverts = np.column_stack([
+        (index.dayofweek < 5) & ~index.isin(jours_feries(place, annees)) for place in uniques
+    ])
+    return ouverts[:, [uniques.index(p) for p in places]]
+
+
+def controler_panel(panel, places=None, devises=None, devises_attendues=None, infos_exports=None, seuils=SEUILS):
+    # Rapport de qualité par série (une ligne par colonne du panel)
+    seuils = {**SEUILS, **seuils}
+    panel = panel.sort_index()
+    valeurs = panel.to_numpy(dtype="float64")
+    n_dates, n_series = valeurs.shape
+    places = [(places or {}).get(c, place_de(c)) for c in panel.columns]
+
+    valides = ~np.isnan(valeurs)
+    presentes = valides.any(axis=0)
+    premiere = np.where(presentes, valides.argmax(axis=0), 0)
+    derniere = np.where(presentes, n_dates - 1 - valides[::-1].argmax(axis=0), -1)
+    lignes = np.arange(n_dates)[:, None]
+    en_vie = (lignes >= premiere) & (lignes <= derniere)
+
+    # Trous par rapport au calendrier de la place, et fin de série avant la fin du panel
+    ouverts = _jours_ouverts(panel.index, places) if n_dates else np.zeros_like(valides)
+    manquants = en_vie & ouverts & ~valides
+    apres_fin = (lignes > derniere) & ouverts
+
+    # Cours plats : égalité avec la dernière valeur connue
+    prolonges = pd.DataFrame(valeurs).ffill().to_numpy()
+    plats = np.zeros_like(valides)
+    plats[1:] = valides[1:] & (prolonges[1:] == prolonges[:-1])
+
+    # Sauts : rendements log au-delà de N écarts-types robustes (MAD), écart-type classique si la MAD est nulle
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rendements = np.full_like(valeurs, np.nan)
+        rendements[1:] = np.where(valides[1:], np.log(prolonges[1:] / prolonges[:-1]), np.nan)
+        mediane = np.nanmedian(rendements, axis=0) if n_dates > 1 else np.full(n_series, np.nan)
+        ecart = np.abs(rendements - mediane)
+        sigma = 1.4826 * np.nanmedian(ecart, axis=0) if n_dates > 1 else np.full(n_series, np.nan)
+        sigma = np.where(sigma > 0, sigma, np.nanstd(rendements, axis=0))
+        sauts = (ecart > seuils["sigma_saut"] * sigma).sum(axis=0)
+
+    rapport = pd.DataFrame({
+        "place": places,
+        "premiere_date": panel.index[premiere].where(presentes),
+        "derniere_date": panel.index[np.maximum(derniere, 0)].where(presentes),
+        "debut_tardif": presentes & (premiere > 0),
+        "jours_manquants": manquants.sum(axis=0),
+        "plus_long_trou": _longueur_max_series(manquants),
+        "jours_sans_valeur_en_fin": apres_fin.sum(axis=0),
+        "plus_long_plat": _longueur_max_series(plats),
+        "sauts": sauts,
+    }, index=panel.columns)
+    rapport["dates_dupliquees"] = int(panel.index.duplicated().sum())
+
+    if infos_exports is not None:
+        rapport = rapport.join(pd.DataFrame(infos_exports).T)
+    if devises is not None:
+        rapport["devise"] = pd.Series(devises)
+    if devises_attendues is not None:
+        rapport["devise_attendue"] = pd.Series(devises_attendues)
+
+    return _qualifier(rapport, presentes, seuils)
+
+
+def _qualifier(rapport, presentes, seuils):
+    # Liste des anomalies par série, et quarantaine dès qu'une anomalie est une erreur
+    regles = [
+        ("vide", "erreur", ~presentes),
+        ("trous", "erreur", rapport["plus_long_trou"] >= seuils["trou_erreur"]),
+        ("trous", "avertissement", rapport["plus_long_trou"] >= seuils["trou_avertissement"]),
+        ("fin_manquante", "erreur", rapport["jours_sans_valeur_en_fin"] >= seuils["fin_erreur"]),
+        ("fin_manquante", "avertissement", rapport["jours_sans_valeur_en_fin"] >= seuils["fin_avertissement"]),
+        ("debut_tardif", "avertissement", rapport["debut_tardif"]),
+        ("cours_fige", "erreur", rapport["plus_long_plat"] >= seuils["plat_erreur"]),
+        ("cours_fige", "avertissement", rapport["plus_long_plat"] >= seuils["plat_avertissement"]),
+        ("sauts", "erreur", rapport["sauts"] >= seuils["sauts_erreur"]),
+        ("sauts", "avertissement", rapport["sauts"] > 0),
+        ("dates_dupliquees", "erreur", rapport["dates_dupliquees"] > 0),
+    ]
+    if "ohlc_identiques" in rapport:
+        # Exports de VL : ouverture = plus haut = plus bas = clôture, volume nul
+        regles.append(("ohlc_plat_volume_nul", "avertissement",
+                       (rapport["ohlc_identiques"] > 0.99) & (rapport["volume_nul"] > 0.99)))
+    if "dates_dupliquees_export" in rapport:
+        regles.append(("dates_dupliquees", "erreur", rapport["dates_dupliquees_export"].fillna(0) > 0))
+    if "devises_export" in rapport:
+        regles.append(("devises_multiples", "erreur", rapport["devises_export"].fillna("").str.contains(",")))
+    if "devise" in rapport and "devise_attendue" in rapport:
+        ecart = rapport["devise"].notna() & rapport["devise_attendue"].notna() & (rapport["devise"] != rapport["devise_attendue"])
+        regles.append(("devise", "erreur", ecart))
+
+    # Une seule mention par anomalie, la plus grave (les erreurs sont listées en premier)
+    texte = pd.Series("", index=rapport.index)
+    quarantaine = pd.Series(False, index=rapport.index)
+    deja = {}
+    for nom, gravite, masque in regles:
+        masque = pd.Series(np.asarray(masque, dtype=bool), index=rapport.index)
+        nouveau = masque & ~deja.get(nom, False)
+        texte = texte.where(~nouveau, texte + f"{nom} ({gravite}), ")
+        deja[nom] = masque | deja.get(nom, False)
+        if gravite == "erreur":
+            quarantaine |= masque
+    rapport["anomalies"] = texte.str.rstrip(", ")
+    rapport["quarantaine"] = quarantaine
+    return rapport
+
+
+def resumer_export(df):
+    # Indicateurs d'un export .txt brut (date, ouv, haut, bas, clot, vol, devise), calculés à la lecture
+    ohlc = df[["ouv", "haut", "bas", "clot"]].to_numpy(dtype="float64")
+    return {
+        "ohlc_identiques": float((ohlc == ohlc[:, [3]]).all(axis=1).mean()) if len(df) else 0.0,
+        "volume_nul": float((df["vol"].fillna(0) == 0).mean()) if len(df) else 0.0,
+        "devises_export": ",".join(sorted(df["devise"].dropna().astype(str).unique())),
+        "dates_dupliquees_export": int(df["date"].duplicated().sum()),
+    }
+
+
+def appliquer_quarantaine(panel, rapport):
+    # Panel sans les séries en quarantaine
+    return panel.drop(columns=rapport.index[rapport["quarantaine"]])
@@ -0,0 +1,240 @@
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from referentiel import PANELS
+
+# Historique des panels de cours, pour reproduire un rapport ou un écran à l'identique.
+#
+# Chaque version d'un panel est un manifeste (versions/<panel>/<version>.json, à côté du CSV) qui liste des
+# morceaux : un morceau = un mois de dates x un groupe de colonnes (TAILLE_GROUPE au plus), stocké une seule
+# fois sous l'empreinte de son contenu (versions/objets/). Une nouvelle version ne réécrit que les morceaux
+# modifiés : les mois où des cours ont été ajoutés ou corrigés, et seulement pour les groupes de colonnes
+# concernés. Les colonnes gardent leur groupe d'une version à l'autre et les nouvelles séries forment de
+# nouveaux groupes : ajouter un fonds n'écrit que ses propres morceaux. Rien n'est jamais supprimé ni
+# réécrit : une version enregistrée se relit telle quelle.
+#
+#   python versions.py financial_data/data_fonds.csv            # enregistre l'état actuel du CSV
+#   python versions.py financial_data/data_fonds.csv --liste
+#   python versions.py financial_data/data_fonds.csv --au 2025-04-08 --exporter data_fonds_0408.csv
+
+SOUS_DOSSIER = "versions"
+TAILLE_GROUPE = 256
+# Groupes tolérés au-delà du minimum (séries ajoutées une à une) avant un regroupement complet
+GROUPES_EN_PLUS = 16
+
+
+def _nom(csv_file):
+    return os.path.splitext(os.path.basename(csv_file))[0]
+
+
+def _dossier(csv_file, dossier):
+    # Par défaut l'historique est rangé à côté du CSV (financial_data/versions pour les panels du référentiel)
+    return os.path.join(os.path.dirname(csv_file), SOUS_DOSSIER) if dossier is None else dossier
+
+
+def _chemin_objet(empreinte, dossier):
+    return os.path.join(dossier, "objets", empreinte[:2], f"{empreinte}.npz")
+
+
+def _ecrire_objet(dates, colonnes, valeurs, dossier):
+    # Empreinte du contenu (dates, noms de colonnes, valeurs) ; un morceau déjà connu n'est pas réécrit
+    colonnes = np.array(colonnes, dtype=str)
+    empreinte = hashlib.blake2b(digest_size=16)
+    for tableau in (dates, colonnes, valeurs):
+        empreinte.update(np.ascontiguousarray(tableau).tobytes())
+    empreinte = empreinte.hexdigest()
+    chemin = _chemin_objet(empreinte, dossier)
+    if not os.path.exists(chemin):
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        tampon = io.BytesIO()
+        np.savez_compressed(tampon, dates=dates, colonnes=colonnes, valeurs=valeurs)
+        temporaire = f"{chemin}.{os.getpid()}.tmp"
+        with open(temporaire, "wb") as f:
+            f.write(tampon.getvalue())
+        os.replace(temporaire, chemin)
+    return empreinte
+
+
+@lru_cache(maxsize=4096)
+def _lire_objet(chemin):
+    # Les morceaux ne changent jamais : le cache n'a pas besoin d'être invalidé
+    with np.load(chemin, allow_pickle=False) as f:
+        return f["dates"], f["colonnes"].tolist(), f["valeurs"]
+
+
+def _manifestes(nom, dossier):
+    return sorted(glob.glob(os.path.join(dossier, nom, "*.json")))
+
+
+def _lire_manifeste(chemin):
+    with open(chemin) as f:
+        return json.load(f)
+
+
+def _groupes(manifeste):
+    # Colonnes de chaque groupe ; les premiers manifestes donnaient seulement la taille des groupes consécutifs
+    groupes, colonnes = manifeste["groupes"], manifeste["colonnes"]
+    if isinstance(groupes, int):
+        return [colonnes[g:g + groupes] for g in range(0, len(colonnes), groupes)]
+    return groupes
+
+
+def _repartir(colonnes, precedent):
+    # Groupes de la version précédente (sans les colonnes retirées), puis les nouvelles colonnes à part
+    presentes = set(colonnes)
+    groupes = [[c for c in g if c in presentes] for g in (_groupes(precedent) if precedent else [])]
+    groupes = [g for g in groupes if g]
+    placees = {c for g in groupes for c in g}
+    nouvelles = [c for c in colonnes if c not in placees]
+    groupes += [nouvelles[g:g + TAILLE_GROUPE] for g in range(0, len(nouvelles), TAILLE_GROUPE)]
+    if len(groupes) > -(-len(colonnes) // TAILLE_GROUPE) + GROUPES_EN_PLUS:
+        groupes = [colonnes[g:g + TAILLE_GROUPE] for g in range(0, len(colonnes), TAILLE_GROUPE)]
+    return groupes
+
+
+def versions(csv_file, dossier=None):
+    # Une ligne par version : date d'enregistrement, colonnes, dates, morceaux nouveaux
+    lignes = []
+    for chemin in _manifestes(_nom(csv_file), _dossier(csv_file, dossier)):
+        m = _lire_manifeste(chemin)
+        lignes.append({"version": m["version"], "horodatage": pd.Timestamp(m["horodatage"]),
+                       "colonnes": len(m["colonnes"]), "dates": m["n_dates"], "premiere_date": m["premiere_date"],
+                       "derniere_date": m["derniere_date"], "morceaux": len(m["morceaux"]), "nouveaux": m["nouveaux"]})
+    return pd.DataFrame(lignes, columns=["version", "horodatage", "colonnes", "dates", "premiere_date",
+                                         "derniere_date", "morceaux", "nouveaux"])
+
+
+def enregistrer_panel(csv_file, panel=None, dossier=None, horodatage=None):
+    # Enregistre l'état du panel (lu dans le CSV si non fourni) ; renvoie le numéro de version, celui de la
+    # dernière version si rien n'a changé
+    from ingestion import charger_panel
+
+    panel = charger_panel(csv_file) if panel is None else panel
+    panel = panel.sort_index()
+    dossier = _dossier(csv_file, dossier)
+    nom = _nom(csv_file)
+    jours = panel.index.values.astype("datetime64[D]")
+    mois = jours.astype("datetime64[M]")
+    debuts = np.flatnonzero(np.r_[True, mois[1:] != mois[:-1]]) if len(mois) else np.empty(0, dtype=int)
+    fins = np.r_[debuts[1:], len(mois)]
+    valeurs = panel.to_numpy(dtype=float)
+    colonnes = [str(c) for c in panel.columns]
+    existants = _manifestes(nom, dossier)
+    precedent = _lire_manifeste(existants[-1]) if existants else None
+    connus = set(precedent["morceaux"]) if precedent else set()
+    groupes = _repartir(colonnes, precedent)
+    positions = {c: i for i, c in enumerate(colonnes)}
+    positions = [[positions[c] for c in groupe] for groupe in groupes]
+
+    morceaux = []
+    for debut, fin in zip(debuts, fins):
+        for groupe, indices in zip(groupes, positions):
+            morceaux.append(_ecrire_objet(jours[debut:fin].astype(np.int64), groupe,
+                                          np.ascontiguousarray(valeurs[debut:fin, indices]), dossier))
+    if precedent and precedent["morceaux"] == morceaux and precedent["colonnes"] == colonnes:
+        return precedent["version"]
+
+    horodatage = pd.Timestamp.now(tz="UTC") if horodatage is None else pd.Timestamp(horodatage)
+    horodatage = horodatage.tz_localize("UTC") if horodatage.tzinfo is None else horodatage
+    manifeste = {
+        "horodatage": horodatage.isoformat(),
+        "source": csv_file, "index": panel.index.name, "colonnes": colonnes, "groupes": groupes,
+        "mois": [str(m) for m in mois[debuts]], "morceaux": morceaux,
+        "nouveaux": len(set(morceaux) - connus), "n_dates": len(jours),
+        "premiere_date": str(jours[0]) if len(jours) else None, "derniere_date": str(jours[-1]) if len(jours) else None,
+    }
+    os.makedirs(os.path.join(dossier, nom), exist_ok=True)
+    version = precedent["version"] + 1 if precedent else 1
+    while True:
+        # Création exclusive : deux écritures simultanées ne peuvent pas prendre le même numéro
+        try:
+            with open(os.path.join(dossier, nom, f"{version:06d}.json"), "x") as f:
+                json.dump(dict(manifeste, version=version), f)
+            return version
+        except FileExistsError:
+            version += 1
+
+
+def _choisir_version(nom, version, au, dossier):
+    existants = _manifestes(nom, dossier)
+    if not existants:
+        raise FileNotFoundError(f"Aucune version enregistrée pour : {nom}")
+    if version is not None:
+        chemin = os.path.join(dossier, nom, f"{int(version):06d}.json")
+        if not os.path.exists(chemin):
+            raise KeyError(f"Version inconnue pour {nom} : {version}")
+        return _lire_manifeste(chemin)
+    if au is None:
+        return _lire_manifeste(existants[-1])
+    # Dernière version enregistrée au plus tard à la date demandée (fin de journée si seule la date est donnée)
+    au = pd.Timestamp(au)
+    if au == au.normalize():
+        au += pd.Timedelta(days=1) - pd.Timedelta(1)
+    au = au.tz_localize("UTC") if au.tzinfo is None else au
+    choisi = None
+    for chemin in existants:
+        manifeste = _lire_manifeste(chemin)
+        if pd.Timestamp(manifeste["horodatage"]) > au:
+            break
+        choisi = manifeste
+    if choisi is None:
+        raise KeyError(f"Aucune version de {nom} enregistrée au {au:%Y-%m-%d %H:%M}")
+    return choisi
+
+
+def lire_panel(csv_file, version=None, au=None, colonnes=None, dossier=None):
+    # Panel tel qu'enregistré dans une version (numéro), ou tel qu'il était à une date (`au`), sinon la
+    # dernière version. Seuls les morceaux des colonnes demandées sont lus.
+    dossier = _dossier(csv_file, dossier)
+    manifeste = _choisir_version(_nom(csv_file), version, au, dossier)
+    toutes, groupes = manifeste["colonnes"], _groupes(manifeste)
+    colonnes = toutes if colonnes is None else list(colonnes)
+    groupe_de = {c: g for g, groupe in enumerate(groupes) for c in groupe}
+    manquantes = [c for c in colonnes if c not in groupe_de]
+    if manquantes:
+        raise KeyError(f"Colonnes absentes de la version {manifeste['version']} : {', '.join(manquantes)}")
+    lus_groupes = sorted({groupe_de[c] for c in colonnes})
+    blocs_dates, blocs = [], []
+    for m in range(len(manifeste["mois"])):
+        lus = [_lire_objet(_chemin_objet(manifeste["morceaux"][m * len(groupes) + g], dossier)) for g in lus_groupes]
+        blocs_dates.append(lus[0][0] if lus else np.empty(0, dtype=np.int64))
+        blocs.append(np.hstack([l[2] for l in lus]) if lus else np.empty((0, 0)))
+    dates = np.concatenate(blocs_dates) if blocs_dates else np.empty(0, dtype=np.int64)
+    lues = [c for g in lus_groupes for c in groupes[g]]
+    valeurs = np.vstack(blocs) if blocs else np.empty((0, len(lues)))
+    index = pd.DatetimeIndex(dates.astype("datetime64[D]").astype("datetime64[ns]"), name=manifeste["index"])
+    panel = pd.DataFrame(valeurs, index=index, columns=lues)
+    if lues != colonnes:
+        panel = panel[colonnes]
+    panel.attrs["version"] = manifeste["version"]
+    panel.attrs["horodatage"] = manifeste["horodatage"]
+    return panel
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Versions des panels de cours")
+    parser.add_argument("panels", nargs="*", default=PANELS)
+    parser.add_argument("--dossier", default=None, help="historique (par défaut : versions/ à côté du CSV)")
+    parser.add_argument("--liste", action="store_true", help="afficher les versions enregistrées")
+    parser.add_argument("--version", type=int)
+    parser.add_argument("--au", help="date (ou date et heure) de la version à relire")
+    parser.add_argument("--exporter", help="écrire la version demandée dans ce CSV")
+    args = parser.parse_args()
+    for csv_file in args.panels:
+        if args.liste:
+            print(csv_file)
+            print(versions(csv_file, args.dossier).to_string(index=False))
+        elif args.exporter:
+            panel = lire_panel(csv_file, args.version, args.au, dossier=args.dossier)
+            panel.to_csv(args.exporter)
+            print(f"{csv_file} version {panel.attrs['version']} ({panel.attrs['horodatage']}) -> {args.exporter}")
+        elif os.path.exists(csv_file):
+            print(f"{csv_file} : version {enregistrer_panel(csv_file, dossier=args.dossier)}")